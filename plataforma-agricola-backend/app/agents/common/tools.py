@@ -1,14 +1,18 @@
 from typing import Optional
 from langchain.tools import tool
 
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
 from app.db.models.parcel import Parcel
 from app.db.models.user import User 
 from app.db.models.kpi import KPIMetric
 
 from app.core.config import DATOS_GOV_API_KEY
+from app.services.parcel_repository import get_parcel_repository
 from app.utils.helper import _safe_json_response
 
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
 
 from datetime import datetime
 import requests
@@ -19,16 +23,13 @@ import json
 # ============================================================================
 
 @tool
-def get_parcel_details(parcel_id: int) -> str:
+async def get_parcel_details(parcel_id: int) -> str:
     """
     Obtiene detalles COMPLETOS de una parcela incluyendo información del cultivo,
     suelo, riego y estado actual de salud.
     """
-    db = SessionLocal()
     try:
-        parcel = db.query(Parcel).filter(
-            Parcel.id == parcel_id
-        ).first()
+        parcel = await get_parcel_repository().get(parcel_id)
 
         if not parcel:
             return _safe_json_response(False, error=f"Parcela {parcel_id} no encontrada")
@@ -79,11 +80,9 @@ def get_parcel_details(parcel_id: int) -> str:
 
     except Exception as e:
         return _safe_json_response(False, error=f"Error al obtener detalles: {str(e)}")
-    finally:
-        db.close()
 
 @tool
-def update_parcel_info(
+async def update_parcel_info(
     parcel_id: int,
     crop_type: Optional[str] = None,
     development_stage: Optional[str] = None,
@@ -102,11 +101,9 @@ def update_parcel_info(
     
     Solo actualiza los campos que se proporcionen (los demás quedan sin cambios).
     """
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
-        parcel = db.query(Parcel).filter(
-            Parcel.id == parcel_id
-        ).first()
+        parcel = await db.get(Parcel, parcel_id)
         
         if not parcel:
             return _safe_json_response(False, error=f"Parcela {parcel_id} no encontrada")
@@ -153,8 +150,9 @@ def update_parcel_info(
         if not updated_fields:
             return _safe_json_response(False, error="No se proporcionaron campos para actualizar")
         
-        db.commit()
-        db.refresh(parcel)
+        await db.commit()
+        # Las siguientes lecturas del turno deben ver los cambios
+        get_parcel_repository().invalidate(parcel_id)
         
         return _safe_json_response(True, {
             "parcel_id": parcel_id,
@@ -164,22 +162,24 @@ def update_parcel_info(
         })
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return _safe_json_response(False, error=f"Error al actualizar: {str(e)}")
     finally:
-        db.close()
+        await db.close()
 
 @tool
-def list_user_parcels(user_id: int) -> str:
+async def list_user_parcels(user_id: int) -> str:
     """
     Lista todas las parcelas del usuario con su información de cultivo y estado actual.
     Útil para dar una visión general de todas las parcelas del agricultor.
     """
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
-        user = db.query(User).filter(
-            User.id == user_id
-        ).first()
+        # Las relaciones no se cargan de forma perezosa en sesiones asíncronas
+        result = await db.execute(
+            select(User).options(selectinload(User.parcels)).where(User.id == user_id)
+        )
+        user = result.scalars().first()
         
         if not user:
             return _safe_json_response(False, error=f"Usuario {user_id} no encontrado")
@@ -229,64 +229,57 @@ def list_user_parcels(user_id: int) -> str:
     except Exception as e:
         return _safe_json_response(False, error=f"Error al listar parcelas: {str(e)}")
     finally:
-        db.close()
+        await db.close()
 
 
 @tool
-def get_parcel_geojson(parcel_id: int) -> Optional[str]:
+async def get_parcel_geojson(parcel_id: int) -> Optional[str]:
     """Consulta la DB y retorna el string GeoJSON de la parcela."""
-    db = SessionLocal()
-    try:
-        parcel = db.query(Parcel).filter(
-            Parcel.id == parcel_id).first()
-        if parcel:
-            return parcel.geometry
-        return f'No se encontró ninguna parcela con el ID {parcel_id}.'
-    finally:
-        db.close()
+    parcel = await get_parcel_repository().get(parcel_id)
+    if parcel:
+        return parcel.geometry
+    return f'No se encontró ninguna parcela con el ID {parcel_id}.'
 
 
 @tool
-def get_parcel_location_by_id(parcel_id: int) -> str:
+async def get_parcel_location_by_id(parcel_id: int) -> str:
     """
     Útil para obtener la latitud y longitud de una parcela específica cuando se conoce su ID.
     Devuelve un string JSON con 'latitude' y 'longitude'.
     """
-    db = SessionLocal()
-    try:
-        parcel = db.query(Parcel).filter(
-            Parcel.id == parcel_id).first()
-        if not parcel:
-            return f'No se encontró ninguna parcela con el ID {parcel_id}.'
+    parcel = await get_parcel_repository().get(parcel_id)
+    if not parcel:
+        return f'No se encontró ninguna parcela con el ID {parcel_id}.'
 
-        # Asumiendo que la ubicación es un campo JSON o se puede parsear a coordenadas
-        # Si 'location' es un string de texto, esto debe ser ajustado a cómo se guardan las coordenadas.
-        # Por simplicidad, asumimos que podemos obtener Lat/Lon.
-        # Si la DB no guarda Lat/Lon directamente, se debe usar la geometría (GeoJSON) para calcular el centroide.
+    # Asumiendo que la ubicación es un campo JSON o se puede parsear a coordenadas
+    # Si 'location' es un string de texto, esto debe ser ajustado a cómo se guardan las coordenadas.
+    # Por simplicidad, asumimos que podemos obtener Lat/Lon.
+    # Si la DB no guarda Lat/Lon directamente, se debe usar la geometría (GeoJSON) para calcular el centroide.
 
-        # **NOTA:** Si la ubicación es un string de texto (ej. 'Bogotá, CO'), se debe usar una API de geocodificación.
-        # Si la DB tiene campos lat/lon, úsalos. Aquí asumo que la DB tiene `latitude` y `longitude`.
-        if hasattr(parcel, 'latitude') and hasattr(parcel, 'longitude'):
-            return json.dumps({"latitude": parcel.latitude, "longitude": parcel.longitude})
-        else:
-            # Si no hay campos directos, se devuelve la ubicación textual para el agente de clima
-            return json.dumps({"location_name": parcel.location})
+    # **NOTA:** Si la ubicación es un string de texto (ej. 'Bogotá, CO'), se debe usar una API de geocodificación.
+    # Si la DB tiene campos lat/lon, úsalos. Aquí asumo que la DB tiene `latitude` y `longitude`.
+    if hasattr(parcel, 'latitude') and hasattr(parcel, 'longitude'):
+        return json.dumps({"latitude": parcel.latitude, "longitude": parcel.longitude})
+    else:
+        # Si no hay campos directos, se devuelve la ubicación textual para el agente de clima
+        return json.dumps({"location_name": parcel.location})
 
-    finally:
-        db.close()
 
 @tool
-def get_kpi_summary(parcel_id: int, kpi_name: str) -> str:
+async def get_kpi_summary(parcel_id: int, kpi_name: str) -> str:
     """
     Obtiene resumen y análisis de evolución de un KPI específico.
     Ejemplo: kpi_name='SOIL_HEALTH_NDVI'
     """
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
-        metrics = db.query(KPIMetric).filter(
-            KPIMetric.parcel_id == parcel_id,
-            KPIMetric.kpi_name == kpi_name
-        ).order_by(KPIMetric.timestamp.asc()).all()
+        result = await db.execute(
+            select(KPIMetric).where(
+                KPIMetric.parcel_id == parcel_id,
+                KPIMetric.kpi_name == kpi_name
+            ).order_by(KPIMetric.timestamp.asc())
+        )
+        metrics = result.scalars().all()
 
         if not metrics:
             return _safe_json_response(False,
@@ -328,21 +321,24 @@ def get_kpi_summary(parcel_id: int, kpi_name: str) -> str:
     except Exception as e:
         return _safe_json_response(False, error=f"Error al obtener KPI: {str(e)}")
     finally:
-        db.close()
+        await db.close()
 
 
 @tool
-def lookup_parcel_by_name(name_query: str, user_id: int) -> str:
+async def lookup_parcel_by_name(name_query: str, user_id: int) -> str:
     """
     Busca una parcela por su nombre (búsqueda parcial, insensible a mayúsculas).
     Útil cuando el usuario menciona el nombre pero no el ID.
     """
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
-        parcel = db.query(Parcel).filter(
-            Parcel.owner_id == user_id,
-            Parcel.name.ilike(f"%{name_query}%")
-        ).first()
+        result = await db.execute(
+            select(Parcel).where(
+                Parcel.owner_id == user_id,
+                Parcel.name.ilike(f"%{name_query}%")
+            )
+        )
+        parcel = result.scalars().first()
 
         if not parcel:
             return _safe_json_response(False,
@@ -358,7 +354,7 @@ def lookup_parcel_by_name(name_query: str, user_id: int) -> str:
     except Exception as e:
         return _safe_json_response(False, error=f"Error en búsqueda: {str(e)}")
     finally:
-        db.close()
+        await db.close()
 
 # ============================================================================
 # HERRAMIENTAS DE DATOS EXTERNOS
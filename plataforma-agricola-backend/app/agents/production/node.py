@@ -5,6 +5,7 @@ from langchain_core.prompts import MessagesPlaceholder, ChatPromptTemplate
 
 from app.core.config import GOOGLE_API_KEY
 from app.graph.state import GraphState
+from app.services.user_parcels import format_parcel_summaries
 from app.agents.common.tools import (
     get_parcel_details,
     list_user_parcels,
@@ -48,6 +49,7 @@ async def production_agent_node(state: GraphState) -> dict:
     
     prompt_production = prompt_template.partial(
         user_id=user_id,
+        user_parcels=format_parcel_summaries(state.get("user_parcels")),
         info_next_agent=info_next_agent,
     )
 
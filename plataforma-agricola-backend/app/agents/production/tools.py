@@ -1,10 +1,10 @@
 from langchain.tools import tool
 from langchain_classic.tools.retriever import create_retriever_tool
 
-from app.db.session import SessionLocal
-from app.db.models.parcel import Parcel
+from app.db.session import AsyncSessionLocal
 from app.db.models.kpi import KPIMetric
 from app.services.rag.store import vectorstore_service
+from app.services.parcel_repository import get_parcel_repository
 from app.utils.helper import _safe_json_response 
 
 from app.services.sentinel_service import (
@@ -21,10 +21,11 @@ from app.services.sentinel_service import (
 )
 
 from datetime import date
+import asyncio
 
 
 @tool
-def get_parcel_health_indices(parcel_id: int, start_date: str, end_date: str) -> str:
+async def get_parcel_health_indices(parcel_id: int, start_date: str, end_date: str) -> str:
     """
     Obtiene índices como NDVI mediante datos satelitales.
     Y guarda los resultados clave como KPIs históricos.
@@ -34,7 +35,7 @@ def get_parcel_health_indices(parcel_id: int, start_date: str, end_date: str) ->
     - start_date: Fecha inicio 'YYYY-MM-DD'
     - end_date: Fecha fin 'YYYY-MM-DD'
     """
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
         # Validar formato de fechas
         try:
@@ -57,28 +58,27 @@ def get_parcel_health_indices(parcel_id: int, start_date: str, end_date: str) ->
                                        data={"days_requested": days_diff})
 
         # Obtener parcela
-        parcel = db.query(Parcel).filter(
-            Parcel.id == parcel_id
-        ).first()
+        parcel = await get_parcel_repository().get(parcel_id)
 
         if not parcel:
             return _safe_json_response(False, error=f"Parcela {parcel_id} no encontrada")
 
-        if not parcel.geometry:
+        # Caja envolvente precalculada al guardar la parcela (sin parsear el GeoJSON)
+        area = parcel.bbox or parcel.geometry
+        if not area:
             return _safe_json_response(False,
                                        error=f"La parcela {parcel_id} no tiene geometría definida")
 
-        # Calcular NDVI
-        ndvi_results = get_ndvi(parcel.geometry, start_date, end_date)
-        ndwi_results = get_ndwi(parcel.geometry, start_date, end_date)
-        evi_results = get_evi(parcel.geometry, start_date, end_date)
-        savi_results = get_savi(parcel.geometry, start_date, end_date)
-        msavi_results = get_msavi(parcel.geometry, start_date, end_date)
-        bsi_results = get_bsi(parcel.geometry, start_date, end_date)
-        nbr_results = get_nbr(parcel.geometry, start_date, end_date)
-        gci_results = get_gci(parcel.geometry, start_date, end_date)
-        lai_results = get_lai(parcel.geometry, start_date, end_date)
-        fapar_results = get_fapar(parcel.geometry, start_date, end_date)
+        # Calcular índices. El cliente de Sentinel es bloqueante: cada consulta
+        # corre en un hilo para no detener el event loop mientras espera la red.
+        (
+            ndvi_results, ndwi_results, evi_results, savi_results, msavi_results,
+            bsi_results, nbr_results, gci_results, lai_results, fapar_results
+        ) = await asyncio.gather(*(
+            asyncio.to_thread(index_fn, area, start_date, end_date)
+            for index_fn in (get_ndvi, get_ndwi, get_evi, get_savi, get_msavi,
+                             get_bsi, get_nbr, get_gci, get_lai, get_fapar)
+        ))
 
         ndvi_mean = ndvi_results[1]['mean']
         ndwi_mean = ndwi_results[1]['mean']
@@ -99,7 +99,7 @@ def get_parcel_health_indices(parcel_id: int, start_date: str, end_date: str) ->
         )
         db.add(kpi_ndwi)
 
-        db.commit()
+        await db.commit()
 
         return _safe_json_response(True, {
             "parcel_id": parcel_id,
@@ -124,7 +124,7 @@ def get_parcel_health_indices(parcel_id: int, start_date: str, end_date: str) ->
     except Exception as e:
         return _safe_json_response(False, error=f"Error al calcular índices: {str(e)}")
     finally:
-        db.close()
+        await db.close()
 
 retriever = vectorstore_service.get_retriever()
 knowledge_base_tool = create_retriever_tool(
@@ -4,6 +4,7 @@ from langchain_core.messages import AIMessage
 
 from app.core.llm import llm_risk
 from app.graph.state import GraphState
+from app.services.user_parcels import format_parcel_summaries
 from app.agents.common.tools import (
     get_parcel_details,
     list_user_parcels,
@@ -40,6 +41,7 @@ async def risk_agent_node(state: GraphState) -> dict:
 
     prompt = prompt_template.partial(
         user_id=user_id,
+        user_parcels=format_parcel_summaries(state.get("user_parcels")),
         info_next_agent=info_next_agent,
     )
 
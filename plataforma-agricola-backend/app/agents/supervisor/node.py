@@ -1,9 +1,12 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
 
 from app.core.config import GOOGLE_API_KEY
+from app.core.llm_cache import llm_cache
 from app.graph.state import GraphState
+from app.services.user_parcels import format_parcel_summaries
 from app.schemas.agent import SupervisorDecision
 from app.services.metrics.logger import kpi_logger
 from app.services.metrics.orchestration import (
@@ -13,8 +16,11 @@ from app.services.metrics.orchestration import (
     classify_query_type
 )
 from app.utils.helper import extract_user_query, get_agent_responses, build_synthesis_context
+from app.graph.memory import trim_message_payloads
+from app.graph.budget import get_budget, build_budget_fallback_response
 from app.prompts.loader import load_prompt
 
+import asyncio
 import uuid
 import time
 
@@ -23,35 +29,211 @@ from app.utils.helper import save_conversation_log
 llm_supervisor = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",
     temperature=0,
-    google_api_key=GOOGLE_API_KEY
+    google_api_key=GOOGLE_API_KEY,
+    cache=llm_cache
 )
 
+def build_supervisor_prompt(state: GraphState) -> ChatPromptTemplate:
+    """
+    Prompt del supervisor para el estado actual.
+
+    Su texto forma parte de la clave de la caché de LLM (`llm_cache`): solo
+    lleva valores que dependen del contenido de la conversación, nunca valores
+    propios de cada turno (conversation_id, marcas de tiempo), para que dos
+    turnos idénticos reutilicen la misma respuesta.
+    """
+    agent_history = state.get('list_agent', [])
+    current_messages = state.get("messages", [])
+
+    prompt_template = ChatPromptTemplate.from_messages([
+        (
+            "system",
+            load_prompt("supervisor", "system.md")
+        ),
+        MessagesPlaceholder(variable_name="messages"),
+        MessagesPlaceholder(variable_name="chat_history")
+    ])
+
+    return prompt_template.partial(
+        user_id=state["user_id"],
+        user_parcels=format_parcel_summaries(state.get("user_parcels")),
+        synthesis_context=build_synthesis_context(current_messages),
+        conversation_summary=state.get("conversation_summary") or "Sin resumen previo.",
+        has_image='Sí' if bool(state.get('image_digest')) else 'No',
+        agent_history=agent_history,
+        last_agent=agent_history[-1] if agent_history else None,
+        agent_responses=len(get_agent_responses(current_messages)),
+        has_previous_context='Sí - usa SOLO si el usuario hace referencia' if state.get('chat_history') else 'No'
+    )
+
+# ============================================================================
+# REGISTRO DE KPIs AL FINALIZAR
+# ============================================================================
+
+
+async def _log_finish_kpis(
+    state: GraphState,
+    conversation_id: str,
+    user_query: str,
+    has_image: str,
+    agent_history: list,
+    supervisor_time: float,
+    final_content: str,
+    budget_usage: dict | None = None
+) -> None:
+    """
+    Registra KT1, KA3 y el log de conversación cuando el supervisor finaliza.
+    Las escrituras (base de datos y archivos) se ejecutan fuera del event loop.
+    """
+
+    # ====================================================================
+    # CAPTURA DE KPI: KT1 - EFICIENCIA DE ORQUESTACIÓN
+    # ====================================================================
+
+    try:
+        # Calcular nodos visitados
+        nodes_visited = ["supervisor"] + \
+            agent_history + ["supervisor", "FINISH"]
+        nodes_count = len(nodes_visited)
+
+        # Clasificar tipo de consulta
+        query_type = classify_query_type(user_query, has_image)
+
+        # Calcular nodos mínimos necesarios
+        nodes_minimum = calculate_minimum_nodes(query_type, has_image)
+
+        # REGISTRAR ORQUESTACIÓN (KT1)
+        await kpi_logger.alog_orchestration(
+            user_id=state.get("user_id"),
+            conversation_id=conversation_id,
+            query_text=user_query[:500],  # Limitar longitud
+            nodes_visited=nodes_visited,
+            nodes_minimum=nodes_minimum,
+            query_type=query_type,
+            has_image=has_image
+        )
+
+        g_eff = nodes_minimum / nodes_count if nodes_count > 0 else 0
+
+        print(f"[KPI-KT1] ✓ Orquestación registrada")
+        print(f"[KPI-KT1]   Tipo: {query_type}")
+        print(
+            f"[KPI-KT1]   Nodos: {nodes_count} (mínimo: {nodes_minimum})")
+        print(f"[KPI-KT1]   G_eff: {g_eff:.2f}")
+
+    except Exception as e:
+        print(f"[KPI-WARNING] Error al registrar orquestación: {e}")
+
+    # ==============================================================
+    # CAPTURA DE KPI: KA3 - LATENCIA DE INFERENCIA
+    # ==============================================================
+
+    try:
+        # Calcular tiempo total
+        total_time = state.get("total_start_time")
+        if total_time:
+            total_elapsed = time.time() - total_time
+
+            # Obtener desglose de tiempos
+            time_breakdown = state.get("time_breakdown", {})
+            time_breakdown["supervisor"] = time_breakdown.get(
+                "supervisor", 0) + supervisor_time
+
+            # REGISTRAR LATENCIA (KA3)
+            await kpi_logger.alog_latency(
+                user_id=state.get("user_id"),
+                conversation_id=conversation_id,
+                total_time=total_elapsed,
+                time_breakdown=time_breakdown,
+                has_image=has_image,
+                budget_usage=budget_usage
+            )
+
+            threshold = 10.0 if has_image else 5.0
+            status = "✓" if total_elapsed <= threshold else "✗"
+
+            print(
+                f"[KPI-KA3] {status} Latencia registrada: {total_elapsed:.2f}s")
+            print(f"[KPI-KA3]   Threshold: {threshold}s")
+            print(f"[KPI-KA3]   Desglose: {time_breakdown}")
+            if budget_usage:
+                print(f"[KPI-KA3]   Presupuesto: {budget_usage}")
+
+    except Exception as e:
+        print(f"[KPI-WARNING] Error al registrar latencia: {e}")
+
+    # ==============================================================
+
+    await asyncio.to_thread(
+        save_conversation_log,
+        messages=state["messages"],
+        user_id=state.get("user_id", 0),
+        agent_history=agent_history,
+        conversation_id=conversation_id,
+        final_response=final_content
+    )
+
+
 # ============================================================================
 # NODO DEL SUPERVISOR
 # ============================================================================
 
 
-async def supervisor_agent_node(state: GraphState) -> dict:
+async def supervisor_agent_node(state: GraphState, config: RunnableConfig) -> dict:
     """
     Supervisor que orquesta el flujo multi-agente.
     Decide si enrutar a otro agente o finalizar con una respuesta al usuario.
+    Si el presupuesto de la conversación se agota, finaliza sintetizando lo que
+    respondieron los agentes hasta el momento, sin volver a llamar al LLM.
     """
     print("\n-- Node ejecutándose: Supervisor --")
 
     supervisor_start_time = time.time()
+    budget = get_budget(config)
 
     if not state.get("conversation_id"):
         state["conversation_id"] = str(uuid.uuid4())
         
     conversation_id = state["conversation_id"]
 
-    has_image = 'Sí' if bool(state.get('image_base64')) else 'No'
+    has_image = 'Sí' if bool(state.get('image_digest')) else 'No'
     agent_history = state.get('list_agent', [])
     last_agent = agent_history[-1] if agent_history else None
 
     current_messages = state.get("messages", [])
     user_query = extract_user_query(current_messages)
-    agent_responses = get_agent_responses(current_messages)
+
+    # ====================================================================
+    # PRESUPUESTO DE LA CONVERSACIÓN
+    # ====================================================================
+
+    exhausted_reason = budget.exhausted_reason() if budget else None
+    if exhausted_reason:
+        budget.exhausted_by = exhausted_reason
+        print(f"-- PRESUPUESTO AGOTADO ({exhausted_reason}): sintetizando respuesta parcial --")
+
+        fallback_content = build_budget_fallback_response(current_messages, exhausted_reason)
+        supervisor_time = time.time() - supervisor_start_time
+
+        await _log_finish_kpis(
+            state=state,
+            conversation_id=conversation_id,
+            user_query=user_query,
+            has_image=has_image,
+            agent_history=agent_history,
+            supervisor_time=supervisor_time,
+            final_content=fallback_content,
+            budget_usage=budget.usage()
+        )
+
+        return {
+            "next": "FINISH",
+            "reasoning": f"Presupuesto de la conversación agotado: {exhausted_reason}",
+            "info_next_agent": None,
+            "list_agent": state["list_agent"],
+            "messages": [AIMessage(content=fallback_content, name="supervisor")],
+            "chat_history": [AIMessage(content=fallback_content)]
+        }
 
     last_message_content = ""
     if current_messages:
@@ -59,30 +241,7 @@ async def supervisor_agent_node(state: GraphState) -> dict:
         if hasattr(last_msg, 'content'):
             last_message_content = normalize_message_content(last_msg.content)
 
-    chat_history = state.get('chat_history', [])
-    has_previous_context = len(chat_history) > 0
-
-    synthesis_context = build_synthesis_context(current_messages)
-
-    prompt_template = ChatPromptTemplate.from_messages([
-        (
-            "system",
-            load_prompt("supervisor", "system.md")
-        ),
-        MessagesPlaceholder(variable_name="messages"),
-        MessagesPlaceholder(variable_name="chat_history")
-    ])
-    
-    prompt = prompt_template.partial(
-        user_id=state["user_id"],
-        synthesis_context=synthesis_context,
-        has_image=has_image,
-        agent_history=agent_history,
-        last_agent=last_agent,
-        conversation_id=conversation_id,
-        agent_responses= len(agent_responses),
-        has_previous_context= 'Sí - usa SOLO si el usuario hace referencia' if has_previous_context else 'No'
-    )
+    prompt = build_supervisor_prompt(state)
 
     structured_llm = prompt | llm_supervisor.with_structured_output(SupervisorDecision)
 
@@ -92,6 +251,8 @@ async def supervisor_agent_node(state: GraphState) -> dict:
                 f"-- VALIDACIÓN FORZADA: Enrutando a sustainability para revisar químicos --")
 
             supervisor_time = time.time() - supervisor_start_time
+            if budget:
+                budget.register_hop()
 
             return {
                 "next": "sustainability",
@@ -100,95 +261,26 @@ async def supervisor_agent_node(state: GraphState) -> dict:
                 "time_breakdown": state.get("time_breakdown", {}) | {"supervisor": supervisor_time}
             }
 
-        response = await structured_llm.ainvoke({"messages": state["messages"], "chat_history": state["chat_history"]})
+        response = await structured_llm.ainvoke({
+            "messages": trim_message_payloads(state["messages"]),
+            "chat_history": trim_message_payloads(state["chat_history"])
+        })
 
         supervisor_time = time.time() - supervisor_start_time
 
         print(f"-- next_agent: {response.next_agent} --")
         print(f"-- reasoning: {response.reasoning} --")
 
-        # ====================================================================
-        # CAPTURA DE KPI: KT1 - EFICIENCIA DE ORQUESTACIÓN
-        # ====================================================================
-
         if response.next_agent == 'FINISH':
-            try:
-                # Calcular nodos visitados
-                nodes_visited = ["supervisor"] + \
-                    agent_history + ["supervisor", "FINISH"]
-                nodes_count = len(nodes_visited)
-
-                # Clasificar tipo de consulta
-                query_type = classify_query_type(user_query, has_image)
-
-                # Calcular nodos mínimos necesarios
-                nodes_minimum = calculate_minimum_nodes(query_type, has_image)
-
-                # REGISTRAR ORQUESTACIÓN (KT1)
-                kpi_logger.log_orchestration(
-                    user_id=state.get("user_id"),
-                    conversation_id=conversation_id,
-                    query_text=user_query[:500],  # Limitar longitud
-                    nodes_visited=nodes_visited,
-                    nodes_minimum=nodes_minimum,
-                    query_type=query_type,
-                    has_image=has_image
-                )
-
-                g_eff = nodes_minimum / nodes_count if nodes_count > 0 else 0
-
-                print(f"[KPI-KT1] ✓ Orquestación registrada")
-                print(f"[KPI-KT1]   Tipo: {query_type}")
-                print(
-                    f"[KPI-KT1]   Nodos: {nodes_count} (mínimo: {nodes_minimum})")
-                print(f"[KPI-KT1]   G_eff: {g_eff:.2f}")
-
-            except Exception as e:
-                print(f"[KPI-WARNING] Error al registrar orquestación: {e}")
-
-            # ==============================================================
-            # CAPTURA DE KPI: KA3 - LATENCIA DE INFERENCIA
-            # ==============================================================
-
-            try:
-                # Calcular tiempo total
-                total_time = state.get("total_start_time")
-                if total_time:
-                    total_elapsed = time.time() - total_time
-
-                    # Obtener desglose de tiempos
-                    time_breakdown = state.get("time_breakdown", {})
-                    time_breakdown["supervisor"] = time_breakdown.get(
-                        "supervisor", 0) + supervisor_time
-
-                    # REGISTRAR LATENCIA (KA3)
-                    kpi_logger.log_latency(
-                        user_id=state.get("user_id"),
-                        conversation_id=conversation_id,
-                        total_time=total_elapsed,
-                        time_breakdown=time_breakdown,
-                        has_image=has_image
-                    )
-
-                    threshold = 10.0 if has_image else 5.0
-                    status = "✓" if total_elapsed <= threshold else "✗"
-
-                    print(
-                        f"[KPI-KA3] {status} Latencia registrada: {total_elapsed:.2f}s")
-                    print(f"[KPI-KA3]   Threshold: {threshold}s")
-                    print(f"[KPI-KA3]   Desglose: {time_breakdown}")
-
-            except Exception as e:
-                print(f"[KPI-WARNING] Error al registrar latencia: {e}")
-
-            # ==============================================================
-
-            save_conversation_log(
-                messages=state["messages"],
-                user_id=state.get("user_id", 0),
-                agent_history=agent_history,
+            await _log_finish_kpis(
+                state=state,
                 conversation_id=conversation_id,
-                final_response=response.content
+                user_query=user_query,
+                has_image=has_image,
+                agent_history=agent_history,
+                supervisor_time=supervisor_time,
+                final_content=response.content,
+                budget_usage=budget.usage() if budget else None
             )
 
             return {
@@ -196,13 +288,16 @@ async def supervisor_agent_node(state: GraphState) -> dict:
                 "reasoning": response.reasoning,
                 "info_next_agent": response.info_for_next_agent,
                 "list_agent": state["list_agent"],
-                "messages": [AIMessage(content=response.content, name="supervisor")]
+                "messages": [AIMessage(content=response.content, name="supervisor")],
+                "chat_history": [AIMessage(content=response.content)]
             }
 
         else:
             print(
                 f"-- info_for_next_agent: {response.info_for_next_agent} --\n")
             # No es FINISH, continuar orquestación
+            if budget:
+                budget.register_hop()
             time_breakdown = state.get("time_breakdown", {})
             time_breakdown["supervisor"] = time_breakdown.get(
                 "supervisor", 0) + supervisor_time
@@ -225,6 +320,7 @@ async def supervisor_agent_node(state: GraphState) -> dict:
 
         return {
             "messages": [AIMessage(content=error_msg, name="supervisor")],
+            "chat_history": [AIMessage(content=error_msg)],
             "next": "FINISH",
             "time_breakdown": time_breakdown
         }
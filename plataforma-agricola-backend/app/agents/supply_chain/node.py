@@ -3,6 +3,7 @@ from langchain_classic.agents import create_tool_calling_agent, AgentExecutor
 from langchain_core.messages import AIMessage
 
 from app.graph.state import GraphState
+from app.services.user_parcels import format_parcel_summaries
 from app.agents.common.tools import (
     get_parcel_details,
     list_user_parcels,
@@ -35,6 +36,7 @@ async def supply_chain_agent_node(state: GraphState) -> dict:
 
     prompt = prompt_template.partial(
         user_id=user_id,
+        user_parcels=format_parcel_summaries(state.get("user_parcels")),
         info_next_agent=info_next_agent
     )
 
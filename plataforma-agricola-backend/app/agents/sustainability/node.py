@@ -4,6 +4,7 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 from app.core.llm import llm_sustainability
 from app.graph.state import GraphState
+from app.services.user_parcels import format_parcel_summaries
 from app.prompts.loader import load_prompt
 from app.agents.common.tools import (
     get_parcel_details,
@@ -46,6 +47,7 @@ async def sustainability_agent_node(state: GraphState) -> dict:
     
     prompt = prompt_template.partial(
         user_id=state["user_id"],
+        user_parcels=format_parcel_summaries(state.get("user_parcels")),
         info_next_agent=state["info_next_agent"]
     )
 
@@ -117,7 +119,7 @@ async def sustainability_agent_node(state: GraphState) -> dict:
                 agent_history = state.get("list_agent", [])
                 agent_source = agent_history[-1] if agent_history else "unknown"
                 
-                kpi_logger.log_intervention(
+                await kpi_logger.alog_intervention(
                     user_id=state.get("user_id"),
                     agent_source=agent_source,
                     chemical_name=", ".join([c['name'] for c in detected_chemicals]),
@@ -142,7 +144,7 @@ async def sustainability_agent_node(state: GraphState) -> dict:
                 agent_history = state.get("list_agent", [])
                 agent_source = agent_history[-1] if agent_history else "unknown"
                 
-                kpi_logger.log_intervention(
+                await kpi_logger.alog_intervention(
                     user_id=state.get("user_id"),
                     agent_source=agent_source,
                     chemical_name=", ".join([c['name'] for c in detected_chemicals]),
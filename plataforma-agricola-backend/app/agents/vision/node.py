@@ -9,7 +9,10 @@ from app.services.metrics.vision import (
     analyze_image_conditions
 )
 from app.prompts.loader import load_prompt
+from app.services.blob_store import blob_store
 
+import asyncio
+import base64
 import time
 
 llm_vision = ChatGoogleGenerativeAI(
@@ -32,17 +35,20 @@ async def vision_agent_node(state: GraphState) -> dict:
     # Medir tiempo de inicio
     start_time = time.time()
     
-    if state.get("image_base64"):
+    # La imagen se lee del almacén de adjuntos; el estado solo guarda su hash
+    image_bytes = await asyncio.to_thread(blob_store.read, state["image_digest"]) if state.get("image_digest") else None
+
+    if image_bytes:
+        image_base64 = base64.b64encode(image_bytes).decode("ascii")
         message = HumanMessage(
             content=[
                 {"type": "text", "text": prompt_template},
                 {
                     "type": "image_url",
-                    "image_url": f"data:image/jpeg;base64,{state['image_base64']}"
+                    "image_url": f"data:image/jpeg;base64,{image_base64}"
                 },
             ]
         )
-        image_base64 = state['image_base64']
     elif state.get("audio_base64"):
         message = HumanMessage(
             content=[
@@ -79,7 +85,7 @@ async def vision_agent_node(state: GraphState) -> dict:
                 image_conditions = analyze_image_conditions(image_base64)
                 
                 if diagnosis_data['diagnosis']:
-                    kpi_logger.log_diagnosis(
+                    await kpi_logger.alog_diagnosis(
                         user_id=state.get("user_id"),
                         diagnosis=diagnosis_data['diagnosis'],
                         confidence=diagnosis_data['confidence'],
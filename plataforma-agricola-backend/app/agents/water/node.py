@@ -5,6 +5,7 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from app.core.llm import llm_water
 from app.prompts.loader import load_prompt
 from app.graph.state import GraphState
+from app.services.user_parcels import format_parcel_summaries
 
 from app.agents.common.tools import (
     list_user_parcels,
@@ -12,7 +13,13 @@ from app.agents.common.tools import (
     lookup_parcel_by_name,
     update_parcel_info
 )
-from app.agents.water.tools import get_weather_forecast, get_precipitation_data, calculate_water_requirements, estimate_soil_moisture_deficit
+from app.agents.water.tools import (
+    get_weather_forecast,
+    get_precipitation_data,
+    get_precipitation_data_for_parcels,
+    calculate_water_requirements,
+    estimate_soil_moisture_deficit
+)
 from app.agents.production.tools import get_parcel_health_indices
 
 from app.services.metrics.water_calc import _calculation_kpi_ks3
@@ -24,6 +31,7 @@ water_tools = [
     get_parcel_details,
     get_weather_forecast,
     get_precipitation_data,
+    get_precipitation_data_for_parcels,
     calculate_water_requirements,
     estimate_soil_moisture_deficit,
     get_parcel_health_indices,
@@ -56,6 +64,7 @@ async def water_agent_node(state: GraphState) -> dict:
 
     prompt = prompt_template.partial(
         user_id=user_id,
+        user_parcels=format_parcel_summaries(state.get("user_parcels")),
         info_next_agent=info_next_agent,
     )
 
@@ -80,7 +89,7 @@ async def water_agent_node(state: GraphState) -> dict:
         response_content = normalize_agent_output(response["output"])
         intermediate_steps = response.get("intermediate_steps", [])
 
-        _calculation_kpi_ks3(
+        await _calculation_kpi_ks3(
             intermediate_steps=intermediate_steps,
             user_id=user_id,
             response_content=response_content
@@ -1,16 +1,21 @@
 from langchain.tools import tool
 
-from app.db.session import SessionLocal
 from app.db.models.parcel import Parcel
-from app.core.config import OPENWEATHER_API_KEY
+from app.services.parcel_repository import get_parcel_repository
 from app.services.agronomy import calculate_eto_penman_simplified
-from app.utils.helper import _safe_json_response, _extract_coordinates
+from app.services.weather_service import (
+    fetch_daily_precipitation,
+    fetch_daily_precipitation_bulk,
+    fetch_current_weather
+)
+from app.utils.helper import _safe_json_response, _extract_coordinates, _parcel_coordinates
 
-from datetime import datetime, timedelta
-import requests
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List
+import httpx
 
 @tool
-def calculate_water_requirements(
+async def calculate_water_requirements(
     parcel_id: int, 
     crop_type: str, 
     growth_stage: str,
@@ -52,11 +57,8 @@ def calculate_water_requirements(
         'platano': {'inicial': 0.5, 'desarrollo': 1.05, 'maduracion': 1.15, 'cosecha': 1.1},
     }
 
-    db = SessionLocal()
     try:
-        parcel = db.query(Parcel.Parcel).filter(
-            Parcel.Parcel.id == parcel_id
-        ).first()
+        parcel = await get_parcel_repository().get(parcel_id)
 
         if not parcel:
             return _safe_json_response(False, error=f"Parcela {parcel_id} no encontrada")
@@ -180,11 +182,87 @@ def calculate_water_requirements(
 
     except Exception as e:
         return _safe_json_response(False, error=f"Error en cálculo: {str(e)}")
-    finally:
-        db.close()
         
+def _summarize_precipitation(parcel_id: int, data: Dict[str, Any], start_date: date, end_date: date) -> Dict[str, Any]:
+    """Resume la respuesta diaria de Open-Meteo para una parcela."""
+    precipitation_data = [p or 0.0 for p in data['daily']['precipitation_sum']]
+    precipitation_hours = [h or 0 for h in data['daily'].get(
+        'precipitation_hours', [0] * len(precipitation_data))]
+    dates = data['daily']['time']
+
+    total_precipitation = sum(precipitation_data)
+    total_hours = sum(precipitation_hours)
+
+    # Análisis de suficiencia (umbral: 25mm/semana para cultivos)
+    days_period = len(precipitation_data)
+    weekly_equivalent = (total_precipitation /
+                         days_period) * 7 if days_period > 0 else 0
+
+    if weekly_equivalent >= 25:
+        interpretation = "Suficiente"
+        irrigation_advice = "No se requiere riego suplementario"
+    elif weekly_equivalent >= 15:
+        interpretation = "Moderado"
+        irrigation_advice = "Monitorear humedad del suelo, considerar riego ligero"
+    else:
+        interpretation = "Insuficiente"
+        irrigation_advice = "Riego suplementario recomendado"
+
+    daily_details = [
+        {
+            "date": day,
+            "precipitation_mm": round(precip, 1),
+            "hours": int(hours)
+        }
+        for day, precip, hours in zip(dates, precipitation_data, precipitation_hours)
+    ]
+
+    return {
+        "parcel_id": parcel_id,
+        "period": f"{start_date} a {end_date}",
+        "days_analyzed": days_period,
+        "total_precipitation_mm": round(total_precipitation, 2),
+        "total_precipitation_hours": total_hours,
+        "daily_average_mm": round(total_precipitation / days_period, 2) if days_period > 0 else 0,
+        "weekly_equivalent_mm": round(weekly_equivalent, 2),
+        "interpretation": interpretation,
+        "irrigation_advice": irrigation_advice,
+        "daily_data": daily_details
+    }
+
+
+async def fetch_precipitation_for_parcels(parcels: List[Parcel], days_back: int = 7) -> Dict[int, Dict[str, Any]]:
+    """
+    Precipitación reciente de muchas parcelas con consultas multi-ubicación.
+
+    Pensado para el monitoreo y la planificación de riego por lotes: las parcelas
+    se agrupan por celda y se piden en bloques a Open-Meteo. Devuelve el resumen
+    por parcel_id; las parcelas sin coordenadas válidas reciben un 'error'.
+    """
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days_back)
+
+    results: Dict[int, Dict[str, Any]] = {}
+    parcel_points = {}
+    for parcel in parcels:
+        try:
+            parcel_points[parcel.id] = _parcel_coordinates(parcel)
+        except ValueError as e:
+            results[parcel.id] = {"parcel_id": parcel.id, "error": str(e)}
+
+    if not parcel_points:
+        return results
+
+    data_by_point = await fetch_daily_precipitation_bulk(parcel_points.values(), start_date, end_date)
+
+    for parcel_id, point in parcel_points.items():
+        results[parcel_id] = _summarize_precipitation(parcel_id, data_by_point[point], start_date, end_date)
+
+    return results
+
+
 @tool
-def get_precipitation_data(parcel_id: int, days_back: int = 7) -> str:
+async def get_precipitation_data(parcel_id: int, days_back: int = 7) -> str:
     """
     Obtiene datos históricos de precipitación para una parcela.
     Parámetros:
@@ -195,118 +273,78 @@ def get_precipitation_data(parcel_id: int, days_back: int = 7) -> str:
         return _safe_json_response(False,
                                    error="La API gratuita solo permite hasta 16 días de historial")
 
-    db = SessionLocal()
     try:
-        parcel = db.query(Parcel.Parcel).filter(
-            Parcel.Parcel.id == parcel_id
-        ).first()
+        parcel = await get_parcel_repository().get(parcel_id)
 
         if not parcel:
             return _safe_json_response(False, error=f"Parcela {parcel_id} no encontrada")
 
         try:
-            lat, lon = _extract_coordinates(parcel.location)
+            lat, lon = _parcel_coordinates(parcel)
         except ValueError as e:
             return _safe_json_response(False, error=str(e))
 
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days_back)
 
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "daily": "precipitation_sum,precipitation_hours",
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat(),
-            "timezone": "America/Bogota"
-        }
+        data = await fetch_daily_precipitation(lat, lon, start_date, end_date)
 
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        precipitation_data = data['daily']['precipitation_sum']
-        precipitation_hours = data['daily'].get(
-            'precipitation_hours', [0] * len(precipitation_data))
-        dates = data['daily']['time']
-
-        total_precipitation = sum(precipitation_data)
-        total_hours = sum(precipitation_hours)
-
-        # Análisis de suficiencia (umbral: 25mm/semana para cultivos)
-        days_period = len(precipitation_data)
-        weekly_equivalent = (total_precipitation /
-                             days_period) * 7 if days_period > 0 else 0
-
-        if weekly_equivalent >= 25:
-            interpretation = "Suficiente"
-            irrigation_advice = "No se requiere riego suplementario"
-        elif weekly_equivalent >= 15:
-            interpretation = "Moderado"
-            irrigation_advice = "Monitorear humedad del suelo, considerar riego ligero"
-        else:
-            interpretation = "Insuficiente"
-            irrigation_advice = "Riego suplementario recomendado"
-
-        daily_details = [
-            {
-                "date": date,
-                "precipitation_mm": round(precip, 1),
-                "hours": int(hours)
-            }
-            for date, precip, hours in zip(dates, precipitation_data, precipitation_hours)
-        ]
+        return _safe_json_response(True, _summarize_precipitation(parcel_id, data, start_date, end_date))
+
+    except httpx.HTTPError as e:
+        return _safe_json_response(False, error=f"Error al consultar API: {str(e)}")
+    except Exception as e:
+        return _safe_json_response(False, error=f"Error inesperado: {str(e)}")
+
+
+@tool
+async def get_precipitation_data_for_parcels(parcel_ids: List[int], days_back: int = 7) -> str:
+    """
+    Obtiene la precipitación reciente de VARIAS parcelas en una sola consulta.
+    Úsala para planificar el riego de todas las parcelas del usuario a la vez.
+    Parámetros:
+    - parcel_ids: Lista de IDs de parcelas
+    - days_back: Días hacia atrás (por defecto 7, máximo 16 con API gratuita)
+    """
+    if days_back > 16:
+        return _safe_json_response(False,
+                                   error="La API gratuita solo permite hasta 16 días de historial")
+
+    try:
+        parcels = await get_parcel_repository().get_many(parcel_ids)
+
+        found_ids = {parcel.id for parcel in parcels}
+        missing_ids = [pid for pid in parcel_ids if pid not in found_ids]
+
+        results = await fetch_precipitation_for_parcels(parcels, days_back)
 
         return _safe_json_response(True, {
-            "parcel_id": parcel_id,
-            "period": f"{start_date} a {end_date}",
-            "days_analyzed": days_period,
-            "total_precipitation_mm": round(total_precipitation, 2),
-            "total_precipitation_hours": total_hours,
-            "daily_average_mm": round(total_precipitation / days_period, 2) if days_period > 0 else 0,
-            "weekly_equivalent_mm": round(weekly_equivalent, 2),
-            "interpretation": interpretation,
-            "irrigation_advice": irrigation_advice,
-            "daily_data": daily_details
+            "parcels": [results[parcel.id] for parcel in parcels],
+            "not_found": missing_ids
         })
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         return _safe_json_response(False, error=f"Error al consultar API: {str(e)}")
     except Exception as e:
         return _safe_json_response(False, error=f"Error inesperado: {str(e)}")
-    finally:
-        db.close()
         
 @tool
-def get_weather_forecast(location: str) -> str:
+async def get_weather_forecast(location: str) -> str:
     """
     Obtiene pronóstico del tiempo actual.
     Formatos: '4.65,-74.05' (coordenadas) o 'Bogota,CO' (ciudad).
     """
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
-    params = {
-        "appid": OPENWEATHER_API_KEY,
-        "units": "metric",
-        "lang": "es"
-    }
-
     try:
         # Intentar parsear como coordenadas
         if "," in location:
             try:
                 lat, lon = _extract_coordinates(location)
-                params["lat"] = lat
-                params["lon"] = lon
+                data = await fetch_current_weather(lat=lat, lon=lon)
             except ValueError:
                 # Si falla, es nombre de ciudad con país (ej: "Bogota,CO")
-                params["q"] = location
+                data = await fetch_current_weather(query=location)
         else:
-            params["q"] = location
-
-        response = requests.get(base_url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+            data = await fetch_current_weather(query=location)
 
         return _safe_json_response(True, {
             "location": data.get('name', 'Ubicación'),
@@ -325,9 +363,9 @@ def get_weather_forecast(location: str) -> str:
             )
         })
 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         return _safe_json_response(False, error="Timeout al conectar con API de clima")
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 401:
             return _safe_json_response(False, error="API Key inválida para OpenWeather")
         elif e.response.status_code == 404:
@@ -337,7 +375,7 @@ def get_weather_forecast(location: str) -> str:
         return _safe_json_response(False, error=f"Error inesperado: {str(e)}")
 
 @tool
-def estimate_soil_moisture_deficit(parcel_id: int, crop_type: str, days_since_rain: int) -> str:
+async def estimate_soil_moisture_deficit(parcel_id: int, crop_type: str, days_since_rain: int) -> str:
     """
     Estima déficit de humedad del suelo (útil sin sensores).
 
@@ -361,11 +399,8 @@ def estimate_soil_moisture_deficit(parcel_id: int, crop_type: str, days_since_ra
         'default': 4.0
     }
 
-    db = SessionLocal()
     try:
-        parcel = db.query(Parcel.Parcel).filter(
-            Parcel.Parcel.id == parcel_id
-        ).first()
+        parcel = await get_parcel_repository().get(parcel_id)
 
         if not parcel:
             return _safe_json_response(False, error=f"Parcela {parcel_id} no encontrada")
@@ -412,8 +447,6 @@ def estimate_soil_moisture_deficit(parcel_id: int, crop_type: str, days_since_ra
 
     except Exception as e:
         return _safe_json_response(False, error=f"Error en estimación: {str(e)}")
-    finally:
-        db.close()
 
 
 
@@ -1,10 +1,13 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, AsyncSessionLocal
 from app.core.config import SECRET_KEY, ALGORITHM
-from app.db.models.user import User 
+from app.core.user_cache import user_cache
+from app.db.models.user import User
+from app.schemas.user import TokenClaims
 from jose import jwt, JWTError
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"/api/v1/auth/login")
@@ -16,32 +19,70 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """
-    Decodifica el token JWT para obtener el usuario actual.
-    Esta es la función de dependencia que protegerá nuestros endpoints.
-    """
-    credentials_exception = HTTPException(
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Sesión asíncrona (asyncpg) para los endpoints `async def`."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> TokenClaims:
+    """
+    Valida el JWT y devuelve sus claims sin consultar la base de datos.
+    Para endpoints que solo necesitan el id del usuario para filtrar sus datos.
+    """
+    credentials_exception = _credentials_exception()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        
+
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        
+
         user_id: int = payload.get("user_id")
         if user_id is None:
             raise credentials_exception
 
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    
-    return user
\ No newline at end of file
+
+    return TokenClaims(user_id=user_id, email=email, username=payload.get("username"))
+
+def _validated_user(user: Optional[User], claims: TokenClaims) -> User:
+    """El usuario debe existir y seguir teniendo el email con el que se emitió el token."""
+    if user is None or user.email != claims.email:
+        raise _credentials_exception()
+    return user
+
+def get_current_user(claims: TokenClaims = Depends(get_token_claims), db: Session = Depends(get_db)) -> User:
+    """
+    Decodifica el token JWT para obtener el usuario actual.
+    Esta es la función de dependencia que protegerá nuestros endpoints.
+    Si el usuario está en caché se incorpora a la sesión sin consultar la base de datos.
+    """
+    cached = user_cache.get(claims.user_id)
+    if cached is not None:
+        return db.merge(_validated_user(cached, claims), load=False)
+
+    user = _validated_user(db.get(User, claims.user_id), claims)
+    user_cache.put(user)
+    return user
+
+async def get_current_user_async(claims: TokenClaims = Depends(get_token_claims), db: AsyncSession = Depends(get_async_db)) -> User:
+    """
+    Variante asíncrona de `get_current_user` para endpoints `async def`.
+    No carga relaciones (una sesión asíncrona no admite carga perezosa): las
+    parcelas del chat vienen de la proyección de `services/user_parcels`.
+    """
+    cached = user_cache.get(claims.user_id)
+    if cached is not None:
+        return await db.merge(_validated_user(cached, claims), load=False)
+
+    user = _validated_user(await db.get(User, claims.user_id), claims)
+    user_cache.put(user)
+    return user
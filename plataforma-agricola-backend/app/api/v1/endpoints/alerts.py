@@ -1,27 +1,123 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy import func, tuple_, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from app.db.session import get_db 
 from app.db.models.alert import Alert
-from app.db.models.user import User
 
-from app.schemas.alert import Alert as AlertSchema
+from app.schemas.alert import Alert as AlertSchema, AlertsMarkRead
+from app.utils.pagination import encode_cursor, decode_cursor
 
-from app.api.deps import get_current_user
+from app.api.deps import get_token_claims
+from app.schemas.user import TokenClaims
+
+import hashlib
 
 router = APIRouter()
 
+def _parse_cursor(cursor: str):
+    try:
+        timestamp, alert_id = decode_cursor(cursor)
+        # Un timestamp que no es ISO 8601 llegaría a PostgreSQL como DataError (500)
+        if not isinstance(timestamp, datetime):
+            timestamp = datetime.fromisoformat(timestamp)
+        return timestamp, int(alert_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
 @router.get("/", response_model=List[AlertSchema])
 def get_my_alerts(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor para pedir la página siguiente"),
+    since: Optional[str] = Query(None, description="Valor de X-Latest-Cursor; devuelve solo alertas más recientes"),
+    include_read: bool = False,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    claims: TokenClaims = Depends(get_token_claims)
 ):
     """
-    Obtiene todas las alertas no leídas para el usuario actual.
+    Obtiene las alertas del usuario actual (por defecto, solo las no leídas),
+    de la más reciente a la más antigua y paginadas por cursor (timestamp, id).
+
+    Con `since` (sondeo) se devuelven las `limit` alertas más antiguas posteriores
+    al cursor, de modo que si llegaron más de `limit` ninguna se salta: el
+    cliente vuelve a sondear con el nuevo X-Latest-Cursor hasta recibir menos
+    de `limit`. La respuesta sigue ordenada de la más reciente a la más antigua.
+
+    Cabeceras de respuesta:
+        X-Next-Cursor: página siguiente (ausente si no hay más; no aplica con `since`).
+        X-Latest-Cursor: alerta más reciente devuelta, para sondear con `since`.
+        ETag: estado del feed; con If-None-Match se responde 304 si no cambió.
     """
-    alerts = db.query(Alert).filter(
-        Alert.user_id == current_user.id,
+    base_filter = [Alert.user_id == claims.user_id]
+    if not include_read:
+        base_filter.append(Alert.is_read == False)
+
+    # ETag barato a partir del índice (user_id, is_read, timestamp): cambia al crear o leer alertas
+    if cursor is None:
+        # read_count: con include_read=true, marcar como leídas no cambia los demás valores
+        count, read_count, last_id, last_timestamp = db.query(
+            func.count(Alert.id),
+            func.count(Alert.id).filter(Alert.is_read == True),
+            func.max(Alert.id),
+            func.max(Alert.timestamp)
+        ).filter(*base_filter).one()
+        etag_source = f"{claims.user_id}:{include_read}:{since}:{limit}:{count}:{read_count}:{last_id}:{last_timestamp}"
+        etag = f'W/"{hashlib.sha1(etag_source.encode("utf-8")).hexdigest()}"'
+
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+
+    query = db.query(Alert).filter(*base_filter)
+
+    if cursor:
+        query = query.filter(tuple_(Alert.timestamp, Alert.id) < _parse_cursor(cursor))
+    if since:
+        query = query.filter(tuple_(Alert.timestamp, Alert.id) > _parse_cursor(since))
+        # Sondeo: desde el cursor hacia adelante, para entregar primero las más antiguas
+        alerts = query.order_by(Alert.timestamp.asc(), Alert.id.asc()).limit(limit).all()
+        latest = alerts[-1] if alerts else None
+        response.headers["X-Latest-Cursor"] = encode_cursor(latest.timestamp, latest.id) if latest else since
+        return list(reversed(alerts))
+
+    alerts = query.order_by(Alert.timestamp.desc(), Alert.id.desc()).limit(limit + 1).all()
+
+    if len(alerts) > limit:
+        alerts = alerts[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(alerts[-1].timestamp, alerts[-1].id)
+    if alerts:
+        latest = alerts[0]
+        response.headers["X-Latest-Cursor"] = encode_cursor(latest.timestamp, latest.id)
+
+    return alerts
+
+@router.post("/mark-read")
+def mark_alerts_read(
+    payload: AlertsMarkRead,
+    db: Session = Depends(get_db),
+    claims: TokenClaims = Depends(get_token_claims)
+):
+    """
+    Marca como leídas, en una sola sentencia, las alertas indicadas por ID o
+    todas las no leídas hasta un cursor (inclusive).
+    """
+    if not payload.alert_ids and not payload.up_to_cursor:
+        raise HTTPException(status_code=400, detail="Indica alert_ids o up_to_cursor")
+
+    statement = update(Alert).where(
+        Alert.user_id == claims.user_id,
         Alert.is_read == False
-    ).order_by(Alert.timestamp.desc()).all()
-    return alerts
\ No newline at end of file
+    )
+    if payload.alert_ids:
+        statement = statement.where(Alert.id.in_(payload.alert_ids))
+    if payload.up_to_cursor:
+        statement = statement.where(tuple_(Alert.timestamp, Alert.id) <= _parse_cursor(payload.up_to_cursor))
+
+    result = db.execute(statement.values(is_read=True).execution_options(synchronize_session=False))
+    db.commit()
+
+    return {"updated": result.rowcount}
@@ -1,24 +1,30 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.models.chat import ChatMessage
 from app.db.models.user import User
 from app.schemas.chat import ChatRequest, MessageResponse
-from app.services.chat_service import run_agent_graph, load_chat_history_api
-from app.api.deps import get_current_user
+from app.services.chat_service import run_agent_graph, stream_agent_graph, load_chat_history_api
+from app.services.blob_store import blob_store
+from app.api.deps import get_async_db, get_current_user_async, get_token_claims
+from app.schemas.user import TokenClaims
 
 from typing import List
 
 router = APIRouter()
 
 @router.post("/", response_model=List[MessageResponse])
-async def handle_chat(request: ChatRequest, current_user: User = Depends(get_current_user)):
+async def handle_chat(request: ChatRequest, current_user: User = Depends(get_current_user_async)):
     """
-    Recibe un mensaje y devuelve el historial completo (Lista).
+    Recibe un mensaje y devuelve solo los mensajes nuevos del turno (usuario + IA).
+    El historial previo se restaura desde el checkpointer del hilo del usuario.
     """
     chat_history_updated = await run_agent_graph(
         user_info={
             "id": current_user.id, 
             "username": current_user.full_name, 
-            "parcels": [p.name for p in current_user.parcels],
             "email": current_user.email
         }, 
         user_query=request.message,
@@ -27,9 +33,67 @@ async def handle_chat(request: ChatRequest, current_user: User = Depends(get_cur
     
     return chat_history_updated
 
+@router.post("/stream")
+async def handle_chat_stream(request: ChatRequest, current_user: User = Depends(get_current_user_async)):
+    """
+    Recibe un mensaje y transmite la ejecución de los agentes como Server-Sent Events
+    (decisiones del supervisor, progreso de herramientas y tokens de la respuesta).
+    """
+    user_info = {
+        "id": current_user.id,
+        "username": current_user.full_name,
+        "email": current_user.email
+    }
+
+    return StreamingResponse(
+        stream_agent_graph(
+            user_info=user_info,
+            user_query=request.message,
+            image_base64=request.image_base64,
+        ),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.get("/history", response_model=List[MessageResponse])
-def handle_chat_history(current_user: User = Depends(get_current_user)):
+async def handle_chat_history(claims: TokenClaims = Depends(get_token_claims)):
     """
     Carga el historial de chat para el usuario autenticado.
     """
-    return load_chat_history_api(current_user.id)
\ No newline at end of file
+    return await load_chat_history_api(claims.user_id)
+
+# El contenido de un hash no cambia nunca: el cliente puede cachearlo indefinidamente
+ATTACHMENT_CACHE_HEADERS = {"Cache-Control": "private, max-age=31536000, immutable"}
+
+async def _owned_attachment(digest: str, user_id: int, db: AsyncSession) -> None:
+    """Solo se sirven adjuntos que aparecen en mensajes del propio usuario."""
+    owned = await db.scalar(
+        select(exists().where(ChatMessage.user_id == user_id, ChatMessage.attachement == digest))
+    )
+    if not owned:
+        raise HTTPException(status_code=404, detail="Adjunto no encontrado")
+
+@router.get("/attachments/{digest}")
+async def get_attachment(digest: str, claims: TokenClaims = Depends(get_token_claims), db: AsyncSession = Depends(get_async_db)):
+    """
+    Devuelve la imagen original de un adjunto del chat.
+    """
+    await _owned_attachment(digest, claims.user_id, db)
+    path = blob_store.path(digest)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Adjunto no encontrado")
+    return FileResponse(path, media_type=blob_store.media_type(path), headers=ATTACHMENT_CACHE_HEADERS)
+
+@router.get("/attachments/{digest}/thumbnail")
+async def get_attachment_thumbnail(digest: str, claims: TokenClaims = Depends(get_token_claims), db: AsyncSession = Depends(get_async_db)):
+    """
+    Devuelve la miniatura JPEG de un adjunto (la URL que trae el historial).
+    """
+    await _owned_attachment(digest, claims.user_id, db)
+    path = blob_store.thumbnail_path(digest)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Adjunto no encontrado")
+    return FileResponse(path, media_type=blob_store.media_type(path), headers=ATTACHMENT_CACHE_HEADERS)
@@ -3,11 +3,11 @@ from sqlalchemy.orm import Session
 from typing import Optional, List
 
 from app.db.session import get_db
-from app.db.models.user import User
 from app.db.models.parcel import Parcel
 from app.db.models.kpi import KPIMetric
 
-from app.api.deps import get_current_user
+from app.api.deps import get_token_claims
+from app.schemas.user import TokenClaims
 
 from app.schemas.kpi import KPIMetricCreate, KPIMetricResponse
 
@@ -18,7 +18,7 @@ def log_kpi_metric(
     parcel_id: int,
     metric: KPIMetricCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    claims: TokenClaims = Depends(get_token_claims)
 ):
     """
     Registra una nueva medición de KPI para una parcela específica.
@@ -26,7 +26,7 @@ def log_kpi_metric(
     """
     db_parcel = db.query(Parcel).filter(
         Parcel.id == parcel_id,
-        Parcel.owner_id == current_user.id
+        Parcel.owner_id == claims.user_id
     ).first()
 
     if not db_parcel:
@@ -46,7 +46,7 @@ def get_kpi_history(
     parcel_id: int,
     kpi_name: Optional[str] = None, # Opcional: filtrar por un KPI específico
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    claims: TokenClaims = Depends(get_token_claims)
 ):
     """
     Obtiene el historial de métricas para una parcela.
@@ -1,19 +1,50 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.services.monitoring_service import run_proactive_monitoring
+from app.db.session import get_db, database_pool_stats
+from app.db.models.monitoring import MonitoringRun
+from app.services.monitoring_service import enqueue_monitoring_run
 
 router = APIRouter()
 
 @router.post("/trigger-monitoring", status_code=202)
-def trigger_monitoring_endpoint(
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
+def trigger_monitoring_endpoint(db: Session = Depends(get_db)):
     """
-    Dispara el proceso de monitoreo proactivo en segundo plano.
-    La API responde inmediatamente mientras la tarea se ejecuta.
+    Encola un ciclo de monitoreo proactivo para el worker (`python -m app.worker`).
+    La API responde inmediatamente; el barrido no corre en los procesos de la API.
     """
-    print("-- [API] Recibida solicitud para iniciar monitoreo en segundo plano. --")
-    background_tasks.add_task(run_proactive_monitoring, db)
-    return {"message": "El monitoreo proactivo ha sido iniciado en segundo plano."}
\ No newline at end of file
+    print("-- [API] Recibida solicitud para encolar el monitoreo proactivo. --")
+    run = enqueue_monitoring_run(db, trigger="manual")
+    return {
+        "message": "El monitoreo proactivo ha sido encolado.",
+        "run_id": run.id,
+        "status": run.status
+    }
+
+@router.get("/monitoring-runs/{run_id}")
+def get_monitoring_run(run_id: int, db: Session = Depends(get_db)):
+    """
+    Estado, progreso y métricas de una ejecución del monitoreo.
+    """
+    run = db.get(MonitoringRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Ejecución de monitoreo no encontrada")
+
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "trigger": run.trigger,
+        "requested_at": run.requested_at,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "last_parcel_id": run.last_parcel_id,
+        "stats": run.stats,
+        "error": run.error
+    }
+
+@router.get("/db-pool")
+def get_db_pool_stats():
+    """
+    Métricas del pool de conexiones de este proceso de la API: conexiones en uso,
+    desborde y tiempos de espera. Sirven para dimensionar DB_POOL_SIZE y DB_MAX_OVERFLOW.
+    """
+    return database_pool_stats()
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.schemas.parcel import Parcel as ParcelShema, ParcelCreate, ParcelUpdate
+from app.schemas.parcel import Parcel as ParcelShema, ParcelCreate, ParcelUpdate, ParcelFields, ParcelImportResult
 
 from app.db.models.parcel import Parcel
 from app.db.models.user import User
 from app.db.session import get_db
+from app.core.config import PARCEL_PAGE_SIZE, PARCEL_PAGE_MAX
+from app.services.parcel_import import import_parcels, iter_csv_records, iter_geojson_records
+from app.utils.pagination import encode_cursor, decode_cursor
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_token_claims
+from app.schemas.user import TokenClaims
+
+import csv
 
 router = APIRouter()
 
@@ -28,21 +34,92 @@ def create_parcel_for_current_user(
     db.refresh(db_parcel)
     return db_parcel
 
-@router.get("/", response_model=List[ParcelShema])
+# Campos que se pueden pedir en `fields` (los de la respuesta completa)
+PARCEL_FIELDS = tuple(ParcelShema.model_fields)
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(PARCEL_FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in PARCEL_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(PARCEL_FIELDS)}"
+        )
+    # El id siempre se incluye: es la clave del cursor
+    return ["id"] + [field for field in dict.fromkeys(selected) if field != "id"]
+
+def _parse_cursor(cursor: str) -> int:
+    try:
+        (parcel_id,) = decode_cursor(cursor)
+        return int(parcel_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+@router.get("/", response_model=List[ParcelFields], response_model_exclude_unset=True)
 def read_parcels_for_current_user(
+    response: Response,
+    limit: int = Query(PARCEL_PAGE_SIZE, ge=1, le=PARCEL_PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor para pedir la página siguiente"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por coma (por defecto, todos)"),
+    db: Session = Depends(get_db),
+    claims: TokenClaims = Depends(get_token_claims)
+):
+    """
+    Obtiene las parcelas del usuario actual ordenadas por id y paginadas por
+    cursor (keyset sobre ix_parcels_owner_projection). Con `fields` solo se
+    leen y devuelven esas columnas (por ejemplo `fields=id,name,latitude,longitude`).
+
+    Cabeceras de respuesta:
+        X-Next-Cursor: página siguiente (ausente si no hay más).
+    """
+    selected = _parse_fields(fields)
+
+    query = db.query(*(getattr(Parcel, field) for field in selected))\
+        .filter(Parcel.owner_id == claims.user_id)
+    if cursor:
+        query = query.filter(Parcel.id > _parse_cursor(cursor))
+
+    rows = query.order_by(Parcel.id).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].id)
+
+    return [ParcelFields(**row._asdict()) for row in rows]
+
+@router.post("/import", response_model=ParcelImportResult)
+def import_parcels_for_current_user(
+    file: UploadFile = File(..., description="GeoJSON (.geojson, .geojsonl) o CSV (.csv) con las parcelas"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Obtiene todas las parcelas del usuario actual con información completa.
+    Importa parcelas en bloque desde un archivo GeoJSON (FeatureCollection o
+    secuencia de Features, p. ej. `ogr2ogr -f GeoJSONSeq` de un shapefile) o CSV.
+    Los registros se validan por lotes en paralelo; los inválidos se omiten y
+    se reportan con su fila, y los válidos se insertan en una sola transacción.
+    Si no se indica el área se calcula a partir del polígono.
     """
-    return current_user.parcels
+    filename = (file.filename or "").lower()
+    if filename.endswith(".csv"):
+        records = iter_csv_records(file.file)
+    elif filename.endswith((".geojson", ".geojsonl", ".geojsons", ".json")):
+        records = iter_geojson_records(file.file)
+    else:
+        raise HTTPException(status_code=415, detail="Formato no soportado: usa .geojson, .geojsonl o .csv")
+
+    try:
+        return import_parcels(db, current_user.id, records)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"No se pudo importar el archivo: {e}")
 
 @router.get("/{parcel_id}", response_model=ParcelShema)
 def read_parcel(
     parcel_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    claims: TokenClaims = Depends(get_token_claims)
 ):
     """
     Obtiene detalles completos de una parcela específica incluyendo
@@ -50,7 +127,7 @@ def read_parcel(
     """
     parcel = db.query(Parcel).filter(
         Parcel.id == parcel_id,
-        Parcel.owner_id == current_user.id
+        Parcel.owner_id == claims.user_id
     ).first()
     
     if not parcel:
@@ -63,7 +140,7 @@ def update_parcel(
     parcel_id: int,
     parcel_update: ParcelUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    claims: TokenClaims = Depends(get_token_claims)
 ):
     """
     Actualiza información de una parcela existente.
@@ -72,7 +149,7 @@ def update_parcel(
     """
     db_parcel = db.query(Parcel).filter(
         Parcel.id == parcel_id,
-        Parcel.owner_id == current_user.id
+        Parcel.owner_id == claims.user_id
     ).first()
     
     if not db_parcel:
@@ -92,14 +169,14 @@ def update_parcel(
 def delete_parcel(
     parcel_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    claims: TokenClaims = Depends(get_token_claims)
 ):
     """
     Elimina una parcela y todas sus recomendaciones y métricas asociadas.
     """
     db_parcel = db.query(Parcel).filter(
         Parcel.id == parcel_id,
-        Parcel.owner_id == current_user.id
+        Parcel.owner_id == claims.user_id
     ).first()
     
     if not db_parcel:
@@ -16,6 +16,103 @@ DATOS_GOV_API_KEY: str = os.getenv("DATOS_GOV_API_KEY")
 DATOS_GOV_USER: str = os.getenv("DATOS_GOV_USER")
 DATOS_GOV_PASSWORD: str = os.getenv("DATOS_GOV_PASSWORD")
 
+# Pool de conexiones a PostgreSQL. El perfil (api, worker, scripts) fija tamaño,
+# desborde y espera máxima; las variables DB_POOL_SIZE, DB_MAX_OVERFLOW y
+# DB_POOL_TIMEOUT_SECONDS lo sobrescriben. Con DB_PGBOUNCER=true la aplicación no
+# mantiene pool propio (PgBouncer en modo transaction).
+DB_POOL_PROFILE: str = os.getenv("DB_POOL_PROFILE", "api")
+DB_POOL_SIZE: int | None = int(os.getenv("DB_POOL_SIZE")) if os.getenv("DB_POOL_SIZE") else None
+DB_MAX_OVERFLOW: int | None = int(os.getenv("DB_MAX_OVERFLOW")) if os.getenv("DB_MAX_OVERFLOW") else None
+DB_POOL_TIMEOUT_SECONDS: float | None = float(os.getenv("DB_POOL_TIMEOUT_SECONDS")) if os.getenv("DB_POOL_TIMEOUT_SECONDS") else None
+DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 300))
+DB_PGBOUNCER: bool = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+# Conexión directa a PostgreSQL (sin PgBouncer) para el lock de instancia única
+# del worker. Es un advisory lock de sesión: en modo transaction, PgBouncer puede
+# tomarlo y liberarlo en conexiones de servidor distintas (el lock se fuga o no
+# excluye a otro worker). Obligatoria con DB_PGBOUNCER=true; si no, DATABASE_URL.
+WORKER_LOCK_DATABASE_URL: str | None = os.getenv("WORKER_LOCK_DATABASE_URL")
+
+# Listado de parcelas (keyset) e importación masiva: tamaño de página por defecto
+# y máximo, filas por lote validado/insertado, hilos de validación y límite de filas
+PARCEL_PAGE_SIZE: int = int(os.getenv("PARCEL_PAGE_SIZE", 100))
+PARCEL_PAGE_MAX: int = int(os.getenv("PARCEL_PAGE_MAX", 1000))
+PARCEL_IMPORT_CHUNK_SIZE: int = int(os.getenv("PARCEL_IMPORT_CHUNK_SIZE", 500))
+PARCEL_IMPORT_WORKERS: int = int(os.getenv("PARCEL_IMPORT_WORKERS", 4))
+PARCEL_IMPORT_MAX_ROWS: int = int(os.getenv("PARCEL_IMPORT_MAX_ROWS", 50000))
+
+# Adjuntos del chat: almacén por contenido (sha256) en el volumen de uploads,
+# con miniaturas JPEG del lado mayor indicado
+UPLOADS_DIR: str = os.getenv("UPLOADS_DIR", "uploads")
+ATTACHMENT_THUMBNAIL_SIZE: int = int(os.getenv("ATTACHMENT_THUMBNAIL_SIZE", 320))
+ATTACHMENT_MAX_BYTES: int = int(os.getenv("ATTACHMENT_MAX_BYTES", 10 * 1024 * 1024))
+
+# Caché en proceso de usuarios autenticados (evita la consulta por petición)
+USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", 1024))
+# Proyección de parcelas por usuario (id, nombre, cultivo, etapa) que recibe el grafo
+USER_PARCELS_CACHE_TTL_SECONDS: int = int(os.getenv("USER_PARCELS_CACHE_TTL_SECONDS", 300))
+
+# Memoria de conversación (checkpointer de LangGraph): memory, sqlite o postgres.
+# memory solo vale con un único proceso de la API (WEB_CONCURRENCY, el número de
+# workers de gunicorn): cada worker tendría su propia copia de los hilos
+WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", 1))
+CHECKPOINTER_BACKEND: str = os.getenv("CHECKPOINTER_BACKEND", "memory")
+CHECKPOINTER_DATABASE_URL: str = os.getenv("CHECKPOINTER_DATABASE_URL", os.getenv("DATABASE_URL"))
+CHECKPOINTER_SQLITE_PATH: str = os.getenv("CHECKPOINTER_SQLITE_PATH", "logs/checkpoints.sqlite")
+
+# Compactación de memoria: turnos recientes que se conservan literalmente y
+# límite de caracteres por mensaje al reenviarlo al supervisor
+MEMORY_RECENT_TURNS: int = int(os.getenv("MEMORY_RECENT_TURNS", 3))
+MEMORY_MAX_MESSAGE_CHARS: int = int(os.getenv("MEMORY_MAX_MESSAGE_CHARS", 4000))
+MEMORY_MAX_TOOL_CHARS: int = int(os.getenv("MEMORY_MAX_TOOL_CHARS", 1500))
+
+# Presupuesto por conversación (turno): saltos supervisor -> agente, llamadas
+# a LLM, tokens y tiempo máximo antes de sintetizar con lo que se tenga
+MAX_AGENT_HOPS: int = int(os.getenv("MAX_AGENT_HOPS", 6))
+MAX_LLM_CALLS: int = int(os.getenv("MAX_LLM_CALLS", 30))
+MAX_CONVERSATION_TOKENS: int = int(os.getenv("MAX_CONVERSATION_TOKENS", 120000))
+CONVERSATION_DEADLINE_SECONDS: float = float(os.getenv("CONVERSATION_DEADLINE_SECONDS", 90))
+
+# Caché de respuestas de LLM deterministas (temperatura 0)
+LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "logs/llm_cache.sqlite")
+LLM_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", 6 * 3600))
+
+# Cliente HTTP compartido para APIs externas (clima, etc.)
+HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", 10))
+HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 50))
+HTTP_MAX_KEEPALIVE: int = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+HTTP_MAX_RETRIES: int = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_SECONDS: float = float(os.getenv("HTTP_BACKOFF_SECONDS", 0.5))
+
+# Caché de clima por celda geográfica: precisión del geohash (5 ≈ 4.9 km),
+# tamaño del LRU en proceso y backend compartido opcional (memory, sqlite o redis)
+WEATHER_CACHE_GEOHASH_PRECISION: int = int(os.getenv("WEATHER_CACHE_GEOHASH_PRECISION", 5))
+WEATHER_CACHE_MAX_ENTRIES: int = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", 2048))
+WEATHER_CACHE_BACKEND: str = os.getenv("WEATHER_CACHE_BACKEND", "memory")
+WEATHER_CACHE_SQLITE_PATH: str = os.getenv("WEATHER_CACHE_SQLITE_PATH", "logs/weather_cache.sqlite")
+WEATHER_CACHE_REDIS_URL: str = os.getenv("WEATHER_CACHE_REDIS_URL", "redis://localhost:6379/0")
+# Ubicaciones por petición en las consultas en lote a Open-Meteo
+OPEN_METEO_BULK_CHUNK_SIZE: int = int(os.getenv("OPEN_METEO_BULK_CHUNK_SIZE", 50))
+OPEN_METEO_BULK_CONCURRENCY: int = int(os.getenv("OPEN_METEO_BULK_CONCURRENCY", 4))
+# Histórico diario local por celda (alimenta el análisis de riesgo climático)
+WEATHER_HISTORY_PATH: str = os.getenv("WEATHER_HISTORY_PATH", "logs/weather_history.sqlite")
+# Años previos al período que forman la climatología de referencia (0 = sin climatología)
+CLIMATE_BASELINE_YEARS: int = int(os.getenv("CLIMATE_BASELINE_YEARS", 5))
+
+# Monitoreo proactivo: parcelas por página y días de pronóstico evaluados
+# (nunca menos que el horizonte más largo de las reglas de riesgo)
+MONITORING_PAGE_SIZE: int = int(os.getenv("MONITORING_PAGE_SIZE", 500))
+MONITORING_FORECAST_DAYS: int = int(os.getenv("MONITORING_FORECAST_DAYS", 14))
+# Reintentos de una página fallida (errores del proveedor de clima) antes de
+# registrarla como rango pendiente del ciclo
+MONITORING_PAGE_RETRIES: int = int(os.getenv("MONITORING_PAGE_RETRIES", 2))
+
+# Worker de monitoreo: intervalo de planificación (alineado al reloj, como */N en cron)
+# y frecuencia con la que revisa ejecuciones encoladas por la API
+MONITORING_INTERVAL_MINUTES: int = int(os.getenv("MONITORING_INTERVAL_MINUTES", 60))
+WORKER_POLL_SECONDS: int = int(os.getenv("WORKER_POLL_SECONDS", 30))
+
 if not GOOGLE_API_KEY:
     raise ValueError(
         "No se encontró la GOOGLE_API_KEY en el entorno. Asegúrate de tener un archivo .env válido.")
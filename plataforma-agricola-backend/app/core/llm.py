@@ -5,17 +5,20 @@ from app.core.config import (
     GOOGLE_API_KEY,
     GROQ_API_KEY,
 )
+from app.core.llm_cache import llm_cache
 
 llm_supervisor = ChatGroq(
     model_name="llama3-70b-8192",
     temperature=0,
-    groq_api_key=GROQ_API_KEY
+    groq_api_key=GROQ_API_KEY,
+    cache=llm_cache
 )
 
 llm_water = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",
     temperature=0,
-    google_api_key=GOOGLE_API_KEY
+    google_api_key=GOOGLE_API_KEY,
+    cache=llm_cache
 )
 
 llm_risk = ChatGoogleGenerativeAI(
@@ -33,7 +36,8 @@ llm_supply_chain = ChatGoogleGenerativeAI(
 llm_vision = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",
     temperature=0,
-    google_api_key=GOOGLE_API_KEY
+    google_api_key=GOOGLE_API_KEY,
+    cache=llm_cache
 )
 
 llm_production = ChatGroq(
@@ -53,3 +57,9 @@ llm_kpi = ChatGroq(
     temperature=0,
     groq_api_key=GROQ_API_KEY
 )
+
+llm_summarizer = ChatGoogleGenerativeAI(
+    model="gemini-2.5-flash",
+    temperature=0,
+    google_api_key=GOOGLE_API_KEY
+)
@@ -0,0 +1,117 @@
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+from app.core.config import LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS
+
+from contextvars import ContextVar
+from typing import Any, Optional
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Versión del estado de las parcelas del usuario en el turno actual. Forma parte
+# de la clave: si el usuario edita una parcela, las respuestas previas no se reutilizan.
+parcel_state_version: ContextVar[str] = ContextVar("parcel_state_version", default="")
+
+# Campos que cambian en cada ejecución sin alterar el contenido de la conversación
+_VOLATILE_KEYS = {"id", "tool_call_id", "response_metadata", "usage_metadata"}
+
+
+def _normalize(value: Any) -> Any:
+    """Elimina ids y metadatos volátiles de los mensajes serializados."""
+    if isinstance(value, dict):
+        return {
+            key: _normalize(val)
+            for key, val in value.items()
+            # "id" en el nivel del constructor es la ruta de la clase (lista), se conserva
+            if not (key in _VOLATILE_KEYS and not isinstance(val, list))
+        }
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def normalize_prompt(prompt: str) -> str:
+    try:
+        return json.dumps(_normalize(json.loads(prompt)), sort_keys=True, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return prompt
+
+
+class SQLiteTTLCache(BaseCache):
+    """
+    Caché local de respuestas de LLM con expiración.
+
+    La clave combina el modelo y sus parámetros (incluye el esquema de herramientas
+    enlazadas), los mensajes normalizados y la versión del estado de las parcelas.
+    """
+
+    def __init__(self, database_path: str = LLM_CACHE_PATH, ttl_seconds: int = LLM_CACHE_TTL_SECONDS):
+        directory = os.path.dirname(database_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        raw = "\x00".join([llm_string, normalize_prompt(prompt), parcel_state_version.get()])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        value, expires_at = row
+        if expires_at < time.time():
+            with self._lock:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+            return None
+
+        try:
+            generations = [loads(item) for item in json.loads(value)]
+        except Exception as e:
+            print(f"[LLM-CACHE] Entrada inválida descartada: {e}")
+            return None
+
+        print("[LLM-CACHE] ✓ Respuesta servida desde caché")
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        value = json.dumps([dumps(generation) for generation in return_val])
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl_seconds)
+            )
+            self._conn.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+# Instancia compartida por los modelos deterministas; None desactiva la caché
+llm_cache: Optional[BaseCache] = SQLiteTTLCache() if LLM_CACHE_ENABLED else None
@@ -0,0 +1,66 @@
+from app.core.config import USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES
+from app.db.models.user import User
+
+from cachetools import TTLCache
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from typing import Any, Dict, Optional
+
+import threading
+
+
+class UserCache:
+    """
+    Caché en proceso de usuarios autenticados, indexada por el `user_id` del token.
+
+    Guarda solo los valores de las columnas (no el objeto ORM, que pertenece a la
+    sesión de la petición que lo cargó). En cada acierto se reconstruye una
+    instancia desasociada y se incorpora a la sesión actual con
+    `merge(load=False)`, sin consultar la base de datos. El TTL acota cuánto tarda
+    en verse un cambio hecho desde otro proceso.
+    """
+
+    def __init__(self, ttl: int = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self._entries: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[User]:
+        """Instancia desasociada del usuario, o None si no está en caché."""
+        with self._lock:
+            values = self._entries.get(user_id)
+            if values is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User) -> None:
+        values: Dict[str, Any] = {
+            attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs
+        }
+        with self._lock:
+            self._entries[user.id] = values
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    """Cualquier cambio o eliminación de un usuario descarta su entrada en caché."""
+    user_cache.invalidate(target.id)
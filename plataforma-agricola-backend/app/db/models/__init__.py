@@ -3,4 +3,5 @@ from .parcel import Parcel, CropType, DevelopmentStage
 from .chat import ChatMessage
 from .kpi import KPIMetric, KPILog, WaterCalculation, VisionDiagnostic, RagValidationLog, RiskAlert, RiskEventLog, InterventionEvent, OrchestrationEvent, LatencyLog, FeedbackLog
 from .alert import Alert
-from .recommendation import Recommendation
\ No newline at end of file
+from .recommendation import Recommendation
+from .monitoring import MonitoringRun
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, Date, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -9,9 +9,18 @@ class Alert(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     parcel_id = Column(Integer, ForeignKey("parcels.id"), nullable=False)
-    risk_type = Column(String, index=True)  # "HELADA", "OLA_DE_CALOR", "PLAGA"
+    risk_type = Column(String, index=True)  # "HELADA", "OLA_DE_CALOR", "LLUVIA_INTENSA", "SEQUIA", "PLAGA"
     message = Column(String)
     is_read = Column(Boolean, default=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # Inicio de la ventana de validez del riesgo: una alerta por parcela, riesgo y ventana
+    valid_for = Column(Date, nullable=False, server_default=func.current_date())
 
     user = relationship("User", back_populates="alerts")
+
+    __table_args__ = (
+        # Deduplicación del monitoreo (INSERT ... ON CONFLICT DO NOTHING)
+        UniqueConstraint("parcel_id", "risk_type", "valid_for", name="uq_alerts_parcel_risk_window"),
+        # Feed de alertas del usuario paginado por (timestamp, id)
+        Index("ix_alerts_user_id_is_read_timestamp", "user_id", "is_read", "timestamp"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -11,5 +11,11 @@ class ChatMessage(Base):
     # session_id = Column(String, index=True)
     sender_type = Column(String, nullable=False)  # 'user' o 'ai'
     content = Column(String, nullable=False)
-    attachement = Column(String)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    attachement = Column(String)  # sha256 del adjunto en el almacén de uploads (services/blob_store)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Historial por usuario del más reciente al más antiguo: las consultas con
+        # LIMIT leen solo las primeras entradas del índice, sin ordenar en memoria
+        Index("ix_chat_message_user_id_timestamp", user_id, timestamp.desc(), id.desc()),
+    )
\ No newline at end of file
@@ -215,6 +215,9 @@ class LatencyLog(Base):
     # Desglose de tiempos
     time_breakdown = Column(JSON)  # {supervisor: 0.3, agent: 2.1, db: 0.4}
 
+    # Consumo del presupuesto de la conversación
+    budget_usage = Column(JSON)  # {hops: 2, llm_calls: 5, tokens: 8400, exhausted_by: None}
+
     # Evaluación
     threshold = Column(Float)  # 5s para texto, 10s para imagen
     meets_threshold = Column(Boolean)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+
+class MonitoringRun(Base):
+    """
+    Ejecución del monitoreo proactivo. La API la encola y el worker la ejecuta;
+    last_parcel_id permite reanudar un barrido interrumpido.
+    """
+    __tablename__ = "monitoring_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, index=True, nullable=False, default="pending")  # pending, running, completed, failed
+    trigger = Column(String, nullable=False, default="manual")  # manual, schedule
+    requested_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    # Progreso (keyset sobre parcels.id) y métricas acumuladas del ciclo
+    last_parcel_id = Column(Integer, nullable=False, default=0)
+    stats = Column(JSON)
+    error = Column(String)
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text, Index, event, inspect
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from geoalchemy2 import Geometry
+from geoalchemy2.shape import from_shape
+from shapely.geometry import Point, shape
 from app.db.session import Base
 
 import enum
+import json
 
 class CropType(str, enum.Enum):
     MAIZ = "maiz"
@@ -36,6 +40,18 @@ class Parcel(Base):
     area = Column(Float, nullable=False)  # en hectáreas
     geometry = Column(String)  # Coordenadas
 
+    # Geometría espacial derivada de `geometry` y `location` al guardar (PostGIS,
+    # EPSG:4326). Los consumidores leen estas columnas en lugar de volver a
+    # parsear los strings: punto de la parcela y caja envolvente listos.
+    geom = Column(Geometry(srid=4326, spatial_index=True))  # índice GiST
+    centroid = Column(Geometry("POINT", srid=4326, spatial_index=True))
+    latitude = Column(Float)
+    longitude = Column(Float)
+    bbox_min_lon = Column(Float)
+    bbox_min_lat = Column(Float)
+    bbox_max_lon = Column(Float)
+    bbox_max_lat = Column(Float)
+
     # Información del cultivo
     crop_type = Column(Enum(CropType), index=True)
     development_stage = Column(Enum(DevelopmentStage), index=True)
@@ -62,4 +78,78 @@ class Parcel(Base):
     recommendations = relationship(
         "Recommendation", back_populates="parcel", cascade="all, delete-orphan")
     kpi_metrics = relationship(
-        "KPIMetric", back_populates="parcel", cascade="all, delete-orphan")
\ No newline at end of file
+        "KPIMetric", back_populates="parcel", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Proyección de parcelas por usuario (chat): index-only scan
+        Index(
+            "ix_parcels_owner_projection", "owner_id", "id",
+            postgresql_include=["name", "crop_type", "development_stage"]
+        ),
+    )
+
+    @property
+    def bbox(self):
+        """Caja envolvente (min_lon, min_lat, max_lon, max_lat), o None sin geometría."""
+        if self.bbox_min_lon is None:
+            return None
+        return (self.bbox_min_lon, self.bbox_min_lat, self.bbox_max_lon, self.bbox_max_lat)
+
+
+def _parse_location(location):
+    """Punto (lon, lat) de un string "lat,lon", o None si no es válido."""
+    try:
+        lat, lon = (float(part.strip()) for part in location.split(","))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return Point(lon, lat)
+
+
+def parcel_geometry_values(geometry, location) -> dict:
+    """
+    Columnas espaciales a partir de `geometry` (GeoJSON) y `location` ("lat,lon").
+    El punto de la parcela es `location` si es válido; si no, el centroide del
+    polígono. Un GeoJSON inválido deja la parcela sin geometría.
+    """
+    polygon = None
+    if geometry:
+        try:
+            geojson = json.loads(geometry)
+            polygon = shape(geojson.get("geometry", geojson))
+            if polygon.is_empty:
+                polygon = None
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            print(f"-- [PARCEL] GeoJSON inválido: {e} --")
+
+    point = _parse_location(location)
+    if point is None and polygon is not None:
+        point = polygon.centroid
+
+    bounds = polygon.bounds if polygon is not None else (None, None, None, None)
+    return {
+        "geom": from_shape(polygon, srid=4326) if polygon is not None else None,
+        "centroid": from_shape(polygon.centroid, srid=4326) if polygon is not None else None,
+        "latitude": point.y if point is not None else None,
+        "longitude": point.x if point is not None else None,
+        "bbox_min_lon": bounds[0],
+        "bbox_min_lat": bounds[1],
+        "bbox_max_lon": bounds[2],
+        "bbox_max_lat": bounds[3],
+    }
+
+
+def apply_parcel_geometry(parcel: Parcel) -> None:
+    """Recalcula las columnas espaciales de la parcela (ver `parcel_geometry_values`)."""
+    for key, value in parcel_geometry_values(parcel.geometry, parcel.location).items():
+        setattr(parcel, key, value)
+
+
+@event.listens_for(Parcel, "before_insert")
+@event.listens_for(Parcel, "before_update")
+def _sync_parcel_geometry(mapper, connection, target: Parcel) -> None:
+    """Mantiene las columnas espaciales al crear o al cambiar la geometría o la ubicación."""
+    attrs = inspect(target).attrs
+    if target.id is None or attrs.geometry.history.has_changes() or attrs.location.history.has_changes():
+        apply_parcel_geometry(target)
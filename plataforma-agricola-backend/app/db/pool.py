@@ -0,0 +1,142 @@
+from app.core.config import (
+    DB_POOL_PROFILE,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT_SECONDS,
+    DB_POOL_RECYCLE_SECONDS,
+    DB_PGBOUNCER,
+)
+
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from typing import Any, Dict
+
+import threading
+import time
+
+# Tamaños por perfil de despliegue. La API atiende chats concurrentes (sesiones
+# de endpoints + herramientas de los agentes); el worker procesa una ejecución a
+# la vez; los scripts son de una sola conexión.
+POOL_PROFILES: Dict[str, Dict[str, int]] = {
+    "api": {"pool_size": 10, "max_overflow": 10, "pool_timeout": 10},
+    "worker": {"pool_size": 2, "max_overflow": 2, "pool_timeout": 30},
+    "scripts": {"pool_size": 1, "max_overflow": 0, "pool_timeout": 30},
+}
+
+
+class _PoolWaitStats:
+    """Tiempo de espera acumulado para obtener una conexión del pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, elapsed: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / attempts * 1000, 2) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+
+
+class _WaitTimingMixin:
+    """Mide cuánto espera cada checkout del pool (incluye abrir conexiones nuevas)."""
+
+    wait_stats: _PoolWaitStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    wait_stats = _PoolWaitStats()
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    wait_stats = _PoolWaitStats()
+
+
+def pool_options(is_async: bool = False) -> Dict[str, Any]:
+    """
+    Argumentos de create_engine / create_async_engine según el perfil activo.
+
+    En modo PgBouncer (transaction pooling) el pool lo gestiona PgBouncer: la
+    aplicación no retiene conexiones (NullPool) y asyncpg desactiva su caché de
+    sentencias preparadas, que no sobrevive al cambio de conexión del servidor.
+    Nada que dependa del estado de sesión (advisory locks de sesión, SET) puede
+    pasar por estos motores: el lock del worker usa WORKER_LOCK_DATABASE_URL.
+    """
+    if DB_PGBOUNCER:
+        options: Dict[str, Any] = {"poolclass": NullPool}
+        if is_async:
+            options["connect_args"] = {"statement_cache_size": 0}
+        return options
+
+    profile = dict(POOL_PROFILES.get(DB_POOL_PROFILE, POOL_PROFILES["api"]))
+    if DB_POOL_SIZE is not None:
+        profile["pool_size"] = DB_POOL_SIZE
+    if DB_MAX_OVERFLOW is not None:
+        profile["max_overflow"] = DB_MAX_OVERFLOW
+    if DB_POOL_TIMEOUT_SECONDS is not None:
+        profile["pool_timeout"] = DB_POOL_TIMEOUT_SECONDS
+
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_pre_ping": True,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        **profile,
+    }
+
+
+def async_database_url(database_url: str) -> URL:
+    """URL del motor asíncrono: misma base de datos con el driver asyncpg."""
+    url = make_url(database_url).set(drivername="postgresql+asyncpg")
+    if DB_PGBOUNCER:
+        # El dialecto también cachea sentencias preparadas por conexión
+        url = url.update_query_dict({"prepared_statement_cache_size": "0"})
+    return url
+
+
+def pool_stats(pool) -> Dict[str, Any]:
+    """Estado actual del pool y tiempos de espera acumulados."""
+    if isinstance(pool, NullPool):
+        return {"pool": "NullPool", "pgbouncer": DB_PGBOUNCER}
+
+    stats = {
+        "pool": type(pool).__name__,
+        "profile": DB_POOL_PROFILE,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool.timeout(),
+    }
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        stats["wait"] = wait_stats.snapshot()
+    return stats
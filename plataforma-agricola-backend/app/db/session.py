@@ -1,7 +1,9 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import database_exists, create_database
+from app.db.pool import pool_options, pool_stats, async_database_url
 from dotenv import load_dotenv
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -17,13 +19,24 @@ engine = create_engine(
     connect_args={
         "client_encoding": "utf8"
     },
-    # Configuraciones adicionales
-    pool_pre_ping=True,
-    pool_recycle=300,
+    # Tamaño del pool según el perfil de despliegue (ver app/db/pool.py)
+    **pool_options(),
     echo=False  # Cambia a True si quieres ver las queries SQL
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono (asyncpg) para las rutas y herramientas que corren en el event loop.
+# Comparte la misma base de datos que el motor síncrono; solo cambia el driver.
+ASYNC_SQLALCHEMY_DATABASE_URL = async_database_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    **pool_options(is_async=True),
+    echo=False
+)
+# expire_on_commit=False: los objetos siguen siendo legibles tras el commit sin otra consulta
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
 Base = declarative_base()
 
 def create_database_if_not_exists():
@@ -43,4 +56,15 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def database_pool_stats() -> dict:
+    """Métricas de los pools síncrono y asíncrono del proceso actual."""
+    return {
+        "sync": pool_stats(engine.pool),
+        "async": pool_stats(async_engine.sync_engine.pool),
+    }
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,148 @@
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+
+from app.core.config import (
+    MAX_AGENT_HOPS,
+    MAX_LLM_CALLS,
+    MAX_CONVERSATION_TOKENS,
+    CONVERSATION_DEADLINE_SECONDS,
+)
+from app.utils.helper import get_agent_responses
+
+from typing import Any, Dict, List, Optional
+
+import time
+
+BUDGET_MESSAGES = {
+    "deadline": "se alcanzó el tiempo máximo de respuesta",
+    "max_hops": "se alcanzó el número máximo de consultas a agentes",
+    "max_llm_calls": "se alcanzó el número máximo de llamadas al modelo",
+    "max_tokens": "se alcanzó el límite de tokens de la conversación",
+}
+
+
+class ConversationBudget:
+    """Presupuesto de recursos de una conversación (un turno del usuario).
+
+    Se crea en cada turno y viaja en `config["configurable"]["budget"]`, fuera del
+    estado del grafo, para que no se guarde en el checkpointer.
+    """
+
+    def __init__(
+        self,
+        max_hops: int = MAX_AGENT_HOPS,
+        max_llm_calls: int = MAX_LLM_CALLS,
+        max_tokens: int = MAX_CONVERSATION_TOKENS,
+        deadline_seconds: float = CONVERSATION_DEADLINE_SECONDS,
+        start_time: Optional[float] = None
+    ):
+        self.max_hops = max_hops
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.deadline_seconds = deadline_seconds
+        self.start_time = start_time or time.time()
+
+        self.hops = 0
+        self.llm_calls = 0
+        self.tokens = 0
+        self.exhausted_by: Optional[str] = None
+
+    def register_hop(self) -> None:
+        """Registra un enrutamiento del supervisor hacia un agente."""
+        self.hops += 1
+
+    def register_llm_call(self, tokens: int = 0) -> None:
+        """Registra una llamada a un LLM y los tokens consumidos."""
+        self.llm_calls += 1
+        self.tokens += tokens
+
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
+
+    def exhausted_reason(self) -> Optional[str]:
+        """Devuelve el motivo por el que se agotó el presupuesto, o None."""
+        if self.elapsed() >= self.deadline_seconds:
+            return "deadline"
+        if self.hops >= self.max_hops:
+            return "max_hops"
+        if self.llm_calls >= self.max_llm_calls:
+            return "max_llm_calls"
+        if self.tokens >= self.max_tokens:
+            return "max_tokens"
+        return None
+
+    def usage(self) -> Dict[str, Any]:
+        """Resumen de consumo para registrar junto a la latencia (KA3)."""
+        return {
+            "hops": self.hops,
+            "max_hops": self.max_hops,
+            "llm_calls": self.llm_calls,
+            "max_llm_calls": self.max_llm_calls,
+            "tokens": self.tokens,
+            "max_tokens": self.max_tokens,
+            "elapsed_seconds": round(self.elapsed(), 2),
+            "deadline_seconds": self.deadline_seconds,
+            "exhausted_by": self.exhausted_by,
+        }
+
+
+class BudgetCallbackHandler(BaseCallbackHandler):
+    """Cuenta llamadas a LLM y tokens de todos los nodos del grafo."""
+
+    run_inline = True
+
+    def __init__(self, budget: ConversationBudget):
+        self.budget = budget
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    tokens += usage.get("total_tokens", 0)
+
+        if not tokens and response.llm_output:
+            token_usage = response.llm_output.get("token_usage") or {}
+            tokens = token_usage.get("total_tokens", 0)
+
+        self.budget.register_llm_call(tokens)
+
+
+def budget_run_config(budget: ConversationBudget, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Añade el presupuesto a una configuración de ejecución del grafo.
+
+    El `recursion_limit` actúa como red de seguridad si el supervisor no llega a
+    comprobar el presupuesto (memoria + supervisor/agente por salto + cierre).
+    """
+    config = dict(config or {})
+    config["configurable"] = {**config.get("configurable", {}), "budget": budget}
+    config["callbacks"] = [BudgetCallbackHandler(budget)]
+    config["recursion_limit"] = budget.max_hops * 2 + 4
+    return config
+
+
+def get_budget(config: Optional[RunnableConfig]) -> Optional[ConversationBudget]:
+    """Obtiene el presupuesto de la configuración del nodo, si existe."""
+    if not config:
+        return None
+    return config.get("configurable", {}).get("budget")
+
+
+def build_budget_fallback_response(messages: List[Any], reason: str) -> str:
+    """Sintetiza, sin llamar al LLM, lo que respondieron los agentes hasta el momento."""
+    agent_responses = get_agent_responses(messages)
+    motive = BUDGET_MESSAGES.get(reason, "se agotó el presupuesto de la conversación")
+
+    if not agent_responses:
+        return (
+            f"Disculpa, {motive} antes de poder analizar tu consulta. "
+            "Por favor, intenta con una pregunta más concreta (parcela y tema)."
+        )
+
+    content = f"Te comparto lo que pude analizar ({motive}):\n"
+    for resp in agent_responses:
+        content += f"\n{resp['content']}\n"
+    return content.strip()
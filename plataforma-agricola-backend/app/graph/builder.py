@@ -1,6 +1,8 @@
 from langgraph.graph import StateGraph, END
 
 from app.graph.state import GraphState
+from app.graph.checkpointer import open_checkpointer, close_checkpointer
+from app.graph.memory import memory_compaction_node
 
 from app.agents.supervisor.node import supervisor_agent_node
 from app.agents.water.node import water_agent_node
@@ -15,6 +17,7 @@ import os
 workflow = StateGraph(GraphState)
 
 # Añadir los nodos al grafo
+workflow.add_node("memory_compaction", memory_compaction_node)
 workflow.add_node("supervisor_agent", supervisor_agent_node)
 workflow.add_node("production_agent", production_agent_node)
 workflow.add_node("water_agent", water_agent_node)
@@ -23,8 +26,9 @@ workflow.add_node("risk_agent", risk_agent_node)
 workflow.add_node("vision_agent", vision_agent_node)
 workflow.add_node("sustainability_agent", sustainability_agent_node)
 
-# Punto de entrada
-workflow.set_entry_point("supervisor_agent")
+# Punto de entrada: se compacta la memoria antes de la primera decisión del supervisor
+workflow.set_entry_point("memory_compaction")
+workflow.add_edge("memory_compaction", "supervisor_agent")
 
 # Aristas condicionales
 workflow.add_conditional_edges(
@@ -49,9 +53,34 @@ workflow.add_edge("sustainability_agent", "supervisor_agent")
 workflow.add_edge("vision_agent", "supervisor_agent")
 workflow.add_edge("water_agent", "supervisor_agent")
 
-# Se compila el grafo
+# Se compila el grafo (sin memoria, útil para scripts y para generar la imagen)
 agent_graph = workflow.compile()
 
+# Grafo con checkpointer usado por el chat, se inicializa al arrancar la API
+_checkpointed_graph = None
+
+
+async def init_agent_graph():
+    """Compila el grafo con el checkpointer configurado. Llamar al iniciar la app."""
+    global _checkpointed_graph
+    checkpointer = await open_checkpointer()
+    _checkpointed_graph = workflow.compile(checkpointer=checkpointer)
+    return _checkpointed_graph
+
+
+async def shutdown_agent_graph():
+    """Libera las conexiones del checkpointer. Llamar al apagar la app."""
+    global _checkpointed_graph
+    _checkpointed_graph = None
+    await close_checkpointer()
+
+
+async def get_agent_graph():
+    """Devuelve el grafo con memoria de conversación, inicializándolo si hace falta."""
+    if _checkpointed_graph is None:
+        return await init_agent_graph()
+    return _checkpointed_graph
+
 
 def workflow_img():
     """Función para generar imagen del grafo
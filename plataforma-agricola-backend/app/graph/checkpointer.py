@@ -0,0 +1,85 @@
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.core.config import (
+    CHECKPOINTER_BACKEND,
+    CHECKPOINTER_DATABASE_URL,
+    CHECKPOINTER_SQLITE_PATH,
+    WEB_CONCURRENCY,
+)
+
+import os
+
+# Recursos abiertos por el checkpointer (pool de Postgres o conexión SQLite)
+_resources = []
+
+
+def thread_config(user_id: int) -> dict:
+    """Configuración de LangGraph para el hilo de conversación de un usuario.
+
+    Cada usuario tiene un único hilo, de modo que el estado del grafo
+    (historial incluido) se restaura desde el último checkpoint en cada turno.
+    """
+    return {"configurable": {"thread_id": f"user-{user_id}"}}
+
+
+async def open_checkpointer() -> BaseCheckpointSaver:
+    """Crea el checkpointer configurado en CHECKPOINTER_BACKEND.
+
+    - memory: en memoria del proceso (desarrollo, se pierde al reiniciar).
+      Solo con un worker de la API.
+    - sqlite: archivo local, requiere langgraph-checkpoint-sqlite.
+    - postgres: misma base de datos de la app, requiere langgraph-checkpoint-postgres.
+
+    Raises: RuntimeError si se pide memory con más de un worker (WEB_CONCURRENCY).
+    """
+    backend = (CHECKPOINTER_BACKEND or "memory").lower()
+
+    if backend not in ("postgres", "sqlite") and WEB_CONCURRENCY > 1:
+        # Cada worker guardaría sus propios checkpoints: un hilo atendido por
+        # otro worker retomaría un estado viejo y perdería turnos
+        raise RuntimeError(
+            f"CHECKPOINTER_BACKEND={backend} no se puede usar con WEB_CONCURRENCY={WEB_CONCURRENCY}; "
+            "configura CHECKPOINTER_BACKEND=postgres"
+        )
+
+    if backend == "postgres":
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+        pool = AsyncConnectionPool(
+            conninfo=CHECKPOINTER_DATABASE_URL,
+            max_size=10,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            open=False
+        )
+        await pool.open()
+        _resources.append(pool)
+
+        checkpointer = AsyncPostgresSaver(pool)
+        await checkpointer.setup()
+
+    elif backend == "sqlite":
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        os.makedirs(os.path.dirname(CHECKPOINTER_SQLITE_PATH) or ".", exist_ok=True)
+        conn = await aiosqlite.connect(CHECKPOINTER_SQLITE_PATH)
+        _resources.append(conn)
+
+        checkpointer = AsyncSqliteSaver(conn)
+        await checkpointer.setup()
+
+    else:
+        checkpointer = InMemorySaver()
+
+    print(f"-- [CHECKPOINTER] Backend de memoria de conversación: {backend} --")
+    return checkpointer
+
+
+async def close_checkpointer() -> None:
+    """Cierra las conexiones abiertas por el checkpointer."""
+    while _resources:
+        resource = _resources.pop()
+        await resource.close()
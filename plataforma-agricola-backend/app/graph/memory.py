@@ -0,0 +1,98 @@
+from langchain_core.messages import BaseMessage, AIMessage, ToolMessage, RemoveMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.core.config import MEMORY_RECENT_TURNS, MEMORY_MAX_MESSAGE_CHARS, MEMORY_MAX_TOOL_CHARS
+from app.core.llm import llm_summarizer
+from app.graph.state import GraphState
+from app.prompts.loader import load_prompt
+from app.utils.helper import normalize_agent_output
+
+from typing import List, Optional
+
+import time
+
+TRIM_SUFFIX = " … [recortado]"
+
+# Mensajes que se conservan literalmente: turnos previos (usuario + IA) + consulta actual
+RECENT_MESSAGES = MEMORY_RECENT_TURNS * 2 + 1
+
+# La compactación se hace por lotes para no resumir en cada turno
+COMPACTION_THRESHOLD = RECENT_MESSAGES + MEMORY_RECENT_TURNS * 2
+
+
+def trim_message_payloads(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Recorta el contenido de mensajes extensos antes de reenviarlos a un LLM.
+
+    Las salidas de herramientas (ToolMessage) tienen un límite más estricto que las
+    respuestas de los agentes. Los mensajes originales del estado no se modifican.
+    """
+    trimmed = []
+    for msg in messages:
+        limit = MEMORY_MAX_TOOL_CHARS if isinstance(msg, ToolMessage) else MEMORY_MAX_MESSAGE_CHARS
+        if isinstance(msg.content, str) and len(msg.content) > limit:
+            msg = msg.model_copy(update={"content": msg.content[:limit] + TRIM_SUFFIX})
+        trimmed.append(msg)
+    return trimmed
+
+
+def _format_for_summary(messages: List[BaseMessage]) -> str:
+    """Convierte mensajes del historial en texto plano para el resumidor."""
+    lines = []
+    for msg in messages:
+        speaker = "Asistente" if isinstance(msg, AIMessage) else "Usuario"
+        content = normalize_agent_output(msg.content)
+        if len(content) > MEMORY_MAX_MESSAGE_CHARS:
+            content = content[:MEMORY_MAX_MESSAGE_CHARS] + TRIM_SUFFIX
+        lines.append(f"{speaker}: {content}")
+    return "\n".join(lines)
+
+
+async def summarize_history(previous_summary: Optional[str], messages: List[BaseMessage]) -> str:
+    """Actualiza el resumen acumulado de la conversación con mensajes antiguos."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", load_prompt("memory", "summary.md"))
+    ])
+    chain = prompt | llm_summarizer
+
+    response = await chain.ainvoke({
+        "previous_summary": previous_summary or "Sin resumen previo.",
+        "conversation": _format_for_summary(messages)
+    })
+    return normalize_agent_output(response.content).strip()
+
+
+async def memory_compaction_node(state: GraphState) -> dict:
+    """
+    Compacta la memoria de la conversación antes de que actúe el supervisor.
+
+    Conserva literalmente los últimos MEMORY_RECENT_TURNS turnos y fusiona los
+    mensajes más antiguos en `conversation_summary`, que se guarda en el checkpoint
+    del hilo del usuario. Así el tamaño del prompt se mantiene estable aunque la
+    conversación crezca.
+    """
+    chat_history = state.get("chat_history", [])
+
+    if len(chat_history) <= COMPACTION_THRESHOLD:
+        return {"time_breakdown": state.get("time_breakdown", {})}
+
+    print("-- Node ejecutándose: memory_compaction --")
+    start_time = time.time()
+
+    overflow = chat_history[:-RECENT_MESSAGES]
+    summary = state.get("conversation_summary")
+
+    try:
+        summary = await summarize_history(summary, overflow)
+        print(f"-- [MEMORIA] {len(overflow)} mensajes incorporados al resumen --")
+    except Exception as e:
+        # Si el resumen falla se descartan igualmente los mensajes antiguos para acotar el prompt
+        print(f"-- [MEMORIA-WARNING] No se pudo actualizar el resumen: {e} --")
+
+    time_breakdown = state.get("time_breakdown", {})
+    time_breakdown["memory"] = time.time() - start_time
+
+    return {
+        "conversation_summary": summary,
+        "chat_history": [RemoveMessage(id=msg.id) for msg in overflow],
+        "time_breakdown": time_breakdown
+    }
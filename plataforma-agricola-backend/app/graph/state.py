@@ -9,19 +9,31 @@ class GraphState(TypedDict):
     Atributos:
         messages: La lista de mensajes que componen la conversación.
                   LangGraph se encargará de añadir nuevos mensajes a esta lista.
-        chat_history: Lista de mensajes en el historial de chat.
+        chat_history: Lista de mensajes en el historial de chat. Se persiste en el
+                      checkpointer y se actualiza de forma incremental en cada turno.
+        conversation_summary: Resumen acumulado de los turnos antiguos ya compactados.
         user_id: El ID del usuario que inició la conversación.
-        image_base64: La imagen opcional enviada por el usuario.
+        user_parcels: Proyección de las parcelas del usuario (id, name, crop_type,
+                      development_stage) cargada al inicio del turno.
+        image_digest: sha256 de la imagen opcional enviada por el usuario en el
+                      almacén de adjuntos. La imagen no viaja en el estado para
+                      no copiarla en cada checkpoint.
         reasoning: Razonamiento del supervisor
         info_next_agent: Información para el siguiente agente.
         list_agent: Historial de los agentes usados por el supervisor.
+        next: Siguiente nodo decidido por el supervisor.
+        conversation_id: Identificador del turno actual (métricas y logs).
     """
     messages: Annotated[List[BaseMessage], add_messages]
-    chat_history: List[BaseMessage]
+    chat_history: Annotated[List[BaseMessage], add_messages]
+    conversation_summary: Optional[str]
     user_id: int
-    image_base64: Optional[str]
+    user_parcels: List[dict]
+    image_digest: Optional[str]
     reasoning: Optional[str]
     info_next_agent: Optional[str]
     list_agent: List[str]
+    next: Optional[str]
+    conversation_id: Optional[str]
     total_start_time: float
-    time_breakdown: dict
\ No newline at end of file
+    time_breakdown: dict
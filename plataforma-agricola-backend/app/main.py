@@ -1,11 +1,31 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.router import api_router
+from app.graph.builder import init_agent_graph, shutdown_agent_graph
+from app.services.http_client import close_http_client
+from app.db.session import async_engine
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicializa los recursos compartidos (checkpointer del grafo) al arrancar
+    y los libera al apagar la API (incluido el cliente HTTP compartido y el
+    pool del motor asíncrono de base de datos).
+    """
+    await init_agent_graph()
+    yield
+    await shutdown_agent_graph()
+    await close_http_client()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="Plataforma Multiagrente para Agricultura Sostenible",
     description="API para gestionar la interacción entre agricultores y agentes de IA.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -14,7 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Type"]
+    expose_headers=["Content-Type", "ETag", "X-Next-Cursor", "X-Latest-Cursor"]
 )
 
 app.include_router(api_router, prefix="/v1")
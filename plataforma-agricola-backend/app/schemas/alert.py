@@ -1,10 +1,17 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 
 class Alert(BaseModel):
     id: int
     risk_type: str
     message: str
     timestamp: datetime
+    is_read: bool = False
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class AlertsMarkRead(BaseModel):
+    """Marca alertas como leídas por IDs o todas hasta un cursor (inclusive)."""
+    alert_ids: Optional[List[int]] = None
+    up_to_cursor: Optional[str] = None
@@ -1,6 +1,6 @@
 # app/models/parcel.py
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, create_model
+from typing import List, Optional
 from datetime import datetime
 
 class ParcelBase(BaseModel):
@@ -45,8 +45,27 @@ class Parcel(ParcelBase):
     """Modelo completo de parcela con datos del sistema"""
     id: int
     owner_id: int
+    latitude: Optional[float] = Field(None, description="Latitud del punto de la parcela (calculada al guardar)")
+    longitude: Optional[float] = Field(None, description="Longitud del punto de la parcela (calculada al guardar)")
     created_at: datetime
     updated_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Parcela con solo los campos pedidos en `fields` (listado paginado): todos
+# opcionales, y el endpoint excluye los que no se seleccionaron
+ParcelFields = create_model(
+    "ParcelFields",
+    **{name: (Optional[field.annotation], None) for name, field in Parcel.model_fields.items()}
+)
+
+class ParcelImportError(BaseModel):
+    row: int = Field(..., description="Fila del CSV o número de feature del GeoJSON")
+    error: str
+
+class ParcelImportResult(BaseModel):
+    """Resultado de una importación masiva de parcelas"""
+    inserted: int
+    rejected: int
+    errors: List[ParcelImportError] = Field(default_factory=list, description="Primeros registros rechazados y su motivo")
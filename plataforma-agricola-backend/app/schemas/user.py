@@ -24,4 +24,10 @@ class User(UserBase):
     is_active: bool = True
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# 4. Claims del token de acceso (sin consultar la base de datos)
+class TokenClaims(BaseModel):
+    user_id: int
+    email: str
+    username: Optional[str] = None
@@ -0,0 +1,52 @@
+"""
+Calcula las columnas espaciales (geom, centroid, latitude/longitude y bbox) de
+las parcelas creadas antes de que existieran. Las parcelas nuevas o editadas
+las reciben al guardarse (evento en app/db/models/parcel.py).
+
+Requiere la extensión PostGIS en la base de datos (`CREATE EXTENSION postgis`,
+incluida en la imagen postgis/postgis de docker-compose) y la migración de las
+columnas aplicada. Recorre la tabla por lotes de id; se puede relanzar.
+
+Uso:
+    DB_POOL_PROFILE=scripts python -m app.scripts.backfill_parcel_geometry --batch-size 500
+"""
+
+import argparse
+
+from app.db.session import SessionLocal
+from app.db.models.parcel import Parcel, apply_parcel_geometry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rellena las columnas espaciales de las parcelas")
+    parser.add_argument("--batch-size", type=int, default=500, help="Parcelas por transacción")
+    parser.add_argument("--all", action="store_true", help="Recalcula también las parcelas que ya tienen coordenadas")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        last_id, updated, without_point = 0, 0, 0
+        while True:
+            query = db.query(Parcel).filter(Parcel.id > last_id)
+            if not args.all:
+                query = query.filter(Parcel.latitude.is_(None))
+            batch = query.order_by(Parcel.id).limit(args.batch_size).all()
+            if not batch:
+                break
+
+            for parcel in batch:
+                apply_parcel_geometry(parcel)
+                updated += 1
+                if parcel.latitude is None:
+                    without_point += 1
+            db.commit()
+            last_id = batch[-1].id
+            print(f"Hasta la parcela {last_id}: {updated} procesadas")
+
+        print(f"\n✅ Backfill terminado: {updated} parcelas, {without_point} sin ubicación ni geometría válidas")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark de carga del historial de chat.
+
+Hace crecer la tabla chat_message con usuarios sintéticos hasta cada tamaño
+indicado y mide la consulta real del historial (`recent_messages_query`) para
+uno de ellos. Con el índice ix_chat_message_user_id_timestamp la latencia debe
+mantenerse plana aunque la tabla y el historial del usuario crezcan: el plan
+es un Index Scan + Limit, sin nodo Sort.
+
+Con --compare se repite la medición sin el índice (DROP INDEX dentro de una
+transacción que se revierte) para ver el costo de ordenar el historial completo.
+
+Usar solo contra una base de datos de desarrollo. Los usuarios y mensajes
+sintéticos se eliminan al terminar (salvo con --keep).
+
+Uso:
+    DB_POOL_PROFILE=scripts python -m app.scripts.benchmark_chat_history --sizes 10000 100000 1000000 3000000
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.db.session import SessionLocal
+from app.services.chat_repository import recent_messages_query, HISTORY_API_LIMIT
+
+INDEX_NAME = "ix_chat_message_user_id_timestamp"
+BENCH_EMAIL_DOMAIN = "chat-benchmark.invalid"
+
+
+def create_bench_users(db, count: int) -> List[int]:
+    return db.execute(text(f"""
+        INSERT INTO users (email, full_name, hashed_password, is_active, created_at)
+        SELECT 'user' || g || '@{BENCH_EMAIL_DOMAIN}', 'Benchmark ' || g, '!', true, now()
+        FROM generate_series(1, :count) AS g
+        RETURNING id
+    """), {"count": count}).scalars().all()
+
+
+def grow_messages(db, user_ids: List[int], from_row: int, to_row: int) -> None:
+    """Inserta los mensajes from_row..to_row repartidos entre los usuarios sintéticos."""
+    db.execute(text("""
+        INSERT INTO chat_message (user_id, sender_type, content, timestamp)
+        SELECT (CAST(:user_ids AS integer[]))[1 + (g % :users)],
+               CASE WHEN g % 2 = 0 THEN 'user' ELSE 'ai' END,
+               'Mensaje sintético de benchmark número ' || g,
+               now() - random() * interval '365 days'
+        FROM generate_series(:from_row, :to_row) AS g
+    """), {"user_ids": user_ids, "users": len(user_ids), "from_row": from_row, "to_row": to_row})
+    db.commit()
+    db.execute(text("ANALYZE chat_message"))
+    db.commit()
+
+
+def measure(db, user_id: int, repetitions: int) -> dict:
+    statement = recent_messages_query(user_id, HISTORY_API_LIMIT)
+
+    # Calentamiento: la primera ejecución paga la carga de páginas en caché
+    db.execute(statement).all()
+
+    timings = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        db.execute(statement).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = "\n".join(db.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).scalars().all())
+
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "index_scan": INDEX_NAME in plan,
+        "sorts": "Sort  (" in plan,
+        "plan": plan,
+    }
+
+
+def measure_without_index(db, user_id: int, repetitions: int) -> dict:
+    """Mide sin el índice; el DROP se revierte al final."""
+    try:
+        db.execute(text(f"DROP INDEX {INDEX_NAME}"))
+        return measure(db, user_id, repetitions)
+    finally:
+        db.rollback()
+
+
+def cleanup(db) -> None:
+    print("\nEliminando datos sintéticos...")
+    db.execute(text(f"""
+        DELETE FROM chat_message
+        WHERE user_id IN (SELECT id FROM users WHERE email LIKE '%@{BENCH_EMAIL_DOMAIN}')
+    """))
+    db.execute(text(f"DELETE FROM users WHERE email LIKE '%@{BENCH_EMAIL_DOMAIN}'"))
+    db.commit()
+
+
+def print_row(label: str, total_rows: int, user_rows: int, result: dict) -> None:
+    plan = "Index Scan" if result["index_scan"] else "Seq/Bitmap Scan"
+    plan += " + Sort" if result["sorts"] else ""
+    print(f"{label:<10} {total_rows:>12,} {user_rows:>12,} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f}  {plan}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de carga del historial de chat")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 3_000_000],
+                        help="Filas sintéticas en chat_message para cada medición")
+    parser.add_argument("--users", type=int, default=20, help="Usuarios sintéticos entre los que se reparten los mensajes")
+    parser.add_argument("--repetitions", type=int, default=200, help="Ejecuciones de la consulta por medición")
+    parser.add_argument("--compare", action="store_true", help="Mide también sin el índice")
+    parser.add_argument("--verbose", action="store_true", help="Imprime el plan de ejecución de cada medición")
+    parser.add_argument("--keep", action="store_true", help="No elimina los datos sintéticos al terminar")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        has_index = db.execute(
+            text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {"name": INDEX_NAME}
+        ).first()
+        if not has_index:
+            print(f"⚠️  Falta el índice {INDEX_NAME}: ejecuta `alembic upgrade head` antes del benchmark.")
+            return
+
+        user_ids = create_bench_users(db, args.users)
+        db.commit()
+        hot_user_id = user_ids[0]
+
+        print(f"{'índice':<10} {'filas tabla':>12} {'filas usr':>12} {'p50 ms':>9} {'p95 ms':>9}  plan")
+        print("-" * 72)
+
+        inserted = 0
+        for size in sorted(args.sizes):
+            if size > inserted:
+                grow_messages(db, user_ids, inserted + 1, size)
+                inserted = size
+
+            user_rows = db.execute(
+                text("SELECT count(*) FROM chat_message WHERE user_id = :uid"), {"uid": hot_user_id}
+            ).scalar()
+            total_rows = db.execute(text("SELECT count(*) FROM chat_message")).scalar()
+
+            result = measure(db, hot_user_id, args.repetitions)
+            db.commit()
+            print_row("con", total_rows, user_rows, result)
+            if args.verbose:
+                print(result["plan"])
+
+            if args.compare:
+                baseline = measure_without_index(db, hot_user_id, args.repetitions)
+                print_row("sin", total_rows, user_rows, baseline)
+                if args.verbose:
+                    print(baseline["plan"])
+    finally:
+        if not args.keep:
+            cleanup(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
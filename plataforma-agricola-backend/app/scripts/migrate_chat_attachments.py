@@ -0,0 +1,71 @@
+"""
+Migra los adjuntos del chat guardados en línea (base64 en chat_message.attachement)
+al almacén por contenido de uploads/ (services/blob_store).
+
+Cada fila queda con el sha256 del archivo; las imágenes repetidas se guardan una
+sola vez. Recorre la tabla por lotes de id y se puede interrumpir y relanzar: las
+filas ya migradas se saltan. Los adjuntos que no son base64 válido se vacían.
+
+Uso:
+    DB_POOL_PROFILE=scripts python -m app.scripts.migrate_chat_attachments --batch-size 200
+"""
+
+import argparse
+
+from sqlalchemy import func, select, update
+
+from app.db.session import SessionLocal
+from app.db.models.chat import ChatMessage
+from app.services.blob_store import blob_store, is_blob_digest
+
+
+def migrate_batch(db, after_id: int, batch_size: int) -> tuple[int, int, int]:
+    """Migra un lote; devuelve (último id visto, migrados, descartados)."""
+    rows = db.execute(
+        select(ChatMessage.id, ChatMessage.attachement)
+        .where(ChatMessage.id > after_id, ChatMessage.attachement.isnot(None), func.length(ChatMessage.attachement) > 64)
+        .order_by(ChatMessage.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return after_id, 0, 0
+
+    migrated = discarded = 0
+    for row in rows:
+        if is_blob_digest(row.attachement):
+            continue
+        try:
+            digest = blob_store.put_base64(row.attachement)
+            migrated += 1
+        except ValueError as e:
+            print(f"  Mensaje {row.id}: adjunto descartado ({e})")
+            digest = None
+            discarded += 1
+        db.execute(update(ChatMessage).where(ChatMessage.id == row.id).values(attachement=digest))
+    db.commit()
+    return rows[-1].id, migrated, discarded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migra adjuntos del chat al almacén de uploads")
+    parser.add_argument("--batch-size", type=int, default=200, help="Filas por transacción")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        last_id, total_migrated, total_discarded = 0, 0, 0
+        while True:
+            next_id, migrated, discarded = migrate_batch(db, last_id, args.batch_size)
+            if next_id == last_id:
+                break
+            last_id = next_id
+            total_migrated += migrated
+            total_discarded += discarded
+            print(f"Hasta el mensaje {last_id}: {total_migrated} migrados, {total_discarded} descartados")
+        print(f"\n✅ Migración terminada: {total_migrated} adjuntos en {blob_store.root}, {total_discarded} descartados")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from app.core.config import UPLOADS_DIR, ATTACHMENT_THUMBNAIL_SIZE, ATTACHMENT_MAX_BYTES
+
+from PIL import Image, UnidentifiedImageError
+
+from pathlib import Path
+from typing import Optional
+
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_blob_digest(value: Optional[str]) -> bool:
+    """True si el valor es una referencia al almacén (sha256 en hex) y no un adjunto en línea."""
+    return bool(value) and _DIGEST_RE.match(value) is not None
+
+
+class BlobStore:
+    """
+    Almacén de adjuntos direccionado por contenido en el sistema de archivos.
+
+    Cada imagen se guarda una sola vez bajo su sha256 (`<raíz>/ab/abcd…`), junto
+    con una miniatura JPEG (`<raíz>/thumbs/ab/abcd….jpg`). La fila del chat solo
+    guarda el hash; subir la misma imagen dos veces no duplica archivos. Como el
+    contenido de un hash nunca cambia, los archivos se pueden cachear sin límite.
+    """
+
+    def __init__(self, root: str = UPLOADS_DIR, thumbnail_size: int = ATTACHMENT_THUMBNAIL_SIZE):
+        self.root = Path(root)
+        self.thumbnail_size = thumbnail_size
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _thumbnail_path(self, digest: str) -> Path:
+        return self.root / "thumbs" / digest[:2] / f"{digest}.jpg"
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        """Escribe en un temporal y renombra: nunca queda un archivo a medias."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _make_thumbnail(self, data: bytes) -> Optional[bytes]:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                output = io.BytesIO()
+                image.convert("RGB").save(output, format="JPEG", quality=80, optimize=True)
+                return output.getvalue()
+        except (UnidentifiedImageError, OSError) as e:
+            print(f"-- [BLOBS] No se pudo generar la miniatura: {e} --")
+            return None
+
+    def put(self, data: bytes) -> str:
+        """Guarda los bytes (si no existen ya) y devuelve su sha256."""
+        if len(data) > ATTACHMENT_MAX_BYTES:
+            raise ValueError(f"El adjunto supera el máximo de {ATTACHMENT_MAX_BYTES} bytes")
+
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not blob_path.exists():
+            self._write_atomic(blob_path, data)
+
+        thumbnail_path = self._thumbnail_path(digest)
+        if not thumbnail_path.exists():
+            thumbnail = self._make_thumbnail(data)
+            if thumbnail is not None:
+                self._write_atomic(thumbnail_path, thumbnail)
+
+        return digest
+
+    def put_base64(self, image_base64: str) -> str:
+        """Decodifica un adjunto en base64 (con o sin prefijo data:) y lo guarda."""
+        if image_base64.startswith("data:"):
+            image_base64 = image_base64.split(",", 1)[-1]
+        try:
+            data = base64.b64decode(image_base64, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("El adjunto no es base64 válido")
+        return self.put(data)
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """Contenido del archivo original, o None si el hash no está en el almacén."""
+        path = self.path(digest)
+        return path.read_bytes() if path is not None else None
+
+    def path(self, digest: str) -> Optional[Path]:
+        """Ruta del archivo original, o None si el hash no está en el almacén."""
+        if not is_blob_digest(digest):
+            return None
+        path = self._blob_path(digest)
+        return path if path.exists() else None
+
+    def thumbnail_path(self, digest: str) -> Optional[Path]:
+        """Ruta de la miniatura; si no se pudo generar, la del original."""
+        if not is_blob_digest(digest):
+            return None
+        path = self._thumbnail_path(digest)
+        return path if path.exists() else self.path(digest)
+
+    def media_type(self, path: Path) -> str:
+        try:
+            with Image.open(path) as image:
+                return Image.MIME.get(image.format, "application/octet-stream")
+        except (UnidentifiedImageError, OSError):
+            return "application/octet-stream"
+
+
+blob_store = BlobStore()
+
+
+def attachment_url(attachement: Optional[str]) -> Optional[str]:
+    """
+    URL (relativa a la API v1) de la miniatura de un adjunto del chat.
+    Los adjuntos antiguos guardados en línea no se devuelven en el historial;
+    `python -m app.scripts.migrate_chat_attachments` los pasa al almacén.
+    """
+    if not is_blob_digest(attachement):
+        return None
+    return f"/chat/attachments/{attachement}/thumbnail"
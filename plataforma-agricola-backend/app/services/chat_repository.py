@@ -0,0 +1,70 @@
+from app.db.session import AsyncSessionLocal
+from app.db.models.chat import ChatMessage
+
+from sqlalchemy import Select, insert, select
+
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+# Mensajes de contexto para el grafo y mensajes que recibe el frontend
+HISTORY_CONTEXT_LIMIT = 10
+HISTORY_API_LIMIT = 20
+
+
+def recent_messages_query(user_id: int, limit: int) -> Select:
+    """
+    Últimos `limit` mensajes del usuario, del más reciente al más antiguo.
+
+    El orden coincide con ix_chat_message_user_id_timestamp (user_id,
+    timestamp DESC, id DESC): PostgreSQL recorre solo las primeras entradas del
+    índice para el usuario, sin ordenar su historial completo. El id desempata
+    los mensajes guardados en la misma transacción (mismo timestamp).
+    """
+    return select(ChatMessage)\
+        .where(ChatMessage.user_id == user_id)\
+            .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())\
+                .limit(limit)
+
+
+async def save_chat_turn(
+    user_id: int,
+    user_content: str,
+    ai_content: str,
+    attachement: Optional[str] = None,
+    asked_at: Optional[datetime] = None
+) -> Tuple[ChatMessage, ChatMessage]:
+    """
+    Guarda la pregunta del usuario y la respuesta de la IA en una sola
+    transacción, con un INSERT ... RETURNING. Los objetos devueltos ya traen
+    id y timestamp, así que la respuesta de la API se arma sin releer la tabla.
+
+    Args:
+        asked_at: Momento en que llegó la pregunta (por defecto, ahora). La
+                  respuesta queda con la hora de guardado.
+    """
+    answered_at = datetime.now(timezone.utc)
+    rows = [
+        {
+            "user_id": user_id,
+            "sender_type": "user",
+            "content": user_content,
+            "attachement": attachement,
+            "timestamp": asked_at or answered_at,
+        },
+        {
+            "user_id": user_id,
+            "sender_type": "ai",
+            "content": ai_content,
+            "attachement": None,
+            "timestamp": answered_at,
+        },
+    ]
+
+    async with AsyncSessionLocal() as db:
+        result = await db.scalars(
+            insert(ChatMessage).returning(ChatMessage, sort_by_parameter_order=True),
+            rows
+        )
+        user_message, ai_message = result.all()
+        await db.commit()
+        return user_message, ai_message
@@ -1,37 +1,45 @@
-from langchain_core.messages import HumanMessage, AIMessage
-from app.graph.builder import agent_graph
+from langchain_core.messages import HumanMessage, AIMessage, RemoveMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from app.graph.builder import get_agent_graph
+from app.graph.checkpointer import thread_config
+from app.graph.budget import ConversationBudget, budget_run_config
+from app.core.llm_cache import parcel_state_version
 from app.db.models.chat import ChatMessage
-from app.db.session import SessionLocal
-from typing import Optional, List, Dict, Any
+from app.db.models.parcel import Parcel
+from app.db.session import AsyncSessionLocal
+from app.services.parcel_repository import start_parcel_scope
+from app.services.user_parcels import get_user_parcel_summaries
+from app.services.chat_repository import recent_messages_query, save_chat_turn, HISTORY_CONTEXT_LIMIT, HISTORY_API_LIMIT
+from app.services.blob_store import blob_store, attachment_url
+from app.utils.helper import normalize_agent_output
+from sqlalchemy import func, select
+from typing import Optional, List, Dict, Any, AsyncIterator
 
+from datetime import datetime, timezone
+
+import asyncio
+import json
 import time
 import uuid
 
-def save_chat_message(user_id: int, content: str, sender_type: str, attachement: Optional[str] = None):
-    """Guarda un mensaje en la base de datos."""
-    db = SessionLocal()
-    try:
-        db_message = ChatMessage.ChatMessage(
-            user_id=user_id,
-            content=content,
-            sender_type=sender_type,
-            attachement=attachement
-        )
-        db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
-        return db_message
-    finally:
-        db.close()
-
-def load_chat_history(user_id: int):
+# Nodos especializados cuyos tokens se reenvían al cliente durante el streaming
+STREAMED_AGENT_NODES = {
+    "production_agent",
+    "water_agent",
+    "supply_chain_agent",
+    "risk_agent",
+    "vision_agent",
+    "sustainability_agent",
+}
+
+# Respuesta que recibe el usuario cuando falla la ejecución del grafo
+ERROR_RESPONSE = "Disculpa, ocurrió un error al procesar tu solicitud."
+
+async def load_chat_history(user_id: int):
     """Carga el historial para el contexto de LangChain (objetos Message)."""
-    db = SessionLocal()
-    try:
-        db_messages = db.query(ChatMessage.ChatMessage)\
-            .filter(ChatMessage.ChatMessage.user_id == user_id)\
-                .order_by(ChatMessage.ChatMessage.timestamp.desc())\
-                    .limit(10).all()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(recent_messages_query(user_id, HISTORY_CONTEXT_LIMIT))
+        db_messages = list(result.scalars().all())
         db_messages.reverse()
         
         history = []
@@ -41,76 +49,244 @@ def load_chat_history(user_id: int):
             else:
                 history.append(AIMessage(content=msg.content))
         return history
-    finally:
-        db.close()
         
-def load_chat_history_api(user_id: int):
+async def load_chat_history_api(user_id: int):
     """
     Carga el historial formateado para la API (Lista de diccionarios).
+    Una sola consulta: si no devuelve mensajes, el usuario es nuevo y se
+    guarda el mensaje de bienvenida.
     """
-    db = SessionLocal()
-    try:
-        message_count = db.query(ChatMessage.ChatMessage)\
-            .filter(ChatMessage.ChatMessage.user_id == user_id).count()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(recent_messages_query(user_id, HISTORY_API_LIMIT))
+        db_messages = list(result.scalars().all())
         
-        if message_count == 0:
+        if not db_messages:
             # Mensaje de bienvenida por defecto si es nuevo usuario
             welcome_message = { 
                 "content": "¡Hola! Soy tu asistente Agrosmi. ¿En qué puedo ayudarte hoy?", 
                 "sender_type": "ai"
             }
             
-            db_welcome_message = ChatMessage.ChatMessage(
+            db_welcome_message = ChatMessage(
                 user_id=user_id,
                 content=welcome_message["content"],
                 sender_type=welcome_message["sender_type"],
             )
             db.add(db_welcome_message)
-            db.commit()
-            db.refresh(db_welcome_message)
+            await db.commit()
+            await db.refresh(db_welcome_message)
             
             db_messages = [db_welcome_message]
         else:
-            db_messages = db.query(ChatMessage.ChatMessage)\
-                .filter(ChatMessage.ChatMessage.user_id == user_id)\
-                    .order_by(ChatMessage.ChatMessage.timestamp.desc())\
-                        .limit(20).all() # Traemos los últimos 20 para el frontend
             db_messages.reverse()
         
-        history = []
-        for msg in db_messages:
-            is_me = msg.sender_type == 'user'
-            history.append({
-                "id": msg.id, 
-                "content": msg.content, 
-                "sender": msg.sender_type, 
-                "isMe": is_me,
-                "attachement": msg.attachement
-            })
-        return history
-    finally:
-        db.close()
-        
+        return [_message_to_api(msg) for msg in db_messages]
+
+async def _parcel_state_version(user_id: int) -> str:
+    """
+    Versión del estado de las parcelas del usuario para la caché de LLM.
+    Cambia al crear, eliminar o actualizar cualquiera de sus parcelas.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(func.count(Parcel.id), func.max(Parcel.updated_at))
+            .where(Parcel.owner_id == user_id)
+        )
+        parcel_count, last_update = result.one()
+        return f"{user_id}:{parcel_count}:{last_update.isoformat() if last_update else '-'}"
+
+def _message_to_api(msg: ChatMessage) -> Dict[str, Any]:
+    """Convierte un ChatMessage al formato que consume el frontend."""
+    return {
+        "id": msg.id,
+        "content": msg.content,
+        "sender": msg.sender_type,
+        "isMe": msg.sender_type == 'user',
+        "attachement": attachment_url(msg.attachement)
+    }
+
+async def _store_attachment(image_base64: Optional[str]) -> Optional[str]:
+    """Guarda la imagen del turno en el almacén de adjuntos y devuelve su hash."""
+    if not image_base64:
+        return None
+    try:
+        return await asyncio.to_thread(blob_store.put_base64, image_base64)
+    except ValueError as e:
+        print(f"-- [BLOBS] Adjunto descartado: {e} --")
+        return None
+
+async def _build_turn_input(
+    graph,
+    config: Dict[str, Any],
+    user_id: int,
+    user_query: str,
+    image_digest: Optional[str],
+    conversation_id: str,
+    start_time: float,
+    user_parcels: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Construye la entrada del grafo para un nuevo turno de conversación.
+
+    El historial se restaura desde el checkpointer del hilo del usuario, por lo que
+    solo se envía el mensaje nuevo. La base de datos se consulta únicamente cuando
+    el hilo aún no tiene checkpoint (primer turno tras desplegar o reiniciar).
+    """
+    snapshot = await graph.aget_state(config)
+    has_checkpoint = bool(snapshot.values.get("chat_history"))
+
+    seed_history = [] if has_checkpoint else await load_chat_history(user_id=user_id)
+
+    return {
+        "chat_history": seed_history + [HumanMessage(content=user_query)],
+        # Los mensajes de trabajo del turno anterior se descartan; el contexto previo vive en chat_history
+        "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), HumanMessage(content=user_query)],
+        "user_id": user_id,
+        "user_parcels": user_parcels,
+        "image_digest": image_digest,
+        "reasoning": None,
+        "info_next_agent": None,
+        "list_agent": [],
+        "next": None,
+        "conversation_id": conversation_id,
+        "total_start_time": start_time,
+        "time_breakdown": {},
+    }
+
+
+def _extract_final_response(messages: List[Any]) -> str:
+    """Obtiene el contenido del último AIMessage generado por el grafo."""
+    final_response_message = next((msg for msg in reversed(messages) if isinstance(msg, AIMessage)), None)
+    if not final_response_message:
+        return "No se pudo generar una respuesta."
+    return normalize_agent_output(final_response_message.content)
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Serializa un evento en formato Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def stream_agent_graph(user_info: Dict[str, Any], user_query: str, image_base64: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Ejecuta el grafo de agentes emitiendo eventos SSE a medida que ocurren.
+
+    Eventos emitidos:
+        start: la conversación fue aceptada (conversation_id).
+        route: decisión del supervisor (siguiente agente y razonamiento).
+        tool_start / tool_end: progreso de las herramientas de los agentes.
+        token: fragmentos de texto generados por los agentes especializados.
+        message: respuesta final ya guardada en la base de datos.
+        error: fallo durante la ejecución (no se guarda el turno).
+
+    Args:
+        user_info (dict): Diccionario con datos del usuario (id, username, email)
+        user_query (str): La pregunta del usuario.
+        image_base64 (str): Imagen opcional.
+
+    Yields:
+        str: Eventos SSE listos para escribir en la respuesta HTTP.
+    """
+    user_id = user_info.get("id")
+    start_time = time.time()
+    conversation_id = str(uuid.uuid4())
+
+    yield _sse_event("start", {"conversation_id": conversation_id})
+
+    final_response = None
+
+    try:
+        graph = await get_agent_graph()
+        config = thread_config(user_id)
+        parcel_state_version.set(await _parcel_state_version(user_id))
+        # Las herramientas del turno comparten las parcelas ya consultadas
+        parcel_repository = start_parcel_scope()
+        # El grafo recibe el hash del adjunto, no la imagen
+        attachment = await _store_attachment(image_base64)
+
+        turn_input = await _build_turn_input(
+            graph=graph,
+            config=config,
+            user_id=user_id,
+            user_query=user_query,
+            image_digest=attachment,
+            conversation_id=conversation_id,
+            start_time=start_time,
+            user_parcels=await get_user_parcel_summaries(user_id)
+        )
+
+        # Presupuesto del turno: saltos, llamadas a LLM, tokens y tiempo máximo
+        run_config = budget_run_config(ConversationBudget(start_time=start_time), config)
+
+        async for event in graph.astream_events(turn_input, config=run_config, version="v2"):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chain_end" and event["name"] == "supervisor_agent":
+                output = event["data"].get("output") or {}
+                next_agent = output.get("next")
+
+                yield _sse_event("route", {
+                    "next": next_agent,
+                    "reasoning": output.get("reasoning"),
+                    "elapsed": round(time.time() - start_time, 2)
+                })
+
+                if next_agent == "FINISH" and output.get("messages"):
+                    final_response = _extract_final_response(output["messages"])
+
+            elif kind == "on_tool_start":
+                yield _sse_event("tool_start", {"agent": node, "tool": event["name"]})
+
+            elif kind == "on_tool_end":
+                yield _sse_event("tool_end", {"agent": node, "tool": event["name"]})
+
+            elif kind == "on_chat_model_stream" and node in STREAMED_AGENT_NODES:
+                text = normalize_agent_output(event["data"]["chunk"].content)
+                if text:
+                    yield _sse_event("token", {"agent": node, "text": text})
+
+        if final_response is None:
+            final_response = "No se pudo generar una respuesta."
+
+        _, db_message = await save_chat_turn(
+            user_id, user_query, final_response, attachment,
+            asked_at=datetime.fromtimestamp(start_time, tz=timezone.utc)
+        )
+
+        print(f"-- [STREAM] Conversación {conversation_id} finalizada en {time.time() - start_time:.2f}s (parcelas: {parcel_repository.stats()}) --")
+
+        yield _sse_event("message", _message_to_api(db_message))
+
+    except Exception as e:
+        print(f"Error al ejecutar el grafo de agentes (stream): {e}")
+        import traceback
+        traceback.print_exc()
+
+        yield _sse_event("error", {"detail": ERROR_RESPONSE})
+
+
 async def run_agent_graph(user_info: Dict[str, Any], user_query: str, image_base64: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Ejecuta el grafo de agentes.
     
     Args:
-        user_info (dict): Diccionario con datos del usuario (id, username, parcels, etc.)
+        user_info (dict): Diccionario con datos del usuario (id, username, email)
         user_query (str): La pregunta del usuario.
         image_base64 (str): Imagen opcional.
         
     Returns:
-        list: Historial de chat actualizado (formato API).
+        list: Mensajes nuevos del turno (usuario + IA) en formato API. Si el grafo
+        falla, la respuesta de la IA es un mensaje de error.
     """
+    # Extraemos el ID del diccionario
+    user_id = user_info.get("id")
+    start_time = time.time()
+    conversation_id = str(uuid.uuid4())
+    # El grafo recibe el hash del adjunto, no la imagen
+    attachment = await _store_attachment(image_base64)
+
     try:
-        # Extraemos el ID del diccionario
-        user_id = user_info.get("id")
-        
-        
-        start_time = time.time()
-        conversation_id = str(uuid.uuid4())
-        
         print(f"\n{'='*80}")
         print(f"NUEVA CONVERSACIÓN INICIADA")
         print(f"{'='*80}")
@@ -120,25 +296,27 @@ async def run_agent_graph(user_info: Dict[str, Any], user_query: str, image_base
         print(f"Imagen: {'Sí' if image_base64 else 'No'}")
         print(f"{'='*80}\n")
         
-        # 1. Cargar historial previo
-        chat_history = load_chat_history(user_id=user_id)
-        
-        # 2. Preparar estado inicial
-        initial_state = {
-            "chat_history":chat_history + [HumanMessage(content=user_query)],
-            "messages": [HumanMessage(content=user_query)],
-            "user_id": user_id,
-            "image_base64": image_base64,
-            "reasoning": None,
-            "info_next_agent": None,
-            "list_agent": [],
-            "conversation_id": conversation_id,
-            "total_start_time": start_time,
-            "time_breakdown": {},
-        }
+        # 1 y 2. Restaurar el hilo del usuario y preparar la entrada del turno
+        graph = await get_agent_graph()
+        config = thread_config(user_id)
+        parcel_state_version.set(await _parcel_state_version(user_id))
+        # Las herramientas del turno comparten las parcelas ya consultadas
+        parcel_repository = start_parcel_scope()
+
+        turn_input = await _build_turn_input(
+            graph=graph,
+            config=config,
+            user_id=user_id,
+            user_query=user_query,
+            image_digest=attachment,
+            conversation_id=conversation_id,
+            start_time=start_time,
+            user_parcels=await get_user_parcel_summaries(user_id)
+        )
         
-        # 3. Ejecutar el grafo
-        final_state = await agent_graph.ainvoke(initial_state)
+        # 3. Ejecutar el grafo con el presupuesto del turno
+        budget = ConversationBudget(start_time=start_time)
+        final_state = await graph.ainvoke(turn_input, config=budget_run_config(budget, config))
         
         # Calcular tiempo total
         total_time = time.time() - start_time
@@ -148,26 +326,30 @@ async def run_agent_graph(user_info: Dict[str, Any], user_query: str, image_base
         print(f"{'='*80}")
         print(f"Tiempo total: {total_time:.2f}s")
         print(f"Agentes visitados: {final_state.get('list_agent', [])}")
+        print(f"Presupuesto: {budget.usage()}")
+        print(f"Parcelas: {parcel_repository.stats()}")
         print(f"{'='*80}\n")
         
         # 4. Obtener la respuesta final de la IA
-        final_response_message = next((msg for msg in reversed(final_state["messages"]) if isinstance(msg, AIMessage)), None)
-        final_response = final_response_message.content if final_response_message else "No se pudo generar una respuesta."
+        final_response = _extract_final_response(final_state["messages"])
         
-        # 5. Guardar mensajes en DB
-        save_chat_message(user_id, user_query, 'user', image_base64)
-        save_chat_message(user_id, final_response, 'ai', None)
+        # 5. Guardar pregunta y respuesta en DB (una transacción, sin releer)
+        user_message, ai_message = await save_chat_turn(
+            user_id, user_query, final_response, attachment,
+            asked_at=datetime.fromtimestamp(start_time, tz=timezone.utc)
+        )
         
-        # 6. Devolver historial actualizado para el frontend
-        return load_chat_history_api(user_id=user_id)
+        # 6. Devolver solo los mensajes nuevos; el frontend ya tiene el resto del historial
+        return [_message_to_api(user_message), _message_to_api(ai_message)]
         
     except Exception as e:
         print(f"Error al ejecutar el grafo de agentes: {e}")
         import traceback
         traceback.print_exc()
-        
-        safe_user_id = user_info.get("id") if user_info else None
-        if safe_user_id:
-            return load_chat_history_api(user_id=safe_user_id)
-        else:
-            return []
\ No newline at end of file
+
+    # El turno se guarda igualmente: el usuario conserva su mensaje y ve el error
+    user_message, ai_message = await save_chat_turn(
+        user_id, user_query, ERROR_RESPONSE, attachment,
+        asked_at=datetime.fromtimestamp(start_time, tz=timezone.utc)
+    )
+    return [_message_to_api(user_message), _message_to_api(ai_message)]
\ No newline at end of file
@@ -0,0 +1,261 @@
+import numpy as np
+
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import warnings
+
+# Umbrales agroclimáticos (°C)
+FROST_THRESHOLD = 2.0
+NEAR_FROST_THRESHOLD = 5.0
+HEAT_STRESS_THRESHOLD = 35.0
+HIGH_HEAT_THRESHOLD = 30.0
+
+# Grados-día de crecimiento (método de promedio con techo)
+GDD_BASE_TEMPERATURE = 10.0
+GDD_CAP_TEMPERATURE = 30.0
+# Ventana (días) de los grados-día acumulados móviles
+GDD_ROLLING_WINDOW = 7
+
+# Percentiles de la climatología por día del año
+CLIMATOLOGY_PERCENTILES = (10, 50, 90)
+
+
+# ============================================================================
+# CONSTRUCCIÓN DE MATRICES (parcelas x días)
+# ============================================================================
+
+
+def align_daily_series(
+    series: Sequence[Sequence[Tuple[str, Optional[float], Optional[float], Optional[float]]]],
+    start_date: date,
+    end_date: date
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Alinea varias series diarias (día ISO, mínima, máxima, precipitación) en
+    matrices de forma (n_series, n_días). Los días sin dato quedan como NaN.
+    """
+    n_days = (end_date - start_date).days + 1
+    tmin = np.full((len(series), n_days), np.nan)
+    tmax = np.full((len(series), n_days), np.nan)
+    precip = np.full((len(series), n_days), np.nan)
+
+    for row_index, rows in enumerate(series):
+        if not rows:
+            continue
+        offsets = np.array([(date.fromisoformat(day) - start_date).days for day, *_ in rows])
+        values = np.array([[np.nan if v is None else v for v in row[1:]] for row in rows], dtype=float)
+        valid = (offsets >= 0) & (offsets < n_days)
+        tmin[row_index, offsets[valid]] = values[valid, 0]
+        tmax[row_index, offsets[valid]] = values[valid, 1]
+        precip[row_index, offsets[valid]] = values[valid, 2]
+
+    return tmin, tmax, precip
+
+
+def day_of_year(start_date: date, n_days: int) -> np.ndarray:
+    """Día del año (1-366) de cada columna a partir de start_date."""
+    start = np.datetime64(start_date.isoformat(), "D")
+    days = start + np.arange(n_days)
+    return (days - days.astype("datetime64[Y]")).astype(int) + 1
+
+
+# ============================================================================
+# INDICADORES
+# ============================================================================
+
+
+def threshold_counts(tmin: np.ndarray, tmax: np.ndarray) -> Dict[str, np.ndarray]:
+    """Días de helada, casi helada, estrés por calor y calor alto por fila."""
+    with np.errstate(invalid="ignore"):
+        return {
+            "frost_days": np.sum(tmin <= FROST_THRESHOLD, axis=-1),
+            "near_frost_days": np.sum((tmin > FROST_THRESHOLD) & (tmin <= NEAR_FROST_THRESHOLD), axis=-1),
+            "heat_stress_days": np.sum(tmax >= HEAT_STRESS_THRESHOLD, axis=-1),
+            "high_heat_days": np.sum((tmax >= HIGH_HEAT_THRESHOLD) & (tmax < HEAT_STRESS_THRESHOLD), axis=-1),
+        }
+
+
+def growing_degree_days(
+    tmin: np.ndarray,
+    tmax: np.ndarray,
+    base: float = GDD_BASE_TEMPERATURE,
+    cap: float = GDD_CAP_TEMPERATURE
+) -> np.ndarray:
+    """Grados-día diarios; los días sin dato aportan 0."""
+    mean = (np.clip(tmin, None, cap) + np.clip(tmax, None, cap)) / 2
+    return np.nan_to_num(np.clip(mean - base, 0, None))
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Suma móvil sobre el último eje (ventana completa; las primeras window-1 columnas son NaN)."""
+    values = np.nan_to_num(np.atleast_2d(values).astype(float))
+    cumulative = np.cumsum(values, axis=-1)
+    result = np.full(values.shape, np.nan)
+    if window <= values.shape[-1]:
+        result[:, window - 1:] = cumulative[:, window - 1:]
+        result[:, window:] -= cumulative[:, :-window]
+    return result
+
+
+def run_lengths(mask: np.ndarray) -> np.ndarray:
+    """Longitud de la racha de días True consecutivos que termina en cada día."""
+    mask = np.atleast_2d(mask).astype(bool)
+    n_days = mask.shape[-1]
+
+    # Índice del último False visto en cada posición; la racha es la distancia a él
+    positions = np.arange(1, n_days + 1)
+    last_break = np.where(mask, 0, positions)
+    last_break = np.maximum.accumulate(last_break, axis=-1)
+    return np.where(mask, positions - last_break, 0)
+
+
+def longest_run(mask: np.ndarray) -> np.ndarray:
+    """Longitud de la racha más larga de días True consecutivos por fila."""
+    mask = np.atleast_2d(mask)
+    if mask.shape[-1] == 0:
+        return np.zeros(mask.shape[0], dtype=int)
+    return run_lengths(mask).max(axis=-1)
+
+
+def percentile_climatology(
+    values: np.ndarray,
+    start_date: date,
+    percentiles: Sequence[float] = CLIMATOLOGY_PERCENTILES
+) -> Dict[int, np.ndarray]:
+    """
+    Climatología por día del año: para cada percentil, una matriz (n_series, 366)
+    con el valor de ese percentil entre todos los años disponibles.
+    """
+    values = np.atleast_2d(values)
+    doy = day_of_year(start_date, values.shape[-1])
+    result = {int(p): np.full((values.shape[0], 366), np.nan) for p in percentiles}
+
+    for day in np.unique(doy):
+        columns = values[:, doy == day]
+        if np.all(np.isnan(columns)):
+            continue
+        with warnings.catch_warnings():
+            # Filas sin datos para ese día: el resultado queda en NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            day_percentiles = np.nanpercentile(columns, percentiles, axis=-1)
+        for p, row in zip(percentiles, day_percentiles):
+            result[int(p)][:, day - 1] = row
+
+    return result
+
+
+# ============================================================================
+# RESUMEN DE RIESGO
+# ============================================================================
+
+
+def classify_risk_level(frost_days: int, heat_stress_days: int) -> str:
+    if frost_days > 5 or heat_stress_days > 10:
+        return "Alto"
+    if frost_days > 0 or heat_stress_days > 0:
+        return "Moderado"
+    return "Bajo"
+
+
+def _rounded(value: float, digits: int = 1) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def climatology_anomalies(
+    tmin: np.ndarray,
+    tmax: np.ndarray,
+    start_date: date,
+    climatology: Dict[str, Dict[int, np.ndarray]]
+) -> Dict[str, np.ndarray]:
+    """
+    Compara el período con la climatología de cada fila ({"tmin": ..., "tmax": ...},
+    salida de percentile_climatology): noches por debajo del p10 de la mínima,
+    días por encima del p90 de la máxima y desvío medio de la máxima sobre su mediana.
+    """
+    columns = day_of_year(start_date, tmin.shape[-1]) - 1
+    tmin_low = climatology["tmin"][10][:, columns]
+    tmax_high = climatology["tmax"][90][:, columns]
+    tmax_median = climatology["tmax"][50][:, columns]
+
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return {
+            "has_climatology": np.any(~np.isnan(tmax_median), axis=-1),
+            "cold_nights_below_p10": np.sum(tmin < tmin_low, axis=-1),
+            "hot_days_above_p90": np.sum(tmax > tmax_high, axis=-1),
+            "max_temperature_anomaly_c": np.nanmean(tmax - tmax_median, axis=-1),
+        }
+
+
+def summarize_climate_risk(
+    tmin: np.ndarray,
+    tmax: np.ndarray,
+    precip: np.ndarray,
+    start_date: Optional[date] = None,
+    climatology: Optional[Dict[str, Dict[int, np.ndarray]]] = None
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Resumen de riesgo climático por fila (parcela o celda) en una sola pasada
+    vectorizada. Las filas sin ningún dato devuelven None.
+
+    Con la climatología de las mismas filas (y el primer día del período) se
+    añade la comparación con lo habitual para esas fechas.
+    """
+    tmin, tmax, precip = np.atleast_2d(tmin), np.atleast_2d(tmax), np.atleast_2d(precip)
+
+    counts = threshold_counts(tmin, tmax)
+    valid_days = np.sum(~np.isnan(tmin) & ~np.isnan(tmax), axis=-1)
+    frost_runs = longest_run(tmin <= FROST_THRESHOLD)
+    daily_gdd = growing_degree_days(tmin, tmax)
+    gdd = daily_gdd.sum(axis=-1)
+    anomalies = climatology_anomalies(tmin, tmax, start_date, climatology) if climatology is not None else None
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        avg_min = np.nanmean(tmin, axis=-1)
+        avg_max = np.nanmean(tmax, axis=-1)
+        abs_min = np.nanmin(tmin, axis=-1)
+        abs_max = np.nanmax(tmax, axis=-1)
+        # NaN si el período es más corto que la ventana
+        max_rolling_gdd = np.nanmax(rolling_sum(daily_gdd, GDD_ROLLING_WINDOW), axis=-1)
+    total_precip = np.nansum(precip, axis=-1)
+
+    summaries: List[Optional[Dict[str, Any]]] = []
+    for i in range(tmin.shape[0]):
+        if not valid_days[i]:
+            summaries.append(None)
+            continue
+
+        frost_days = int(counts["frost_days"][i])
+        heat_stress_days = int(counts["heat_stress_days"][i])
+
+        summary = {
+            "days_with_data": int(valid_days[i]),
+            "temperature": {
+                "average_min_c": round(float(avg_min[i]), 1),
+                "average_max_c": round(float(avg_max[i]), 1),
+                "absolute_min_c": round(float(abs_min[i]), 1),
+                "absolute_max_c": round(float(abs_max[i]), 1),
+            },
+            "risks": {
+                "frost_days": frost_days,
+                "near_frost_days": int(counts["near_frost_days"][i]),
+                "heat_stress_days": heat_stress_days,
+                "high_heat_days": int(counts["high_heat_days"][i]),
+                "max_consecutive_frost_days": int(frost_runs[i]),
+                "risk_level": classify_risk_level(frost_days, heat_stress_days),
+            },
+            "growing_degree_days": round(float(gdd[i]), 1),
+            "max_rolling_growing_degree_days": _rounded(max_rolling_gdd[i]),
+            "total_precipitation_mm": round(float(total_precip[i]), 2),
+        }
+        if anomalies is not None:
+            summary["climatology"] = {
+                "cold_nights_below_p10": int(anomalies["cold_nights_below_p10"][i]),
+                "hot_days_above_p90": int(anomalies["hot_days_above_p90"][i]),
+                "max_temperature_anomaly_c": _rounded(anomalies["max_temperature_anomaly_c"][i]),
+            } if anomalies["has_climatology"][i] else None
+        summaries.append(summary)
+
+    return summaries
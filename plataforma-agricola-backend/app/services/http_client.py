@@ -0,0 +1,78 @@
+from app.core.config import (
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_SECONDS,
+)
+
+from typing import Any, Dict, Optional
+
+import asyncio
+import httpx
+import weakref
+
+# Códigos que vale la pena reintentar (límite de peticiones y fallos del servidor)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Un cliente por event loop: httpx.AsyncClient no puede compartirse entre loops
+# (cada `asyncio.run` crea uno nuevo). Mapa débil: un loop cerrado no retiene su cliente
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Devuelve el cliente HTTP compartido (keep-alive) del event loop actual."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE
+            ),
+            follow_redirects=True
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_http_client() -> None:
+    """Cierra el cliente del event loop actual (apagado de la aplicación o del worker)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def fetch_json(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    retries: int = HTTP_MAX_RETRIES
+) -> Any:
+    """
+    GET con reintentos y backoff exponencial; devuelve el JSON de la respuesta.
+
+    Reintenta errores de red, timeouts y los códigos de RETRYABLE_STATUS. Los demás
+    errores HTTP se propagan de inmediato como httpx.HTTPStatusError.
+    """
+    client = get_http_client()
+    request_timeout = timeout if timeout is not None else HTTP_TIMEOUT_SECONDS
+
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(url, params=params, timeout=request_timeout)
+            if response.status_code in RETRYABLE_STATUS and attempt < retries:
+                raise httpx.HTTPStatusError(
+                    f"Respuesta {response.status_code}", request=response.request, response=response)
+            response.raise_for_status()
+            return response.json()
+
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            retryable = isinstance(e, httpx.TransportError) or e.response.status_code in RETRYABLE_STATUS
+            if not retryable or attempt >= retries:
+                raise
+
+            delay = HTTP_BACKOFF_SECONDS * (2 ** attempt)
+            print(f"-- [HTTP] Reintento {attempt + 1}/{retries} para {url} en {delay:.1f}s: {e} --")
+            await asyncio.sleep(delay)
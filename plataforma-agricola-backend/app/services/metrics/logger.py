@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import json
 import os
@@ -14,6 +15,7 @@ from app.db.models import (
     RiskAlert
 )
 from app.db.models.parcel import Parcel
+from app.services.parcel_repository import get_parcel_repository
 
 class KPILogger:
     """Logger especializado para capturar métricas de KPIs.
@@ -187,10 +189,12 @@ class KPILogger:
         """
         db = SessionLocal()
         try:
-            # Obtener área de la parcela
-            parcel = db.query(Parcel.Parcel).filter(
-                Parcel.Parcel.id == parcel_id
-            ).first()
+            # Obtener área de la parcela (ya cargada en el turno si una herramienta la consultó)
+            parcel = get_parcel_repository().get_cached(parcel_id)
+            if parcel is None:
+                parcel = db.query(Parcel).filter(
+                    Parcel.id == parcel_id
+                ).first()
 
             if not parcel:
                 print(f"[KPI-ERROR] Parcela {parcel_id} no encontrada")
@@ -248,7 +252,7 @@ class KPILogger:
                     print(f"[KPI-WARNING] Sub-riego detectado: {under_irrigation_ratio:.1%} de necesidad")
 
             # --- GUARDAR EN BASE DE DATOS ---
-            water_calc = WaterCalculation.WaterCalculation(
+            water_calc = WaterCalculation(
                 user_id=user_id,
                 parcel_id=parcel_id,
                 crop_type=crop_type,
@@ -267,7 +271,7 @@ class KPILogger:
             db.add(water_calc)
 
             # Log general
-            kpi_log = KPILog.KPILog(
+            kpi_log = KPILog(
                 kpi_type="KS3",
                 event_type="calculo_hidrico",
                 user_id=user_id,
@@ -489,7 +493,8 @@ class KPILogger:
         conversation_id: str,
         total_time: float,
         time_breakdown: Dict[str, float],
-        has_image: bool
+        has_image: bool,
+        budget_usage: Optional[Dict[str, Any]] = None
     ):
         """Registra latencia de inferencia (KA3)
 
@@ -499,24 +504,26 @@ class KPILogger:
             total_time (float): _description_
             time_breakdown (Dict[str, float]): _description_
             has_image (bool): _description_
+            budget_usage (Dict[str, Any], optional): Consumo del presupuesto de la conversación.
         """
         db = SessionLocal()
         try:
             threshold = 60.0 if has_image else 65.0
             meets_threshold = total_time <= threshold
 
-            latency = LatencyLog.LatencyLog(
+            latency = LatencyLog(
                 user_id=user_id,
                 conversation_id=conversation_id,
                 total_time=total_time,
                 has_image=has_image,
                 time_breakdown=time_breakdown,
+                budget_usage=budget_usage,
                 threshold=threshold,
                 meets_threshold=meets_threshold
             )
             db.add(latency)
 
-            kpi_log = KPILog.KPILog(
+            kpi_log = KPILog(
                 kpi_type="KA3",
                 event_type="latencia_inferencia",
                 user_id=user_id,
@@ -535,7 +542,8 @@ class KPILogger:
                 "user_id": user_id,
                 "total_time": round(total_time, 2),
                 "has_image": has_image,
-                "meets_threshold": meets_threshold
+                "meets_threshold": meets_threshold,
+                "budget_usage": budget_usage
             })
 
             print(
@@ -612,4 +620,36 @@ class KPILogger:
         finally:
             db.close()
 
+    # =========================================================================
+    # VARIANTES ASÍNCRONAS (nodos del grafo)
+    # =========================================================================
+    # Cada registro escribe en la base de datos y en archivos JSONL; desde los
+    # nodos asíncronos se ejecuta en un hilo para no bloquear el event loop.
+
+    async def alog_intervention(self, **kwargs):
+        """Versión asíncrona de `log_intervention` (KS1, KS2)."""
+        await asyncio.to_thread(self.log_intervention, **kwargs)
+
+    async def alog_water_calculation(self, **kwargs):
+        """Versión asíncrona de `log_water_calculation` (KS3)."""
+        # Carga la parcela en el repositorio del turno antes de pasar al hilo
+        await get_parcel_repository().get(kwargs["parcel_id"])
+        await asyncio.to_thread(self.log_water_calculation, **kwargs)
+
+    async def alog_diagnosis(self, **kwargs):
+        """Versión asíncrona de `log_diagnosis` (KT2)."""
+        await asyncio.to_thread(self.log_diagnosis, **kwargs)
+
+    async def alog_orchestration(self, **kwargs):
+        """Versión asíncrona de `log_orchestration` (KT1)."""
+        await asyncio.to_thread(self.log_orchestration, **kwargs)
+
+    async def alog_latency(self, **kwargs):
+        """Versión asíncrona de `log_latency` (KA3)."""
+        await asyncio.to_thread(self.log_latency, **kwargs)
+
+    async def alog_risk_alert(self, **kwargs):
+        """Versión asíncrona de `log_risk_alert` (KE1)."""
+        await asyncio.to_thread(self.log_risk_alert, **kwargs)
+
 kpi_logger = KPILogger()
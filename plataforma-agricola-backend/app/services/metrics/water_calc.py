@@ -93,7 +93,7 @@ def extract_calculation_from_message(message: str) -> dict:
     return data
 
 
-def _calculation_kpi_ks3(
+async def _calculation_kpi_ks3(
     intermediate_steps: list, 
     user_id: int, 
     response_content: str | LiteralString
@@ -130,7 +130,7 @@ def _calculation_kpi_ks3(
                     continue
 
         if parcel_id:
-            kpi_logger.log_water_calculation(
+            await kpi_logger.alog_water_calculation(
                 user_id=user_id,
                 parcel_id=parcel_id,
                 crop_type=calc_data['crop_type'],
@@ -1,70 +1,289 @@
-import requests
-
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from app.db.models.parcel import Parcel
 from app.db.models.alert import Alert
-from app.core.config import OPENWEATHER_API_KEY
+from app.db.models.monitoring import MonitoringRun
+from app.core.config import MONITORING_PAGE_SIZE, MONITORING_FORECAST_DAYS, MONITORING_PAGE_RETRIES
+from app.services.risk_rules import (
+    required_variables,
+    forecast_horizon,
+    build_forecast_matrices,
+    evaluate_rules,
+    alert_valid_for,
+    format_alert_message
+)
+from app.services.weather_cache import weather_cache
+from app.services.weather_service import fetch_daily_forecast_bulk
+from app.utils.helper import _parcel_coordinates
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import asyncio
+import time
+
+# Días de pronóstico: lo que pida la configuración, pero al menos el horizonte de las reglas
+FORECAST_DAYS = max(MONITORING_FORECAST_DAYS, forecast_horizon())
 
-def check_frost_risk_for_parcel(db: Session, parcel: Parcel):
+
+def _parcel_columns(db: Session):
+    return db.query(Parcel.id, Parcel.name, Parcel.latitude, Parcel.longitude, Parcel.location, Parcel.owner_id)
+
+
+def iter_parcel_pages(db: Session, page_size: int = MONITORING_PAGE_SIZE, after_id: int = 0) -> Iterator[List[Any]]:
     """
-    Verifica el pronóstico de heladas para una única parcela y crea una alerta si es necesario.
+    Recorre las parcelas por páginas ordenadas por id (keyset), cargando solo
+    las columnas que necesita el monitoreo.
     """
-    print(f"-- [MONITOREO] Verificando riesgo de helada para parcela ID {parcel.id}: {parcel.name} --")
-    try:
-        lat, lon = parcel.location.split(',')
-        lat = float(lat.strip())
-        lon = float(lon.strip())
-    except (ValueError, AttributeError):
-        print(f'-- [MONITOREO] Parcela ID {parcel.id}, no tiene formato valido "lat,lon" --')
-        return
-    
-    base_url = "http://api.openweathermap.org/data/2.5/forecast"
-    params = {
-        "lat": lat,
-        "lon": lon,
-        "appid": OPENWEATHER_API_KEY,
-        "units": "metric",
-        "lang": "es"
-    }
-    
-    try:
-        response = requests.get(url=base_url, params=params)
-        response.raise_for_status()
-        forecast_data = response.json()
-        
-        for forecast in forecast_data['list'][:8]:
-            temp_min = forecast['main']['temp_min']
-            if temp_min <= 2.0:
-                alert_message = f"¡Alerta de Helada! Se pronostica una temperatura mínima de {temp_min}°C para tu parcela '{parcel.name}' en las próximas 24 horas. Considera activar tu plan de contingencia."
-                existing_alert = db.query(Alert).filter(
-                    Alert.parcel_id == parcel.id,
-                    Alert.risk_type == "HELADA"
-                ).first()
-                
-                if not existing_alert:
-                    new_alert = Alert(
-                        user_id=parcel.owner_id,
-                        parcel_id=parcel.id,
-                        risk_type="HELADA",
-                        message=alert_message
-                    )
-                    db.add(new_alert)
-                    db.commit()
-                    print('Alerta de helada creada')
-                else:
-                    print('Alerta de helada ya existe')
-                    
-                return
-    except Exception as e:
-        print(f"-- [MONITOREO] Error al procesar parcela ID {parcel.id}: {e} --")
-        
-def run_proactive_monitoring(db: Session):
+    last_id = after_id
+    while True:
+        page = _parcel_columns(db)\
+            .filter(Parcel.id > last_id)\
+                .order_by(Parcel.id)\
+                    .limit(page_size).all()
+        if not page:
+            return
+        yield page
+        last_id = page[-1].id
+
+
+async def _risk_alerts_for_page(db: Session, page: List[Any], stats: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Evalúa todas las reglas de riesgo sobre una página y devuelve las alertas nuevas."""
+    parcel_points = {}
+    for parcel in page:
+        try:
+            parcel_points[parcel.id] = _parcel_coordinates(parcel)
+        except (ValueError, AttributeError):
+            stats["invalid_location"] += 1
+
+    if not parcel_points:
+        return []
+
+    # Una sola consulta por celda con todas las variables que usan las reglas
+    # (y las celdas ya vistas salen de la caché de clima)
+    variables = required_variables()
+    points = list(set(parcel_points.values()))
+    forecasts = await fetch_daily_forecast_bulk(points, days=FORECAST_DAYS, variables=variables)
+
+    matrices, dates = build_forecast_matrices([forecasts[point] for point in points], variables)
+    events_by_point = dict(zip(points, evaluate_rules(matrices, dates)))
+
+    candidates = [
+        (parcel, event)
+        for parcel in page if parcel.id in parcel_points
+        for event in events_by_point[parcel_points[parcel.id]]
+    ]
+    if not candidates:
+        return []
+
+    for _, event in candidates:
+        stats["at_risk"] += 1
+        stats["triggered"][event["risk_type"]] = stats["triggered"].get(event["risk_type"], 0) + 1
+
+    # La deduplicación la resuelve la restricción única al insertar (ver _insert_alerts)
+    alerts = {}
+    for parcel, event in candidates:
+        valid_for = alert_valid_for(event)
+        alerts.setdefault((parcel.id, event["risk_type"], valid_for), {
+            "user_id": parcel.owner_id,
+            "parcel_id": parcel.id,
+            "risk_type": event["risk_type"],
+            "valid_for": valid_for,
+            "message": format_alert_message(event, parcel.name)
+        })
+    return list(alerts.values())
+
+
+STATS_COUNTERS = ("pages", "parcels_scanned", "invalid_location", "at_risk", "alerts_created", "page_errors")
+
+
+async def _page_alerts_with_retry(db: Session, page: List[Any], stats: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Alertas de una página, reintentando con espera exponencial si falla.
+    Devuelve None si fallan todos los intentos. Los contadores solo suman el
+    intento que terminó bien (un reintento no cuenta dos veces la página).
+    """
+    for attempt in range(MONITORING_PAGE_RETRIES + 1):
+        page_stats: Dict[str, Any] = {"invalid_location": 0, "at_risk": 0, "triggered": {}}
+        try:
+            alerts = await _risk_alerts_for_page(db, page, page_stats)
+        except Exception as e:
+            print(f"-- [MONITOREO] Error en parcelas {page[0].id}-{page[-1].id} (intento {attempt + 1}): {e} --")
+            if attempt < MONITORING_PAGE_RETRIES:
+                await asyncio.sleep(2 ** attempt)
+            continue
+
+        stats["invalid_location"] += page_stats["invalid_location"]
+        stats["at_risk"] += page_stats["at_risk"]
+        for risk_type, count in page_stats["triggered"].items():
+            stats["triggered"][risk_type] = stats["triggered"].get(risk_type, 0) + count
+        return alerts
+    return None
+
+
+def _insert_alerts(db: Session, alerts: List[Dict[str, Any]]) -> int:
+    """
+    Inserta las alertas en bloque con ON CONFLICT DO NOTHING sobre
+    (parcel_id, risk_type, valid_for). Devuelve cuántas se crearon realmente.
+    """
+    if not alerts:
+        return 0
+
+    statement = pg_insert(Alert)\
+        .on_conflict_do_nothing(constraint="uq_alerts_parcel_risk_window")\
+            .returning(Alert.id)
+    return len(db.execute(statement, alerts).all())
+
+
+async def run_proactive_monitoring(db: Session, run: Optional[MonitoringRun] = None) -> Dict[str, Any]:
+    """
+    Ciclo de monitoreo proactivo de riesgos climáticos (ver risk_rules).
+
+    Recorre las parcelas por páginas, agrupa los pronósticos por celda
+    geográfica (consultas multi-ubicación concurrentes y acotadas), evalúa
+    todas las reglas en una pasada vectorizada e inserta las alertas con un
+    único INSERT ... ON CONFLICT DO NOTHING al final del ciclo.
+
+    Si se ejecuta dentro de un MonitoringRun (worker), cada página guarda sus
+    alertas junto con el progreso en la misma transacción, de modo que un
+    barrido interrumpido se reanuda desde la última parcela procesada.
+
+    Una página que falla tras sus reintentos no se da por evaluada: su rango de
+    ids queda en stats["failed_ranges"] (guardado con el progreso) y se vuelve
+    a intentar al final del barrido, también si el barrido se reanuda.
+
+    Returns:
+        dict: Métricas del ciclo (parcelas, alertas, errores, throughput).
+    """
+    start_after = run.last_parcel_id if run else 0
+    print(f"-- [MONITOREO] Iniciando ciclo de monitoreo proactivo (desde parcela {start_after})... --")
+
+    start_time = time.time()
+    cache_before = weather_cache.stats()
+    previous = (run.stats or {}) if run else {}
+    stats: Dict[str, Any] = {counter: previous.get(counter, 0) for counter in STATS_COUNTERS}
+    stats["triggered"] = dict(previous.get("triggered", {}))
+    stats["failed_ranges"] = [list(id_range) for id_range in previous.get("failed_ranges", [])]
+    pending_alerts: List[Dict[str, Any]] = []
+    scanned_this_attempt = 0
+
+    def checkpoint(page_alerts: List[Dict[str, Any]], last_parcel_id: Optional[int] = None) -> None:
+        """Alertas de la página + progreso (y rangos pendientes), atómicamente."""
+        if run is None:
+            pending_alerts.extend(page_alerts)
+            return
+        try:
+            stats["alerts_created"] += _insert_alerts(db, page_alerts)
+            if last_parcel_id is not None:
+                run.last_parcel_id = last_parcel_id
+            run.stats = dict(stats)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    for page in iter_parcel_pages(db, after_id=start_after):
+        stats["pages"] += 1
+        stats["parcels_scanned"] += len(page)
+        scanned_this_attempt += len(page)
+
+        page_alerts = await _page_alerts_with_retry(db, page, stats)
+        if page_alerts is None:
+            stats["page_errors"] += 1
+            stats["failed_ranges"].append([page[0].id, page[-1].id])
+            page_alerts = []
+
+        checkpoint(page_alerts, last_parcel_id=page[-1].id)
+
+    # Segunda oportunidad para las páginas fallidas (de este intento o de uno anterior)
+    for first_id, last_id in list(stats["failed_ranges"]):
+        page = _parcel_columns(db)\
+            .filter(Parcel.id >= first_id, Parcel.id <= last_id)\
+                .order_by(Parcel.id).all()
+        page_alerts = await _page_alerts_with_retry(db, page, stats) if page else []
+        if page_alerts is None:
+            continue
+        stats["failed_ranges"].remove([first_id, last_id])
+        checkpoint(page_alerts)
+        print(f"-- [MONITOREO] Parcelas {first_id}-{last_id} evaluadas en el reintento final --")
+
+    if pending_alerts:
+        try:
+            created = _insert_alerts(db, pending_alerts)
+            db.commit()
+            stats["alerts_created"] += created
+        except Exception as e:
+            db.rollback()
+            print(f"-- [MONITOREO] Error al guardar alertas: {e} --")
+
+    duration = time.time() - start_time
+    cache_after = weather_cache.stats()
+    stats["duration_seconds"] = round(duration, 2)
+    # Throughput de este intento (parcels_scanned acumula los intentos previos de un barrido reanudado)
+    stats["parcels_per_second"] = round(scanned_this_attempt / duration, 1) if duration > 0 else 0.0
+    stats["weather_upstream_cells"] = cache_after["misses"] - cache_before["misses"]
+    stats["weather_cache_hits"] = cache_after["hits"] - cache_before["hits"]
+
+    print(f"-- [MONITOREO] Ciclo finalizado: {stats} --")
+    return stats
+
+
+# ============================================================================
+# COLA DE EJECUCIONES (API -> WORKER)
+# ============================================================================
+
+
+def enqueue_monitoring_run(db: Session, trigger: str = "manual") -> MonitoringRun:
     """
-    Función principal que se ejecuta en segundo plano.
-    Obtiene todas las parcelas y verifica el riesgo para cada una.
+    Encola un ciclo de monitoreo para el worker. Si ya hay uno pendiente o en
+    curso, lo devuelve en lugar de crear otro.
     """
-    print("-- [MONITOREO] Iniciando ciclo de monitoreo proactivo... --")
-    all_parcels = db.query(Parcel).all()
-    for parcel in all_parcels:
-        check_frost_risk_for_parcel(db, parcel)
-    print("-- [MONITOREO] Ciclo de monitoreo proactivo finalizado. --")
\ No newline at end of file
+    active = db.query(MonitoringRun)\
+        .filter(MonitoringRun.status.in_(["pending", "running"]))\
+            .order_by(MonitoringRun.id).first()
+    if active:
+        return active
+
+    run = MonitoringRun(status="pending", trigger=trigger, last_parcel_id=0)
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    return run
+
+
+def claim_monitoring_run(db: Session) -> Optional[MonitoringRun]:
+    """
+    Toma la siguiente ejecución para el worker: primero una interrumpida
+    (status running, se reanuda), luego la pendiente más antigua.
+    """
+    for status in ("running", "pending"):
+        run = db.query(MonitoringRun)\
+            .filter(MonitoringRun.status == status)\
+                .order_by(MonitoringRun.id)\
+                    .with_for_update(skip_locked=True).first()
+        if run:
+            if run.status == "pending":
+                run.status = "running"
+                run.started_at = datetime.now(timezone.utc)
+            db.commit()
+            return run
+    return None
+
+
+async def execute_monitoring_run(db: Session, run: MonitoringRun) -> None:
+    """Ejecuta (o reanuda) un MonitoringRun y registra su resultado."""
+    try:
+        stats = await run_proactive_monitoring(db, run=run)
+        run.status = "completed"
+        run.stats = stats
+        if stats["failed_ranges"]:
+            run.error = f"Parcelas sin evaluar (rangos de id): {stats['failed_ranges']}"[:1000]
+            print(f"-- [MONITOREO] Ejecución {run.id} completada con rangos sin evaluar: {stats['failed_ranges']} --")
+    except Exception as e:
+        db.rollback()
+        run.status = "failed"
+        run.error = str(e)[:1000]
+        print(f"-- [MONITOREO] Ejecución {run.id} fallida: {e} --")
+    finally:
+        run.finished_at = datetime.now(timezone.utc)
+        db.commit()
@@ -0,0 +1,260 @@
+from app.core.config import PARCEL_IMPORT_CHUNK_SIZE, PARCEL_IMPORT_WORKERS, PARCEL_IMPORT_MAX_ROWS
+from app.db.models.parcel import Parcel, CropType, DevelopmentStage, parcel_geometry_values
+from app.services.user_parcels import invalidate_user_parcels
+from app.utils.helper import _extract_coordinates
+
+from pyproj import Geod
+from shapely import wkt
+from shapely.errors import ShapelyError
+from shapely.geometry import mapping, shape
+from shapely.validation import explain_validity
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import csv
+import io
+import itertools
+import json
+
+# (número de fila o de feature en el archivo, campos de la parcela)
+ImportRecord = Tuple[int, Dict[str, Any]]
+
+# Errores que se devuelven en la respuesta; el resto solo se cuenta
+MAX_REPORTED_ERRORS = 100
+
+_GEOD = Geod(ellps="WGS84")
+
+_TEXT_FIELDS = ("soil_type", "irrigation_type", "health_status", "current_issues")
+
+
+# ==========================================================
+# LECTURA EN STREAMING
+# ==========================================================
+
+def iter_csv_records(stream: BinaryIO) -> Iterator[ImportRecord]:
+    """
+    Filas de un CSV con cabecera (name, area, location o latitude/longitude,
+    geometry como GeoJSON o WKT, crop_type, ...). Se lee fila a fila.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        for line_number, row in enumerate(csv.DictReader(text), start=2):
+            yield line_number, {
+                key.strip().lower(): value.strip() if isinstance(value, str) else value
+                for key, value in row.items() if key
+            }
+    finally:
+        # Devuelve el archivo sin cerrarlo (lo cierra FastAPI)
+        text.detach()
+
+
+def _feature_record(feature: Dict[str, Any]) -> Dict[str, Any]:
+    record = {key.lower(): value for key, value in (feature.get("properties") or {}).items()}
+    record["geometry"] = feature.get("geometry")
+    return record
+
+
+def iter_geojson_records(stream: BinaryIO) -> Iterator[ImportRecord]:
+    """
+    Features de un GeoJSON. Las secuencias GeoJSON (un Feature por línea, como
+    las exporta `ogr2ogr -f GeoJSONSeq` desde un shapefile) se leen línea a
+    línea; un FeatureCollection se carga completo.
+
+    Raises: ValueError si el archivo no es GeoJSON.
+    """
+    first_line = stream.readline()
+    try:
+        first = json.loads(first_line.strip(b"\x1e \t\r\n") or b"null")
+    except ValueError:
+        first = None
+
+    if isinstance(first, dict) and first.get("type") == "Feature":
+        for number, line in enumerate(itertools.chain([first_line], stream), start=1):
+            line = line.strip(b"\x1e \t\r\n")
+            if not line:
+                continue
+            try:
+                yield number, _feature_record(json.loads(line))
+            except (ValueError, AttributeError):
+                yield number, {"_error": "Feature GeoJSON inválido"}
+        return
+
+    stream.seek(0)
+    try:
+        document = json.load(stream)
+    except ValueError as e:
+        raise ValueError(f"El archivo no es GeoJSON válido: {e}")
+    if not isinstance(document, dict):
+        raise ValueError("El archivo no es GeoJSON válido")
+
+    features = document.get("features", []) if document.get("type") == "FeatureCollection" else [document]
+    for number, feature in enumerate(features, start=1):
+        yield number, _feature_record(feature) if isinstance(feature, dict) else {"_error": "Feature GeoJSON inválido"}
+
+
+# ==========================================================
+# VALIDACIÓN
+# ==========================================================
+
+def _parse_geometry(value: Any):
+    """Polígono desde un objeto GeoJSON, un string GeoJSON o WKT."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not value.startswith("{"):
+            return wkt.loads(value)
+        value = json.loads(value)
+    return shape(value.get("geometry", value) if value.get("type") == "Feature" else value)
+
+
+def _enum_value(enum_cls, value: Any) -> Optional[str]:
+    if value in (None, ""):
+        return None
+    try:
+        return enum_cls(str(value).strip().lower())
+    except ValueError:
+        options = ", ".join(member.value for member in enum_cls)
+        raise ValueError(f"valor '{value}' no válido (opciones: {options})")
+
+
+def validate_record(record: Dict[str, Any], owner_id: int) -> Dict[str, Any]:
+    """
+    Convierte un registro del archivo en la fila a insertar, con las columnas
+    espaciales ya calculadas (la inserción masiva no pasa por los eventos del
+    modelo). Si no se indica el área, se calcula la geodésica del polígono.
+
+    Raises: ValueError con el motivo si el registro no es válido.
+    """
+    if record.get("_error"):
+        raise ValueError(record["_error"])
+
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise ValueError("falta el nombre (name)")
+
+    try:
+        polygon = _parse_geometry(record.get("geometry"))
+    except (ValueError, TypeError, AttributeError, ShapelyError) as e:
+        raise ValueError(f"geometría ilegible: {e}")
+    if polygon is not None:
+        if polygon.geom_type not in ("Polygon", "MultiPolygon"):
+            raise ValueError(f"la geometría debe ser Polygon o MultiPolygon, no {polygon.geom_type}")
+        if not polygon.is_valid:
+            raise ValueError(f"geometría inválida: {explain_validity(polygon)}")
+        min_lon, min_lat, max_lon, max_lat = polygon.bounds
+        if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+            raise ValueError("la geometría no está en coordenadas lon/lat (EPSG:4326)")
+
+    location = record.get("location") or None
+    if not location and record.get("latitude") not in (None, "") and record.get("longitude") not in (None, ""):
+        location = f"{record['latitude']},{record['longitude']}"
+    if location:
+        lat, lon = _extract_coordinates(str(location))
+        location = f"{lat},{lon}"
+
+    if record.get("area") not in (None, ""):
+        area = float(record["area"])
+        if area <= 0:
+            raise ValueError("el área debe ser mayor que 0")
+    elif polygon is not None:
+        area = round(abs(_GEOD.geometry_area_perimeter(polygon)[0]) / 10000, 4)
+    else:
+        raise ValueError("falta el área (area) y no hay geometría para calcularla")
+
+    soil_ph = float(record["soil_ph"]) if record.get("soil_ph") not in (None, "") else None
+    if soil_ph is not None and not 0 <= soil_ph <= 14:
+        raise ValueError("soil_ph fuera de rango (0-14)")
+
+    planting_date = record.get("planting_date") or None
+    if planting_date:
+        planting_date = datetime.fromisoformat(str(planting_date))
+
+    geometry = json.dumps(mapping(polygon)) if polygon is not None else None
+    row = {
+        "name": name,
+        "location": location,
+        "area": area,
+        "geometry": geometry,
+        "crop_type": _enum_value(CropType, record.get("crop_type")),
+        "development_stage": _enum_value(DevelopmentStage, record.get("development_stage")),
+        "planting_date": planting_date,
+        "soil_ph": soil_ph,
+        "owner_id": owner_id,
+        **{field: record.get(field) or None for field in _TEXT_FIELDS},
+    }
+    row.update(parcel_geometry_values(geometry, location))
+    return row
+
+
+def _validate_chunk(chunk: List[ImportRecord], owner_id: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    rows, errors = [], []
+    for number, record in chunk:
+        try:
+            rows.append(validate_record(record, owner_id))
+        except (ValueError, TypeError) as e:
+            errors.append({"row": number, "error": str(e)})
+    return rows, errors
+
+
+# ==========================================================
+# IMPORTACIÓN
+# ==========================================================
+
+def _chunked(records: Iterable[ImportRecord], size: int) -> Iterator[List[ImportRecord]]:
+    iterator = iter(records)
+    total = 0
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        total += len(chunk)
+        if total > PARCEL_IMPORT_MAX_ROWS:
+            raise ValueError(f"El archivo supera el máximo de {PARCEL_IMPORT_MAX_ROWS} parcelas por importación")
+        yield chunk
+
+
+def import_parcels(db: Session, owner_id: int, records: Iterable[ImportRecord]) -> Dict[str, Any]:
+    """
+    Importa parcelas por lotes: cada lote se valida en un hilo del pool
+    (shapely libera el GIL en las operaciones geométricas) mientras el hilo
+    principal inserta los lotes ya validados con un INSERT multi-fila
+    (executemany). Los registros inválidos se omiten y se reportan; las filas
+    válidas se confirman en una sola transacción al final.
+
+    Raises: ValueError si el archivo no se puede leer o supera el máximo de filas.
+    """
+    result = {"inserted": 0, "rejected": 0, "errors": []}
+
+    def insert_chunk(validated: Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]) -> None:
+        rows, errors = validated
+        if rows:
+            db.execute(insert(Parcel), rows)
+        result["inserted"] += len(rows)
+        result["rejected"] += len(errors)
+        result["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(result["errors"])])
+
+    try:
+        with ThreadPoolExecutor(max_workers=PARCEL_IMPORT_WORKERS, thread_name_prefix="parcel-import") as executor:
+            # Lotes en vuelo acotados: el archivo se sigue leyendo mientras se inserta
+            pending = deque()
+            for chunk in _chunked(records, PARCEL_IMPORT_CHUNK_SIZE):
+                pending.append(executor.submit(_validate_chunk, chunk, owner_id))
+                if len(pending) >= PARCEL_IMPORT_WORKERS * 2:
+                    insert_chunk(pending.popleft().result())
+            while pending:
+                insert_chunk(pending.popleft().result())
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # La inserción masiva no dispara los eventos del modelo
+    invalidate_user_parcels(owner_id)
+    print(f"-- [PARCELS] Importación del usuario {owner_id}: {result['inserted']} insertadas, {result['rejected']} rechazadas --")
+    return result
@@ -0,0 +1,109 @@
+from app.db.session import AsyncSessionLocal
+from app.db.models.parcel import Parcel
+
+from sqlalchemy import select
+
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional
+
+import asyncio
+
+
+class ParcelRepository:
+    """
+    Mapa de identidad de parcelas para una conversación.
+
+    Cada parcela se consulta una sola vez por turno y las herramientas de los
+    agentes la leen desde memoria. Los objetos quedan desasociados de la sesión
+    (solo lectura): para modificar una parcela se abre una sesión propia y luego
+    se llama a `invalidate`.
+    """
+
+    def __init__(self):
+        # None también se guarda: una parcela inexistente no se vuelve a consultar
+        self._parcels: Dict[int, Optional[Parcel]] = {}
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, parcel_id: int) -> Optional[Parcel]:
+        """Devuelve la parcela, consultando la base de datos solo la primera vez."""
+        if parcel_id in self._parcels:
+            self.hits += 1
+            return self._parcels[parcel_id]
+
+        inflight = self._inflight.get(parcel_id)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[parcel_id] = future
+        try:
+            self.misses += 1
+            async with AsyncSessionLocal() as db:
+                parcel = await db.get(Parcel, parcel_id)
+
+            self._parcels[parcel_id] = parcel
+            future.set_result(parcel)
+            return parcel
+
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita el aviso de excepción no recuperada si nadie más esperaba
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(parcel_id, None)
+
+    async def get_many(self, parcel_ids: Iterable[int]) -> List[Parcel]:
+        """Devuelve las parcelas existentes en el orden pedido, con una sola consulta para las faltantes."""
+        parcel_ids = list(dict.fromkeys(parcel_ids))
+        missing = [pid for pid in parcel_ids if pid not in self._parcels]
+        self.hits += len(parcel_ids) - len(missing)
+
+        if missing:
+            self.misses += len(missing)
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(select(Parcel).where(Parcel.id.in_(missing)))
+                loaded = {parcel.id: parcel for parcel in result.scalars().all()}
+            for pid in missing:
+                self._parcels[pid] = loaded.get(pid)
+
+        return [self._parcels[pid] for pid in parcel_ids if self._parcels[pid] is not None]
+
+    def get_cached(self, parcel_id: int) -> Optional[Parcel]:
+        """Consulta solo la memoria (usable desde código síncrono o hilos)."""
+        parcel = self._parcels.get(parcel_id)
+        if parcel is not None:
+            self.hits += 1
+        return parcel
+
+    def invalidate(self, parcel_id: Optional[int] = None) -> None:
+        """Descarta una parcela (o todas) para que la próxima lectura vuelva a la base de datos."""
+        if parcel_id is None:
+            self._parcels.clear()
+        else:
+            self._parcels.pop(parcel_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"parcels": len(self._parcels), "hits": self.hits, "misses": self.misses}
+
+
+# Repositorio del turno actual. Las tareas y hilos que lanza el grafo heredan el contexto.
+_current_repository: ContextVar[Optional[ParcelRepository]] = ContextVar("parcel_repository", default=None)
+
+
+def start_parcel_scope() -> ParcelRepository:
+    """Abre un repositorio nuevo para el turno de conversación en curso."""
+    repository = ParcelRepository()
+    _current_repository.set(repository)
+    return repository
+
+
+def get_parcel_repository() -> ParcelRepository:
+    """
+    Repositorio del turno actual. Fuera de una conversación (scripts, pruebas
+    manuales de herramientas) devuelve uno desechable, sin compartir caché.
+    """
+    return _current_repository.get() or ParcelRepository()
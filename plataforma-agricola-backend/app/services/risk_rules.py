@@ -0,0 +1,201 @@
+import numpy as np
+
+from app.services.climate_analytics import run_lengths
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Sequence, Tuple
+
+import operator
+import warnings
+
+_OPERATORS = {
+    "<=": operator.le,
+    "<": operator.lt,
+    ">=": operator.ge,
+    ">": operator.gt,
+}
+
+
+@dataclass(frozen=True)
+class Condition:
+    """Comparación de una variable diaria de Open-Meteo contra un umbral."""
+    variable: str
+    op: str
+    threshold: float
+
+
+@dataclass(frozen=True)
+class RiskRule:
+    """
+    Regla de riesgo declarativa: se dispara cuando todas sus condiciones se
+    cumplen durante `min_consecutive_days` días seguidos dentro de los
+    primeros `horizon_days` días del pronóstico.
+
+    El mensaje admite {parcel}, {date}, {days} y {value} (valor extremo de la
+    variable principal, la de la primera condición, durante la racha).
+
+    `validity_days` define la ventana de validez de la alerta: dentro de una
+    misma ventana la parcela recibe una sola alerta de este riesgo.
+    """
+    risk_type: str
+    conditions: Tuple[Condition, ...]
+    message: str
+    min_consecutive_days: int = 1
+    horizon_days: int = 16
+    validity_days: int = 1
+
+    def validity_window(self, event_date: date) -> date:
+        """Inicio de la ventana de validez (alineada a múltiplos de validity_days) de un evento."""
+        ordinal = event_date.toordinal()
+        return date.fromordinal(ordinal - ordinal % self.validity_days)
+
+
+RISK_RULES: Tuple[RiskRule, ...] = (
+    RiskRule(
+        risk_type="HELADA",
+        conditions=(Condition("temperature_2m_min", "<=", 2.0),),
+        horizon_days=2,
+        message="¡Alerta de Helada! Se pronostica una temperatura mínima de {value}°C para tu parcela '{parcel}' a partir del {date}. Considera activar tu plan de contingencia."
+    ),
+    RiskRule(
+        risk_type="OLA_DE_CALOR",
+        conditions=(Condition("temperature_2m_max", ">=", 35.0),),
+        min_consecutive_days=3,
+        horizon_days=7,
+        validity_days=7,
+        message="Ola de calor: se pronostican {days} días seguidos con máximas de hasta {value}°C en tu parcela '{parcel}' desde el {date}. Refuerza el riego y protege los cultivos sensibles."
+    ),
+    RiskRule(
+        risk_type="LLUVIA_INTENSA",
+        conditions=(Condition("precipitation_sum", ">=", 50.0),),
+        horizon_days=3,
+        validity_days=3,
+        message="Lluvia intensa: se pronostican hasta {value} mm en un día para tu parcela '{parcel}' desde el {date}. Revisa drenajes y pospón aplicaciones de insumos."
+    ),
+    RiskRule(
+        risk_type="SEQUIA",
+        conditions=(Condition("precipitation_sum", "<", 1.0),),
+        min_consecutive_days=10,
+        horizon_days=14,
+        validity_days=14,
+        message="Racha seca: no se pronostica lluvia significativa durante {days} días desde el {date} en tu parcela '{parcel}'. Planifica el riego."
+    ),
+    RiskRule(
+        risk_type="PLAGA",
+        conditions=(
+            Condition("relative_humidity_2m_mean", ">=", 90.0),
+            Condition("temperature_2m_mean", ">=", 15.0),
+            Condition("temperature_2m_mean", "<=", 25.0),
+        ),
+        min_consecutive_days=3,
+        horizon_days=7,
+        validity_days=7,
+        message="Condiciones favorables para enfermedades fúngicas: humedad relativa media de hasta {value}% con temperaturas templadas durante {days} días desde el {date} en tu parcela '{parcel}'. Monitorea el cultivo y considera medidas preventivas."
+    ),
+)
+
+
+def required_variables(rules: Sequence[RiskRule] = RISK_RULES) -> List[str]:
+    """Variables diarias que hay que pedir para evaluar todas las reglas en una sola consulta."""
+    return sorted({condition.variable for rule in rules for condition in rule.conditions})
+
+
+def forecast_horizon(rules: Sequence[RiskRule] = RISK_RULES) -> int:
+    return max(rule.horizon_days for rule in rules)
+
+
+def build_forecast_matrices(
+    forecasts: Sequence[Dict[str, Any]],
+    variables: Sequence[str]
+) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """
+    Convierte respuestas diarias de Open-Meteo en una matriz (n_ubicaciones, n_días)
+    por variable. Los valores faltantes quedan como NaN. Devuelve también las fechas.
+    """
+    dates: List[str] = []
+    for forecast in forecasts:
+        times = forecast.get("daily", {}).get("time", [])
+        if len(times) > len(dates):
+            dates = list(times)
+
+    matrices = {}
+    for variable in variables:
+        matrix = np.full((len(forecasts), len(dates)), np.nan)
+        for i, forecast in enumerate(forecasts):
+            values = forecast.get("daily", {}).get(variable) or []
+            matrix[i, :len(values)] = np.array(values, dtype=float)
+        matrices[variable] = matrix
+
+    return matrices, dates
+
+
+def evaluate_rules(
+    matrices: Dict[str, np.ndarray],
+    dates: Sequence[str],
+    rules: Sequence[RiskRule] = RISK_RULES
+) -> List[List[Dict[str, Any]]]:
+    """
+    Evalúa todas las reglas sobre todas las ubicaciones en una pasada vectorizada
+    por regla. Devuelve, por ubicación, la lista de riesgos disparados con su
+    fecha de inicio, duración de la racha y valor extremo.
+    """
+    n_locations = next(iter(matrices.values())).shape[0] if matrices else 0
+    triggered: List[List[Dict[str, Any]]] = [[] for _ in range(n_locations)]
+    if not n_locations or not dates:
+        return triggered
+
+    for rule in rules:
+        horizon = min(rule.horizon_days, len(dates))
+
+        with np.errstate(invalid="ignore"):
+            mask = np.ones((n_locations, horizon), dtype=bool)
+            for condition in rule.conditions:
+                mask &= _OPERATORS[condition.op](matrices[condition.variable][:, :horizon], condition.threshold)
+
+        runs = run_lengths(mask)
+        hits = runs >= rule.min_consecutive_days
+        fired = hits.any(axis=1)
+        if not fired.any():
+            continue
+
+        # Día en que la racha alcanza el mínimo -> inicio de la racha
+        first_hit = hits.argmax(axis=1)
+        start_index = first_hit - (rule.min_consecutive_days - 1)
+        longest = runs.max(axis=1)
+
+        primary = rule.conditions[0]
+        masked = np.where(mask, matrices[primary.variable][:, :horizon], np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            extreme = np.nanmin(masked, axis=1) if primary.op in ("<=", "<") else np.nanmax(masked, axis=1)
+
+        for i in np.flatnonzero(fired):
+            triggered[i].append({
+                "risk_type": rule.risk_type,
+                "rule": rule,
+                "start_date": dates[int(start_index[i])],
+                "days": int(longest[i]),
+                "value": round(float(extreme[i]), 1),
+            })
+
+    return triggered
+
+
+def alert_valid_for(event: Dict[str, Any]) -> date:
+    """Ventana de validez de un evento disparado (clave de deduplicación de la alerta)."""
+    return event["rule"].validity_window(date.fromisoformat(event["start_date"]))
+
+
+def format_alert_message(event: Dict[str, Any], parcel_name: str) -> str:
+    start = event["start_date"]
+    try:
+        start = date.fromisoformat(start).strftime("%d/%m/%Y")
+    except ValueError:
+        pass
+    return event["rule"].message.format(
+        parcel=parcel_name,
+        date=start,
+        days=event["days"],
+        value=event["value"]
+    )
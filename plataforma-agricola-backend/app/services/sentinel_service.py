@@ -26,9 +26,14 @@ config = configure_sh_config()
 # UTILIDAD: EJECUTAR UN REQUEST MÓDULAR PARA ÍNDICES
 # ==========================================================
 
-def run_request(evalscript: str, geojson_str: str, date_from: str, date_to: str, size=(512, 512)):
-    geom = shape(json.loads(geojson_str))
-    bbox = BBox(geom.bounds, crs=CRS.WGS84)
+def run_request(evalscript: str, area, date_from: str, date_to: str, size=(512, 512)):
+    """
+    `area` es la caja envolvente (min_lon, min_lat, max_lon, max_lat), como
+    `Parcel.bbox`; un string GeoJSON se sigue aceptando y se parsea aquí.
+    """
+    if isinstance(area, str):
+        area = shape(json.loads(area)).bounds
+    bbox = BBox(area, crs=CRS.WGS84)
 
     request = SentinelHubRequest(
         evalscript=evalscript,
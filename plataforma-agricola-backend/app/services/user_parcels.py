@@ -0,0 +1,80 @@
+from app.core.config import USER_PARCELS_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES
+from app.db.session import AsyncSessionLocal
+from app.db.models.parcel import Parcel
+
+from cachetools import TTLCache
+from sqlalchemy import event, select
+
+from typing import Any, Dict, List, Optional
+
+import threading
+
+# Resumen por parcela: lo justo para que el supervisor y los agentes identifiquen
+# la parcela sin llamar a list_user_parcels (id, nombre, cultivo y etapa)
+ParcelSummary = Dict[str, Any]
+
+_summaries: TTLCache = TTLCache(maxsize=USER_CACHE_MAX_ENTRIES, ttl=USER_PARCELS_CACHE_TTL_SECONDS)
+_lock = threading.Lock()
+
+
+def _enum_value(value: Any) -> Optional[str]:
+    return value.value if hasattr(value, "value") else value
+
+
+async def get_user_parcel_summaries(user_id: int) -> List[ParcelSummary]:
+    """
+    Parcelas del usuario como proyección ligera, cacheada por usuario.
+    La consulta lee solo cuatro columnas y la resuelve el índice
+    ix_parcels_owner_projection (index-only scan en PostgreSQL).
+    """
+    with _lock:
+        cached = _summaries.get(user_id)
+    if cached is not None:
+        return cached
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Parcel.id, Parcel.name, Parcel.crop_type, Parcel.development_stage)
+            .where(Parcel.owner_id == user_id)
+            .order_by(Parcel.id)
+        )
+        summaries = [
+            {
+                "id": row.id,
+                "name": row.name,
+                "crop_type": _enum_value(row.crop_type),
+                "development_stage": _enum_value(row.development_stage),
+            }
+            for row in result.all()
+        ]
+
+    with _lock:
+        _summaries[user_id] = summaries
+    return summaries
+
+
+def invalidate_user_parcels(user_id: int) -> None:
+    with _lock:
+        _summaries.pop(user_id, None)
+
+
+def format_parcel_summaries(summaries: Optional[List[ParcelSummary]]) -> str:
+    """Texto compacto para los prompts de los agentes."""
+    if summaries is None:
+        return "No disponibles en este turno (consultar con list_user_parcels)."
+    if not summaries:
+        return "El usuario no tiene parcelas registradas."
+    return "\n".join(
+        f"  - ID {p['id']}: {p['name']} "
+        f"(cultivo: {p['crop_type'] or 'sin definir'}, etapa: {p['development_stage'] or 'sin definir'})"
+        for p in summaries
+    )
+
+
+@event.listens_for(Parcel, "after_insert")
+@event.listens_for(Parcel, "after_update")
+@event.listens_for(Parcel, "after_delete")
+def _invalidate_on_parcel_change(mapper, connection, target: Parcel) -> None:
+    """Crear, editar o eliminar una parcela descarta la proyección de su dueño."""
+    if target.owner_id is not None:
+        invalidate_user_parcels(target.owner_id)
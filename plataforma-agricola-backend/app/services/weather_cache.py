@@ -0,0 +1,284 @@
+from cachetools import LRUCache
+
+from app.core.config import (
+    WEATHER_CACHE_GEOHASH_PRECISION,
+    WEATHER_CACHE_MAX_ENTRIES,
+    WEATHER_CACHE_BACKEND,
+    WEATHER_CACHE_SQLITE_PATH,
+    WEATHER_CACHE_REDIS_URL,
+)
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+# Vigencia por producto (segundos). None = los datos no cambian (archivo histórico consolidado)
+PRODUCT_TTL = {
+    "current": 10 * 60,
+    "forecast_3h": 30 * 60,
+    "daily_precipitation": 60 * 60,
+    "daily_forecast": 60 * 60,
+    "archive_recent": 60 * 60,
+    "archive": None,
+}
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lon: float, precision: int = WEATHER_CACHE_GEOHASH_PRECISION) -> str:
+    """Codifica coordenadas como geohash de la precisión indicada."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        target, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (target[0] + target[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            target[0] = mid
+        else:
+            bits <<= 1
+            target[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            geohash.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    """Devuelve el centro (lat, lon) de una celda geohash."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        index = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            target = lon_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if (index >> shift) & 1:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return round((lat_range[0] + lat_range[1]) / 2, 4), round((lon_range[0] + lon_range[1]) / 2, 4)
+
+
+def weather_cell(lat: float, lon: float) -> Tuple[str, float, float]:
+    """Celda de caché de unas coordenadas y su centro, que es lo que se consulta aguas arriba."""
+    cell = geohash_encode(lat, lon)
+    center_lat, center_lon = geohash_center(cell)
+    return cell, center_lat, center_lon
+
+
+# ============================================================================
+# BACKENDS COMPARTIDOS (L2)
+# ============================================================================
+
+
+class SQLiteWeatherStore:
+    """
+    Backend compartido entre procesos de una misma máquina (API y worker).
+    sqlite3 es bloqueante: las operaciones corren en un hilo para no detener el
+    event loop (y con él los demás chats) mientras esperan el disco o el lock.
+    """
+
+    def __init__(self, database_path: str = WEATHER_CACHE_SQLITE_PATH):
+        directory = os.path.dirname(database_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS weather_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.execute("DELETE FROM weather_cache WHERE expires_at < ?", (time.time(),))
+        self._conn.commit()
+
+    def _get_sync(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM weather_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if not row or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def _set_sync(self, key: str, value: Any, ttl: Optional[int]) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO weather_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            self._conn.commit()
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int]) -> None:
+        await asyncio.to_thread(self._set_sync, key, value, ttl)
+
+
+class RedisWeatherStore:
+    """Backend compatible con Redis para compartir la caché entre máquinas."""
+
+    def __init__(self, url: str = WEATHER_CACHE_REDIS_URL):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError(
+                "WEATHER_CACHE_BACKEND=redis requiere el paquete 'redis' (pip install redis)") from e
+        self._client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self._client.get(f"weather:{key}")
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[int]) -> None:
+        await self._client.set(f"weather:{key}", json.dumps(value), ex=ttl)
+
+
+def _build_shared_store():
+    if WEATHER_CACHE_BACKEND == "sqlite":
+        return SQLiteWeatherStore()
+    if WEATHER_CACHE_BACKEND == "redis":
+        return RedisWeatherStore()
+    return None
+
+
+# ============================================================================
+# CACHÉ DE DOS NIVELES
+# ============================================================================
+
+
+class WeatherCache:
+    """
+    Caché de clima por celda geográfica, producto y franja de tiempo.
+
+    L1: LRU en proceso. L2 (opcional): SQLite o Redis compartido. Las consultas
+    concurrentes a la misma clave esperan una única llamada aguas arriba.
+
+    Las llamadas en curso se agrupan por event loop (como los clientes de
+    http_client): un Future solo se puede esperar en el loop que lo creó, y un
+    mismo proceso puede crear varios loops seguidos (cada `asyncio.run`, como el
+    del worker, de un script o de una prueba). El mapa es débil para no retener
+    los loops ya cerrados.
+    """
+
+    def __init__(self, max_entries: int = WEATHER_CACHE_MAX_ENTRIES, shared_store=None):
+        self._local: LRUCache = LRUCache(maxsize=max_entries)
+        self._shared = shared_store
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def build_key(product: str, cell: str, *parts: Any) -> str:
+        """Clave: producto, celda, parámetros extra y franja de tiempo según la vigencia."""
+        ttl = PRODUCT_TTL[product]
+        bucket = int(time.time() // ttl) if ttl else "permanent"
+        return ":".join([product, cell, *[str(part) for part in parts], str(bucket)])
+
+    async def get_or_fetch(
+        self,
+        product: str,
+        cell: str,
+        fetch: Callable[[], Awaitable[Any]],
+        *parts: Any
+    ) -> Any:
+        key = self.build_key(product, cell, *parts)
+        ttl = PRODUCT_TTL[product]
+
+        entry = self._local.get(key)
+        if entry is not None and (entry[0] is None or entry[0] > time.time()):
+            self.hits += 1
+            return entry[1]
+
+        loop = asyncio.get_running_loop()
+        loop_inflight = self._inflight.setdefault(loop, {})
+        inflight = loop_inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        future = loop.create_future()
+        loop_inflight[key] = future
+        try:
+            value = await self._shared.get(key) if self._shared else None
+            if value is None:
+                self.misses += 1
+                value = await fetch()
+                if self._shared:
+                    await self._shared.set(key, value, ttl)
+            else:
+                self.hits += 1
+
+            self._local[key] = (time.time() + ttl if ttl else None, value)
+            future.set_result(value)
+            return value
+
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita el aviso de excepción no recuperada si nadie más esperaba
+            future.exception()
+            raise
+        finally:
+            loop_inflight.pop(key, None)
+
+    async def get_cached(self, product: str, cell: str, *parts: Any) -> Optional[Any]:
+        """Consulta L1 y L2 sin llamar aguas arriba (usado por las consultas en lote)."""
+        key = self.build_key(product, cell, *parts)
+
+        entry = self._local.get(key)
+        if entry is not None and (entry[0] is None or entry[0] > time.time()):
+            self.hits += 1
+            return entry[1]
+
+        value = await self._shared.get(key) if self._shared else None
+        if value is not None:
+            self.hits += 1
+            ttl = PRODUCT_TTL[product]
+            self._local[key] = (time.time() + ttl if ttl else None, value)
+        return value
+
+    async def put(self, product: str, cell: str, value: Any, *parts: Any) -> None:
+        """Guarda un valor obtenido fuera de get_or_fetch (p. ej. en una consulta en lote)."""
+        key = self.build_key(product, cell, *parts)
+        ttl = PRODUCT_TTL[product]
+        self.misses += 1
+        self._local[key] = (time.time() + ttl if ttl else None, value)
+        if self._shared:
+            await self._shared.set(key, value, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._local),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "backend": WEATHER_CACHE_BACKEND,
+        }
+
+
+weather_cache = WeatherCache(shared_store=_build_shared_store())
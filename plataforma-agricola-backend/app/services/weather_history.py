@@ -0,0 +1,198 @@
+from app.core.config import WEATHER_HISTORY_PATH, CLIMATE_BASELINE_YEARS
+from app.services.climate_analytics import align_daily_series, percentile_climatology, summarize_climate_risk
+from app.services.weather_cache import weather_cell
+from app.services.weather_service import fetch_archive_daily
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import asyncio
+import os
+import sqlite3
+import threading
+
+
+class WeatherHistoryStore:
+    """
+    Histórico meteorológico diario por celda geográfica, guardado en SQLite.
+
+    Los días pasados no cambian, así que cada celda se sincroniza de forma
+    incremental: solo se descargan del archivo de Open-Meteo los días que
+    quedan fuera del rango ya cubierto. Los días aún sin datos en el archivo
+    (los más recientes) no cuentan como cubiertos y se vuelven a pedir.
+
+    sqlite3 es bloqueante: las lecturas y escrituras corren en un hilo para no
+    detener el event loop, igual que en la caché de clima (SQLiteWeatherStore).
+    """
+
+    def __init__(self, database_path: str = WEATHER_HISTORY_PATH):
+        directory = os.path.dirname(database_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sync_locks: Dict[str, asyncio.Lock] = {}
+        self._conn = sqlite3.connect(database_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS daily_weather (
+                cell TEXT NOT NULL,
+                day TEXT NOT NULL,
+                temperature_min REAL,
+                temperature_max REAL,
+                precipitation REAL,
+                PRIMARY KEY (cell, day)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS weather_sync (
+                cell TEXT PRIMARY KEY,
+                synced_from TEXT NOT NULL,
+                synced_until TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Sincronización incremental
+    # ------------------------------------------------------------------
+
+    def _coverage_sync(self, cell: str) -> Optional[Tuple[date, date]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_from, synced_until FROM weather_sync WHERE cell = ?", (cell,)
+            ).fetchone()
+        if not row:
+            return None
+        return date.fromisoformat(row[0]), date.fromisoformat(row[1])
+
+    @staticmethod
+    def _missing_ranges(coverage: Optional[Tuple[date, date]], start_date: date, end_date: date) -> List[Tuple[date, date]]:
+        if coverage is None:
+            return [(start_date, end_date)]
+
+        synced_from, synced_until = coverage
+        ranges = []
+        if start_date < synced_from:
+            ranges.append((start_date, synced_from - timedelta(days=1)))
+        if end_date > synced_until:
+            ranges.append((max(start_date, synced_until + timedelta(days=1)), end_date))
+        return ranges
+
+    def _store_sync(self, cell: str, data: Dict[str, Any], coverage: Optional[Tuple[date, date]], fetched: Tuple[date, date]) -> None:
+        daily = data.get("daily", {})
+        rows = [
+            (cell, day, tmin, tmax, precip)
+            for day, tmin, tmax, precip in zip(
+                daily.get("time", []),
+                daily.get("temperature_2m_min", []),
+                daily.get("temperature_2m_max", []),
+                daily.get("precipitation_sum", [])
+            )
+            if tmin is not None and tmax is not None
+        ]
+
+        fetched_from, fetched_until = fetched
+        if rows:
+            # Solo cuenta como cubierto hasta el último día con datos consolidados
+            fetched_until = min(fetched_until, date.fromisoformat(max(row[1] for row in rows)))
+        elif coverage is None or fetched_until >= coverage[0]:
+            # Sin datos en el archivo: solo se marca como cubierto un tramo anterior a lo ya sincronizado
+            return
+
+        synced_from = min(fetched_from, coverage[0]) if coverage else fetched_from
+        synced_until = max(fetched_until, coverage[1]) if coverage else fetched_until
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO daily_weather (cell, day, temperature_min, temperature_max, precipitation) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO weather_sync (cell, synced_from, synced_until) VALUES (?, ?, ?)",
+                (cell, synced_from.isoformat(), synced_until.isoformat())
+            )
+            self._conn.commit()
+
+    async def _coverage(self, cell: str) -> Optional[Tuple[date, date]]:
+        return await asyncio.to_thread(self._coverage_sync, cell)
+
+    async def _store(self, cell: str, data: Dict[str, Any], coverage: Optional[Tuple[date, date]], fetched: Tuple[date, date]) -> None:
+        await asyncio.to_thread(self._store_sync, cell, data, coverage, fetched)
+
+    async def ensure_range(self, lat: float, lon: float, start_date: date, end_date: date) -> str:
+        """Garantiza que el rango esté en el histórico local; devuelve la celda."""
+        cell, _, _ = weather_cell(lat, lon)
+
+        lock = self._sync_locks.setdefault(cell, asyncio.Lock())
+        async with lock:
+            coverage = await self._coverage(cell)
+            for range_start, range_end in self._missing_ranges(coverage, start_date, end_date):
+                print(f"-- [HISTÓRICO] Sincronizando celda {cell}: {range_start} a {range_end} --")
+                # Pasa por la caché de clima: el tramo reciente sin consolidar se reutiliza durante una hora
+                data = await fetch_archive_daily(lat, lon, range_start, range_end)
+                await self._store(cell, data, coverage, (range_start, range_end))
+                coverage = await self._coverage(cell)
+
+        return cell
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def _daily_series_sync(self, cell: str, start_date: date, end_date: date) -> List[Tuple[str, float, float, Optional[float]]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT day, temperature_min, temperature_max, precipitation FROM daily_weather "
+                "WHERE cell = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (cell, start_date.isoformat(), end_date.isoformat())
+            ).fetchall()
+
+    async def daily_series(self, cell: str, start_date: date, end_date: date) -> List[Tuple[str, float, float, Optional[float]]]:
+        """Filas (día, mínima, máxima, precipitación) ordenadas por día."""
+        return await asyncio.to_thread(self._daily_series_sync, cell, start_date, end_date)
+
+
+weather_history = WeatherHistoryStore()
+
+
+async def climate_risk_for_points(
+    points: Iterable[Tuple[float, float]],
+    start_date: date,
+    end_date: date,
+    baseline_years: int = CLIMATE_BASELINE_YEARS
+) -> Dict[Tuple[float, float], Optional[Dict[str, Any]]]:
+    """
+    Resumen de riesgo climático de muchas coordenadas (parcelas) a la vez.
+
+    Sincroniza cada celda una sola vez (período más los `baseline_years` años
+    previos, de los que sale la climatología por percentiles) y analiza todas
+    las celdas en una única matriz.
+    """
+    points = list(points)
+    baseline_end = start_date - timedelta(days=1)
+    baseline_start = baseline_end - timedelta(days=365 * baseline_years - 1) if baseline_years > 0 else start_date
+
+    cells = await asyncio.gather(*(
+        weather_history.ensure_range(lat, lon, baseline_start, end_date) for lat, lon in points
+    ))
+    unique_cells = list(dict.fromkeys(cells))
+
+    series = await asyncio.gather(*(
+        weather_history.daily_series(cell, start_date, end_date) for cell in unique_cells
+    ))
+    tmin, tmax, precip = align_daily_series(series, start_date, end_date)
+
+    climatology = None
+    if baseline_years > 0:
+        baseline = await asyncio.gather(*(
+            weather_history.daily_series(cell, baseline_start, baseline_end) for cell in unique_cells
+        ))
+        base_tmin, base_tmax, _ = align_daily_series(baseline, baseline_start, baseline_end)
+        climatology = {
+            "tmin": percentile_climatology(base_tmin, baseline_start),
+            "tmax": percentile_climatology(base_tmax, baseline_start),
+        }
+
+    summaries = dict(zip(unique_cells, summarize_climate_risk(tmin, tmax, precip, start_date, climatology)))
+    return {point: summaries[cell] for point, cell in zip(points, cells)}
@@ -0,0 +1,199 @@
+from app.core.config import OPENWEATHER_API_KEY, OPEN_METEO_BULK_CHUNK_SIZE, OPEN_METEO_BULK_CONCURRENCY
+from app.services.http_client import fetch_json
+from app.services.weather_cache import weather_cache, weather_cell
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import asyncio
+
+OPEN_METEO_FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+OPENWEATHER_CURRENT_URL = "http://api.openweathermap.org/data/2.5/weather"
+OPENWEATHER_FORECAST_URL = "http://api.openweathermap.org/data/2.5/forecast"
+
+DEFAULT_DAILY_FORECAST_VARIABLES = ("temperature_2m_min", "temperature_2m_max", "precipitation_sum")
+
+# Días tras los cuales el archivo de Open-Meteo se considera consolidado
+ARCHIVE_SETTLED_DAYS = 7
+
+# Las consultas se hacen al centro de la celda geográfica, de modo que todas las
+# parcelas vecinas comparten la misma respuesta en caché (ver weather_cache).
+
+
+async def fetch_current_weather(
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    query: Optional[str] = None
+) -> Dict[str, Any]:
+    """Condiciones actuales de OpenWeather por coordenadas o nombre de ciudad ('Bogota,CO')."""
+    params = {
+        "appid": OPENWEATHER_API_KEY,
+        "units": "metric",
+        "lang": "es"
+    }
+
+    if query is not None:
+        params["q"] = query
+        cell = f"q={query.strip().lower()}"
+    else:
+        cell, params["lat"], params["lon"] = weather_cell(lat, lon)
+
+    return await weather_cache.get_or_fetch(
+        "current", cell,
+        lambda: fetch_json(OPENWEATHER_CURRENT_URL, params=params)
+    )
+
+
+async def fetch_forecast_3h(lat: float, lon: float) -> Dict[str, Any]:
+    """Pronóstico de OpenWeather en intervalos de 3 horas (5 días)."""
+    cell, center_lat, center_lon = weather_cell(lat, lon)
+    params = {
+        "lat": center_lat,
+        "lon": center_lon,
+        "appid": OPENWEATHER_API_KEY,
+        "units": "metric",
+        "lang": "es"
+    }
+    return await weather_cache.get_or_fetch(
+        "forecast_3h", cell,
+        lambda: fetch_json(OPENWEATHER_FORECAST_URL, params=params)
+    )
+
+
+async def fetch_daily_precipitation(lat: float, lon: float, start_date: date, end_date: date) -> Dict[str, Any]:
+    """Precipitación diaria reciente de Open-Meteo (máximo 16 días hacia atrás)."""
+    cell, center_lat, center_lon = weather_cell(lat, lon)
+    params = {
+        "latitude": center_lat,
+        "longitude": center_lon,
+        "daily": "precipitation_sum,precipitation_hours",
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "timezone": "America/Bogota"
+    }
+    return await weather_cache.get_or_fetch(
+        "daily_precipitation", cell,
+        lambda: fetch_json(OPEN_METEO_FORECAST_URL, params=params),
+        start_date.isoformat(), end_date.isoformat()
+    )
+
+
+async def fetch_daily_forecast(lat: float, lon: float, days: int = 3) -> Dict[str, Any]:
+    """Pronóstico diario de Open-Meteo (temperaturas extremas y precipitación)."""
+    results = await fetch_daily_forecast_bulk([(lat, lon)], days=days)
+    return results[(lat, lon)]
+
+
+async def fetch_archive_daily(lat: float, lon: float, start_date: date, end_date: date) -> Dict[str, Any]:
+    """Temperaturas extremas y precipitación diaria históricas de Open-Meteo."""
+    cell, center_lat, center_lon = weather_cell(lat, lon)
+    params = {
+        "latitude": center_lat,
+        "longitude": center_lon,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum",
+        "timezone": "auto"
+    }
+
+    # Los últimos días del archivo aún pueden corregirse; solo lo consolidado se guarda para siempre
+    settled = end_date <= date.today() - timedelta(days=ARCHIVE_SETTLED_DAYS)
+
+    return await weather_cache.get_or_fetch(
+        "archive" if settled else "archive_recent", cell,
+        lambda: fetch_json(OPEN_METEO_ARCHIVE_URL, params=params, timeout=15),
+        start_date.isoformat(), end_date.isoformat()
+    )
+
+
+# ============================================================================
+# CONSULTAS EN LOTE (MULTI-UBICACIÓN)
+# ============================================================================
+
+
+async def _fetch_open_meteo_bulk(
+    product: str,
+    points: Iterable[Tuple[float, float]],
+    base_params: Dict[str, Any],
+    *key_parts: Any
+) -> Dict[Tuple[float, float], Dict[str, Any]]:
+    """
+    Resuelve varias coordenadas con el menor número de llamadas a Open-Meteo.
+
+    Agrupa las coordenadas por celda, reutiliza lo que ya esté en caché y pide
+    el resto en bloques de OPEN_METEO_BULK_CHUNK_SIZE ubicaciones separadas por
+    comas, con como máximo OPEN_METEO_BULK_CONCURRENCY peticiones simultáneas.
+    Devuelve la respuesta de cada coordenada original.
+    """
+    point_cells: Dict[Tuple[float, float], str] = {}
+    cell_centers: Dict[str, Tuple[float, float]] = {}
+    for lat, lon in points:
+        cell, center_lat, center_lon = weather_cell(lat, lon)
+        point_cells[(lat, lon)] = cell
+        cell_centers[cell] = (center_lat, center_lon)
+
+    cell_data: Dict[str, Dict[str, Any]] = {}
+    missing: List[str] = []
+    for cell in cell_centers:
+        cached = await weather_cache.get_cached(product, cell, *key_parts)
+        if cached is not None:
+            cell_data[cell] = cached
+        else:
+            missing.append(cell)
+
+    chunks = [missing[i:i + OPEN_METEO_BULK_CHUNK_SIZE] for i in range(0, len(missing), OPEN_METEO_BULK_CHUNK_SIZE)]
+
+    semaphore = asyncio.Semaphore(OPEN_METEO_BULK_CONCURRENCY)
+
+    async def fetch_chunk(chunk: List[str]) -> None:
+        params = dict(base_params)
+        params["latitude"] = ",".join(str(cell_centers[cell][0]) for cell in chunk)
+        params["longitude"] = ",".join(str(cell_centers[cell][1]) for cell in chunk)
+
+        async with semaphore:
+            response = await fetch_json(OPEN_METEO_FORECAST_URL, params=params, timeout=30)
+        # Con una sola ubicación Open-Meteo devuelve un objeto en lugar de una lista
+        locations = response if isinstance(response, list) else [response]
+
+        for cell, location_data in zip(chunk, locations):
+            cell_data[cell] = location_data
+            await weather_cache.put(product, cell, location_data, *key_parts)
+
+    if chunks:
+        print(f"-- [CLIMA] Lote {product}: {len(cell_centers)} celdas, {len(missing)} sin caché, {len(chunks)} peticiones --")
+        await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))
+
+    return {point: cell_data[cell] for point, cell in point_cells.items()}
+
+
+async def fetch_daily_precipitation_bulk(
+    points: Iterable[Tuple[float, float]],
+    start_date: date,
+    end_date: date
+) -> Dict[Tuple[float, float], Dict[str, Any]]:
+    """Precipitación diaria para muchas coordenadas (misma clave de caché que la consulta individual)."""
+    params = {
+        "daily": "precipitation_sum,precipitation_hours",
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "timezone": "America/Bogota"
+    }
+    return await _fetch_open_meteo_bulk(
+        "daily_precipitation", points, params, start_date.isoformat(), end_date.isoformat()
+    )
+
+
+async def fetch_daily_forecast_bulk(
+    points: Iterable[Tuple[float, float]],
+    days: int = 3,
+    variables: Sequence[str] = DEFAULT_DAILY_FORECAST_VARIABLES
+) -> Dict[Tuple[float, float], Dict[str, Any]]:
+    """Pronóstico diario de las variables indicadas para muchas coordenadas."""
+    daily = ",".join(sorted(set(variables)))
+    params = {
+        "daily": daily,
+        "forecast_days": days,
+        "timezone": "America/Bogota"
+    }
+    return await _fetch_open_meteo_bulk("daily_forecast", points, params, days, daily)
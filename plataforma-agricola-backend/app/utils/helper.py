@@ -54,6 +54,17 @@ def _extract_coordinates(location_string: str) -> Tuple[float, float]:
         raise ValueError(f"Error al extraer coordenadas de '{location_string}': {e}")
 
 
+def _parcel_coordinates(parcel: Any) -> Tuple[float, float]:
+    """
+    (lat, lon) de una parcela desde las columnas precalculadas al guardar.
+    Las filas aún sin esas columnas se resuelven parseando `location`.
+    Raises: ValueError si la parcela no tiene coordenadas válidas.
+    """
+    if getattr(parcel, "latitude", None) is not None and getattr(parcel, "longitude", None) is not None:
+        return parcel.latitude, parcel.longitude
+    return _extract_coordinates(parcel.location)
+
+
 def _safe_json_response(success: bool, data: Dict = None, error: str = None) -> str:
     """Helper para generar respuestas JSON consistentes."""
     response = {"success": success}
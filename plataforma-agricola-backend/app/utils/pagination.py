@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Any, Tuple
+
+import base64
+import json
+
+
+def encode_cursor(*values: Any) -> str:
+    """Cursor opaco (base64 URL-safe) con los valores de la clave de orden del último elemento."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ...]:
+    """
+    Decodifica un cursor de encode_cursor. Los valores ISO 8601 vuelven como datetime.
+    Raises: ValueError si el cursor no es válido.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+    if not isinstance(payload, list):
+        raise ValueError(f"Cursor inválido: {cursor}")
+
+    values = []
+    for value in payload:
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                pass
+        values.append(value)
+    return tuple(values)
@@ -0,0 +1,142 @@
+"""
+Worker de monitoreo proactivo, separado de los procesos de la API.
+
+Planifica un ciclo cada MONITORING_INTERVAL_MINUTES (alineado al reloj, como
+"*/N" en cron), ejecuta los ciclos encolados desde /admin/trigger-monitoring y
+reanuda los barridos interrumpidos. Un advisory lock de PostgreSQL garantiza
+que solo una instancia trabaje a la vez. El lock se toma siempre en una conexión
+directa a PostgreSQL (WORKER_LOCK_DATABASE_URL con DB_PGBOUNCER=true), nunca a
+través de PgBouncer en modo transaction.
+
+Uso:
+    python -m app.worker          # bucle continuo
+    python -m app.worker --once   # un ciclo y salir
+"""
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.core.config import MONITORING_INTERVAL_MINUTES, WORKER_POLL_SECONDS, DB_PGBOUNCER, WORKER_LOCK_DATABASE_URL
+from app.db.session import SessionLocal, SQLALCHEMY_DATABASE_URL, database_pool_stats
+from app.db.models.monitoring import MonitoringRun
+from app.services.http_client import close_http_client
+from app.services.monitoring_service import (
+    enqueue_monitoring_run,
+    claim_monitoring_run,
+    execute_monitoring_run
+)
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import argparse
+import asyncio
+
+# Clave del advisory lock (arbitraria, única para este worker)
+MONITORING_LOCK_ID = 74240036
+
+
+def _lock_engine():
+    """
+    Motor sin pool para la conexión del lock. Con PgBouncer (modo transaction)
+    el lock de sesión no es fiable, así que se exige una conexión directa.
+    """
+    if DB_PGBOUNCER and not WORKER_LOCK_DATABASE_URL:
+        raise RuntimeError(
+            "DB_PGBOUNCER=true requiere WORKER_LOCK_DATABASE_URL (conexión directa a PostgreSQL) "
+            "para el advisory lock del worker"
+        )
+    return create_engine(WORKER_LOCK_DATABASE_URL or SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+
+
+lock_engine = _lock_engine()
+
+
+@contextmanager
+def single_instance_lock():
+    """
+    Advisory lock de sesión en una conexión dedicada; indica si se obtuvo.
+    La conexión va en AUTOCOMMIT: el lock es de sesión y no necesita
+    transacción, y así no queda "idle in transaction" durante todo el barrido
+    (lo que frenaría el vacuum).
+    """
+    connection = lock_engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+    acquired = False
+    try:
+        acquired = connection.execute(
+            text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": MONITORING_LOCK_ID}
+        ).scalar()
+        yield acquired
+    finally:
+        if acquired:
+            connection.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": MONITORING_LOCK_ID})
+        connection.close()
+
+
+def current_slot_start(now: datetime, interval_minutes: int = MONITORING_INTERVAL_MINUTES) -> datetime:
+    """Inicio de la franja de planificación actual (múltiplos del intervalo desde medianoche UTC)."""
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    minutes = int((now - midnight).total_seconds() // 60)
+    return midnight + timedelta(minutes=minutes - minutes % interval_minutes)
+
+
+def enqueue_scheduled_run(db) -> None:
+    """Encola el ciclo de la franja actual si aún no se hizo (estado en la base, no en memoria)."""
+    slot_start = current_slot_start(datetime.now(timezone.utc))
+    already_scheduled = db.query(MonitoringRun.id)\
+        .filter(MonitoringRun.trigger == "schedule", MonitoringRun.requested_at >= slot_start)\
+            .first()
+    if not already_scheduled:
+        run = enqueue_monitoring_run(db, trigger="schedule")
+        print(f"-- [WORKER] Ciclo planificado para la franja {slot_start:%Y-%m-%d %H:%M}: ejecución {run.id} --")
+
+
+async def process_once(schedule: bool = True) -> bool:
+    """Un paso del worker. Devuelve False si otra instancia tiene el lock."""
+    with single_instance_lock() as acquired:
+        if not acquired:
+            return False
+
+        db = SessionLocal()
+        try:
+            if schedule:
+                enqueue_scheduled_run(db)
+
+            run = claim_monitoring_run(db)
+            if run:
+                print(f"-- [WORKER] Ejecutando monitoreo {run.id} ({run.trigger}) desde parcela {run.last_parcel_id} --")
+                await execute_monitoring_run(db, run)
+                print(f"-- [WORKER] Pool de conexiones: {database_pool_stats()['sync']} --")
+        finally:
+            db.close()
+
+    return True
+
+
+async def main(once: bool = False) -> None:
+    print(f"-- [WORKER] Iniciado (intervalo {MONITORING_INTERVAL_MINUTES} min, sondeo {WORKER_POLL_SECONDS}s) --")
+    try:
+        if once:
+            db = SessionLocal()
+            try:
+                enqueue_monitoring_run(db, trigger="manual")
+            finally:
+                db.close()
+            if not await process_once(schedule=False):
+                print("-- [WORKER] Otra instancia tiene el lock de monitoreo; nada que hacer --")
+            return
+
+        while True:
+            try:
+                await process_once()
+            except Exception as e:
+                print(f"-- [WORKER] Error en el ciclo del worker: {e} --")
+            await asyncio.sleep(WORKER_POLL_SECONDS)
+    finally:
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker de monitoreo proactivo")
+    parser.add_argument("--once", action="store_true", help="Ejecuta un ciclo y termina")
+    args = parser.parse_args()
+    asyncio.run(main(once=args.once))
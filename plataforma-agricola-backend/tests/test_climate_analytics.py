@@ -0,0 +1,214 @@
+from datetime import date, timedelta
+
+import asyncio
+
+import numpy as np
+
+from app.services import weather_history as weather_history_module
+from app.services.climate_analytics import (
+    align_daily_series,
+    classify_risk_level,
+    day_of_year,
+    growing_degree_days,
+    longest_run,
+    percentile_climatology,
+    rolling_sum,
+    run_lengths,
+    summarize_climate_risk,
+    threshold_counts,
+)
+from app.services.weather_cache import weather_cell
+from app.services.weather_history import WeatherHistoryStore, climate_risk_for_points
+
+nan = np.nan
+
+
+def test_align_daily_series_places_days_and_leaves_gaps_as_nan():
+    # 2024 es bisiesto: el 29 de febrero ocupa su propia columna
+    series = [
+        [
+            ("2024-02-28", 1.0, 10.0, 0.5),
+            ("2024-03-01", None, 12.0, 2.0),
+            ("2024-03-05", 0.0, 0.0, 0.0),  # fuera del rango: se ignora
+        ],
+        [],
+    ]
+
+    tmin, tmax, precip = align_daily_series(series, date(2024, 2, 27), date(2024, 3, 1))
+
+    assert tmin.shape == (2, 4)
+    np.testing.assert_array_equal(tmin[0], [nan, 1.0, nan, nan])
+    np.testing.assert_array_equal(tmax[0], [nan, 10.0, nan, 12.0])
+    np.testing.assert_array_equal(precip[0], [nan, 0.5, nan, 2.0])
+    assert np.all(np.isnan(tmin[1])) and np.all(np.isnan(precip[1]))
+
+
+def test_day_of_year_wraps_at_new_year_and_counts_leap_day():
+    np.testing.assert_array_equal(day_of_year(date(2023, 12, 30), 4), [364, 365, 1, 2])
+    np.testing.assert_array_equal(day_of_year(date(2024, 2, 28), 3), [59, 60, 61])
+
+
+def test_rolling_sum_uses_full_windows_and_treats_nan_as_zero():
+    np.testing.assert_array_equal(rolling_sum(np.array([1.0, 2.0, 3.0, 4.0]), 2), [[nan, 3.0, 5.0, 7.0]])
+    np.testing.assert_array_equal(rolling_sum(np.array([1.0, nan, 3.0]), 2), [[nan, 1.0, 3.0]])
+    # Ventana más larga que la serie: ningún valor completo
+    assert np.all(np.isnan(rolling_sum(np.array([1.0, 2.0]), 5)))
+
+
+def test_percentile_climatology_groups_by_day_of_year():
+    # 2021-12-31 .. 2023-01-01: los días 365 y 1 aparecen en dos años
+    values = np.full(367, nan)
+    values[0], values[365] = 1.0, 3.0
+    values[1], values[366] = 10.0, 20.0
+
+    climatology = percentile_climatology(values, date(2021, 12, 31), percentiles=(50,))
+
+    assert climatology[50].shape == (1, 366)
+    assert climatology[50][0, 364] == 2.0
+    assert climatology[50][0, 0] == 15.0
+    assert np.isnan(climatology[50][0, 100])
+
+
+def test_run_lengths_counts_consecutive_days_ending_at_each_day():
+    mask = np.array([True, True, False, True, True, True, False])
+    np.testing.assert_array_equal(run_lengths(mask), [[1, 2, 0, 1, 2, 3, 0]])
+
+    np.testing.assert_array_equal(run_lengths(np.array([False, True])), [[0, 1]])
+
+
+def test_longest_run_per_row_and_empty_series():
+    mask = np.array([[True, True, False, True], [False, False, False, False]])
+    np.testing.assert_array_equal(longest_run(mask), [2, 0])
+
+    np.testing.assert_array_equal(longest_run(np.zeros((2, 0), dtype=bool)), [0, 0])
+
+
+def test_threshold_counts_use_inclusive_limits_and_ignore_nan():
+    tmin = np.array([[1.5, 2.0, 3.0, 6.0, nan]])
+    tmax = np.array([[36.0, 35.0, 31.0, 29.0, nan]])
+
+    counts = threshold_counts(tmin, tmax)
+
+    assert counts["frost_days"].tolist() == [2]
+    assert counts["near_frost_days"].tolist() == [1]
+    assert counts["heat_stress_days"].tolist() == [2]
+    assert counts["high_heat_days"].tolist() == [1]
+
+
+def test_growing_degree_days_caps_maximum_and_zeroes_missing_days():
+    tmin = np.array([8.0, 20.0, nan])
+    tmax = np.array([16.0, 40.0, 25.0])
+
+    np.testing.assert_array_equal(growing_degree_days(tmin, tmax), [2.0, 15.0, 0.0])
+
+
+def test_classify_risk_level():
+    assert classify_risk_level(6, 0) == "Alto"
+    assert classify_risk_level(0, 11) == "Alto"
+    assert classify_risk_level(1, 0) == "Moderado"
+    assert classify_risk_level(0, 0) == "Bajo"
+
+
+def test_summarize_climate_risk_per_row():
+    tmin = np.array([[1.0, 3.0, 2.0], [nan, nan, nan]])
+    tmax = np.array([[20.0, 25.0, 36.0], [nan, nan, nan]])
+    precip = np.array([[1.0, nan, 2.5], [nan, nan, nan]])
+
+    summary, empty = summarize_climate_risk(tmin, tmax, precip)
+
+    assert empty is None
+    assert summary["days_with_data"] == 3
+    assert summary["temperature"] == {
+        "average_min_c": 2.0,
+        "average_max_c": 27.0,
+        "absolute_min_c": 1.0,
+        "absolute_max_c": 36.0,
+    }
+    assert summary["risks"] == {
+        "frost_days": 2,
+        "near_frost_days": 1,
+        "heat_stress_days": 1,
+        "high_heat_days": 0,
+        "max_consecutive_frost_days": 1,
+        "risk_level": "Moderado",
+    }
+    assert summary["growing_degree_days"] == 10.5
+    assert summary["total_precipitation_mm"] == 3.5
+
+
+def test_summarize_climate_risk_rolling_degree_days():
+    tmin = np.full((1, 8), 10.0)
+    tmax = np.array([[20.0, 20.0, 20.0, 20.0, 20.0, 20.0, 20.0, 30.0]])
+
+    summary = summarize_climate_risk(tmin, tmax, tmin)[0]
+
+    # 5 grados-día diarios; el último día aporta 10
+    assert summary["growing_degree_days"] == 45.0
+    assert summary["max_rolling_growing_degree_days"] == 40.0
+    assert "climatology" not in summary
+
+    short = summarize_climate_risk(tmin[:, :3], tmax[:, :3], tmin[:, :3])[0]
+    assert short["max_rolling_growing_degree_days"] is None
+
+
+def test_summarize_climate_risk_against_climatology():
+    tmin = np.array([[-1.0, 1.0, 3.0], [-1.0, 1.0, 3.0]])
+    tmax = np.array([[31.0, 26.0, 20.0], [31.0, 26.0, 20.0]])
+    climatology = {
+        "tmin": {10: np.full((2, 366), 0.0), 50: np.full((2, 366), 5.0), 90: np.full((2, 366), 10.0)},
+        "tmax": {10: np.full((2, 366), 15.0), 50: np.full((2, 366), 25.0), 90: np.full((2, 366), 30.0)},
+    }
+    # La segunda fila no tiene años de referencia
+    for percentiles in climatology.values():
+        for matrix in percentiles.values():
+            matrix[1] = nan
+
+    with_reference, without_reference = summarize_climate_risk(
+        tmin, tmax, np.zeros_like(tmin), date(2024, 6, 1), climatology
+    )
+
+    assert with_reference["climatology"] == {
+        "cold_nights_below_p10": 1,
+        "hot_days_above_p90": 1,
+        "max_temperature_anomaly_c": 0.7,
+    }
+    assert without_reference["climatology"] is None
+
+
+def _daily_payload(start_date, end_date, overrides):
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    tmin = [overrides.get(day, (5.0, 20.0))[0] for day in days]
+    tmax = [overrides.get(day, (5.0, 20.0))[1] for day in days]
+    return {"daily": {
+        "time": [day.isoformat() for day in days],
+        "temperature_2m_min": tmin,
+        "temperature_2m_max": tmax,
+        "precipitation_sum": [1.0] * len(days),
+    }}
+
+
+def test_climate_risk_for_points_shares_cells_and_uses_baseline(tmp_path, monkeypatch):
+    store = WeatherHistoryStore(str(tmp_path / "history.sqlite"))
+    monkeypatch.setattr(weather_history_module, "weather_history", store)
+
+    # Histórico ya sincronizado: un año de referencia (2022) y el período
+    start_date, end_date = date(2023, 1, 1), date(2023, 1, 3)
+    baseline_start = date(2022, 1, 1)
+    cell, _, _ = weather_cell(40.0, -3.0)
+    payload = _daily_payload(baseline_start, end_date, {start_date: (1.0, 25.0)})
+    store._store_sync(cell, payload, None, (baseline_start, end_date))
+
+    points = [(40.0, -3.0), (40.01, -3.01)]
+    results = asyncio.run(climate_risk_for_points(points, start_date, end_date, baseline_years=1))
+
+    assert results[points[0]] is results[points[1]]
+    summary = results[points[0]]
+    assert summary["days_with_data"] == 3
+    assert summary["risks"]["frost_days"] == 1
+    assert summary["total_precipitation_mm"] == 3.0
+    # Referencia constante (5 / 20 °C): una noche más fría y un día más cálido de lo habitual
+    assert summary["climatology"] == {
+        "cold_nights_below_p10": 1,
+        "hot_days_above_p90": 1,
+        "max_temperature_anomaly_c": 1.7,
+    }
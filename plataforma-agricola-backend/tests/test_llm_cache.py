@@ -0,0 +1,53 @@
+import uuid
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage
+
+from app.agents.supervisor.node import build_supervisor_prompt
+from app.core.llm_cache import SQLiteTTLCache
+
+
+class CountingCache(SQLiteTTLCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hits = 0
+
+    def lookup(self, prompt, llm_string):
+        result = super().lookup(prompt, llm_string)
+        if result is not None:
+            self.hits += 1
+        return result
+
+
+def _turn_state():
+    """Estado de un turno nuevo: mismo contenido, conversation_id distinto."""
+    return {
+        "user_id": 7,
+        "conversation_id": str(uuid.uuid4()),
+        "messages": [HumanMessage(content="¿Cuánta agua necesita la parcela 3 esta semana?")],
+        "chat_history": [],
+        "list_agent": [],
+        "user_parcels": [{"id": 3, "name": "La Loma", "crop_type": "cafe", "development_stage": "floracion"}],
+    }
+
+
+def test_supervisor_prompt_has_no_per_turn_values():
+    prompt = build_supervisor_prompt(_turn_state())
+
+    assert "conversation_id" not in prompt.input_variables
+    assert "conversation_id" not in prompt.partial_variables
+
+
+def test_identical_turns_hit_the_cache(tmp_path):
+    cache = CountingCache(str(tmp_path / "llm_cache.sqlite"))
+    model = FakeListChatModel(responses=["primera", "segunda"], cache=cache)
+
+    outputs = []
+    for _ in range(2):
+        state = _turn_state()
+        chain = build_supervisor_prompt(state) | model
+        response = chain.invoke({"messages": state["messages"], "chat_history": state["chat_history"]})
+        outputs.append(response.content)
+
+    assert outputs == ["primera", "primera"]
+    assert cache.hits == 1
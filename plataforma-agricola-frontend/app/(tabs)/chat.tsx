@@ -57,7 +57,8 @@ export default function Index() {
         selectedFile ? selectedFile.base64 : null
       )
 
-      setMessages(response)
+      // La API devuelve solo los mensajes nuevos del turno
+      setMessages((prev) => [...(prev ?? []), ...response])
     } catch (error: any) {
       Alert.alert("Error", "Failed to send message")
       console.error(error)
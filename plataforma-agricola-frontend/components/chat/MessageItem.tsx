@@ -8,11 +8,19 @@ import Typo from '../ui/Typo'
 import { Image } from 'expo-image'
 import { getFileFromBase64 } from '@/utils/base64'
 import Markdown from 'react-native-markdown-display';
+import { API_URL } from '@/constants'
+
+// El historial trae la URL de la miniatura en la API; el mensaje recién
+// enviado (aún sin respuesta del servidor) trae la imagen local en base64
+const attachmentSource = (attachement: string, token: string | null) =>
+    attachement.startsWith('/')
+        ? { uri: `${API_URL}${attachement}`, headers: token ? { Authorization: `Bearer ${token}` } : undefined }
+        : { uri: `data:image/jpeg;base64,${attachement}` }
 
 export default function MessageItem({
     item
 }: { item: MessageProps }) {
-    const { user: currentUser } = useAuth()
+    const { user: currentUser, token } = useAuth()
     const isMe = item.isMe
 
     return (
@@ -38,7 +46,7 @@ export default function MessageItem({
                         Agrosmi
                     </Typo>
                 )}
-                {item.attachement && (<Image source={{ uri: `data:image/jpeg;base64,${item.attachement}` }} contentFit='cover' style={styles.attachment} transition={100} />)}
+                {item.attachement && (<Image source={attachmentSource(item.attachement, token)} contentFit='cover' style={styles.attachment} transition={100} />)}
                 {item.content && (<Typo size={15}><Markdown>{item.content}</Markdown></Typo>)}
             </View>
         </View>
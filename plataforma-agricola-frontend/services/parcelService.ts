@@ -22,13 +22,22 @@ export const createParcel = async (
 
 /**
  * Servicio para obtener todas las parcelas del usuario actual.
+ * La API pagina por cursor: se piden páginas hasta que no llega X-Next-Cursor.
  * Requiere autenticación.
  * @returns Una lista de objetos ParcelData.
  */
 export const getParcels = async (): Promise<Parcel[]> => {
   try {
-    const response = await apiClient.get<Parcel[]>("/parcels/");
-    return response.data;
+    const parcels: Parcel[] = [];
+    let cursor: string | undefined = undefined;
+    do {
+      const response = await apiClient.get<Parcel[]>("/parcels/", {
+        params: { limit: 500, cursor },
+      });
+      parcels.push(...response.data);
+      cursor = response.headers["x-next-cursor"];
+    } while (cursor);
+    return parcels;
   } catch (error: any) {
     console.error("Error fetching parcels:", error);
     throw new Error(error.response?.data?.detail || "No se pudieron cargar las parcelas");